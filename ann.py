@@ -0,0 +1,400 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from scipy import sparse
+
+from dedup import mix64
+from similarity import TOP_K, posting_lists, query_row, top_k
+
+
+ANN_PATH = "index/ann"
+# En dessous de ce nombre d'offres, la recherche exacte (listes de mots)
+# est aussi rapide qu'une requête approchée et ne perd aucun voisin.
+ANN_MIN_SIZE = 10_000
+# Taille des vecteurs denses qui résument les lignes de la matrice.
+EMBEDDING_DIM = 128
+# Nombre de dimensions du vecteur dense touchées par chaque colonne.
+HASHES_PER_COLUMN = 4
+# Réglages de la recherche : plus de listes sondées retrouvent plus de
+# voisins (rappel) mais lisent plus de candidats (latence).
+NPROBE = 4
+# Candidats gardés après le tri sur les vecteurs denses, pour le tri
+# final sur les lignes exactes : les copies d'une même offre ont presque
+# le même vecteur dense, seul le score exact les départage.
+RERANK = 100
+# Apprentissage des centres (k-means sphérique) : nombre de passes et
+# nombre maximum de lignes tirées pour l'apprentissage.
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50_000
+# Lignes traitées ensemble pour ranger toutes les offres dans les listes
+# (mémoire des scores lignes x centres).
+ASSIGN_BLOCK = 10_000
+
+
+def column_projection(
+        n_columns: int,
+        dim: int = EMBEDDING_DIM,
+        hashes_per_column: int = HASHES_PER_COLUMN,
+        seed: int = 1,
+    ) -> sparse.csr_matrix:
+    '''
+    Projection aléatoire creuse des colonnes de la matrice vers `dim`
+    dimensions : chaque colonne ajoute ±1 à `hashes_per_column` dimensions
+    tirées de l'empreinte de son numéro.
+    '''
+    columns = np.arange(n_columns, dtype=np.uint64) ^ np.uint64(seed)
+    rows = np.repeat(np.arange(n_columns), hashes_per_column)
+    mixed = mix64(
+        columns[:, None] * np.uint64(hashes_per_column)
+        + np.arange(hashes_per_column, dtype=np.uint64)
+    ).ravel()
+    cols = (mixed % np.uint64(dim)).astype(np.int64)
+    signs = np.where((mixed >> np.uint64(32)) & np.uint64(1), 1.0, -1.0).astype(np.float32)
+    return sparse.csr_matrix(
+        (signs / np.sqrt(hashes_per_column), (rows, cols)), shape=(n_columns, dim),
+    )
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+
+def spherical_kmeans(
+        vectors: np.ndarray,
+        n_clusters: int,
+        iterations: int = KMEANS_ITERATIONS,
+        sample: int = KMEANS_SAMPLE,
+        seed: int = 1,
+    ) -> np.ndarray:
+    '''
+    Centres (normalisés) de `n_clusters` groupes de vecteurs proches en
+    cosinus, appris sur au plus `sample` vecteurs tirés au hasard.
+    '''
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample:
+        vectors = vectors[np.sort(rng.choice(len(vectors), sample, replace=False))]
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = (vectors @ centroids.T).argmax(axis=1)
+        members = sparse.csr_matrix(
+            (np.ones(len(labels), dtype=np.float32), (labels, np.arange(len(labels)))),
+            shape=(n_clusters, len(vectors)),
+        )
+        sums = np.asarray(members @ vectors)
+        # Un groupe vide garde son ancien centre.
+        filled = np.asarray(members.sum(axis=1)).ravel() > 0
+        centroids[filled] = normalize_rows(sums[filled])
+    return centroids
+
+
+class AnnIndex:
+    '''
+    Recherche approchée des offres similaires, en numpy (index IVF) : les
+    lignes de la matrice du score sont résumées en vecteurs denses
+    (projection aléatoire), puis rangées dans `nlist` listes, une par
+    centre appris par k-means. Une requête ne lit que les offres des
+    `nprobe` listes dont le centre est le plus proche, trie ces candidats
+    sur les vecteurs denses puis les `rerank` meilleurs sur leur score
+    exact (lignes de la matrice).
+    ---
+    Paramètres:
+    ---
+    nlist: int: nombre de listes (par défaut la racine carrée du nombre
+    d'offres).
+    nprobe: int: listes lues par requête.
+    rerank: int: candidats triés sur leur score exact.
+    dim: int: taille des vecteurs denses.
+    seed: int: graine des tirages aléatoires.
+    '''
+    def __init__(
+            self,
+            nlist: int = None,
+            nprobe: int = NPROBE,
+            rerank: int = RERANK,
+            dim: int = EMBEDDING_DIM,
+            seed: int = 1,
+        ):
+        self.config = {
+            "nlist": nlist, "nprobe": nprobe, "rerank": rerank, "dim": dim, "seed": seed,
+        }
+        self.ids = np.empty(0, dtype=object)
+        self.centroids = np.empty((0, dim), dtype=np.float32)
+        # Vecteurs denses rangés liste après liste (une liste est une
+        # tranche contiguë), ligne de la matrice de chacun, et début de
+        # chaque liste.
+        self.embeddings = np.empty((0, dim), dtype=np.float32)
+        self.rows = np.empty(0, dtype=np.int32)
+        self.bounds = np.zeros(1, dtype=np.int64)
+        # Position dans `embeddings` de chaque ligne de la matrice.
+        self.positions = np.empty(0, dtype=np.int32)
+        # Empreinte de la matrice indexée (voir `update_ann_index`).
+        self.fingerprint = ""
+        # Lignes exactes pour le tri final (optionnel).
+        self.matrix = None
+        self._query = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def build(
+            self,
+            matrix: sparse.csr_matrix,
+            ids,
+        ) -> "AnnIndex":
+        '''
+        Construit l'index à partir des lignes de la matrice du score.
+        ---
+        Paramètres:
+        ---
+        matrix: sparse.csr_matrix: une ligne par offre (par exemple
+        `HybridIndex.matrix`), produit de deux lignes = score.
+        ids: ids des offres, dans l'ordre des lignes.
+        '''
+        config = self.config
+        self.ids = np.asarray(ids, dtype=object)
+        self.matrix = matrix
+        self.fingerprint = matrix_fingerprint(matrix)
+        projection = column_projection(matrix.shape[1], config["dim"], seed=config["seed"])
+        embeddings = normalize_rows(np.asarray((matrix @ projection).todense()))
+        nlist = config["nlist"] or int(np.ceil(np.sqrt(len(self))))
+        nlist = config["nlist"] = max(1, min(nlist, len(self)))
+        self.centroids = spherical_kmeans(embeddings, nlist, seed=config["seed"]) \
+            if len(self) else np.empty((0, config["dim"]), dtype=np.float32)
+        labels = np.concatenate([
+            (embeddings[start:start + ASSIGN_BLOCK] @ self.centroids.T).argmax(axis=1)
+            for start in range(0, len(self), ASSIGN_BLOCK)
+        ]) if len(self) else np.empty(0, dtype=np.int64)
+        self.rows = np.argsort(labels, kind="stable").astype(np.int32)
+        self.embeddings = embeddings[self.rows]
+        self.bounds = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=nlist))])
+        self.positions = np.empty(len(self), dtype=np.int32)
+        self.positions[self.rows] = np.arange(len(self), dtype=np.int32)
+        return self
+
+    def candidates(self, embedding: np.ndarray) -> tuple:
+        '''
+        Offres des `nprobe` listes dont le centre est le plus proche de
+        `embedding`.
+        ---
+        Retourne:
+        ---
+        (lignes, scores): tuple de np.ndarray, lignes de la matrice et
+        score de leur vecteur dense avec `embedding`.
+        '''
+        lists, _ = top_k(self.centroids @ embedding, self.config["nprobe"])
+        starts, stops = self.bounds[lists], self.bounds[lists + 1]
+        # Une liste est une tranche contiguë : pas de copie des vecteurs.
+        scores = [self.embeddings[start:stop] @ embedding for start, stop in zip(starts, stops)]
+        rows = self.rows[_ranges(starts, stops)]
+        return rows, np.concatenate(scores) if scores else np.empty(0, dtype=np.float32)
+
+    def _exact_scores(self, candidates: np.ndarray, row: int) -> np.ndarray:
+        # Score exact entre les lignes des candidats et la ligne `row`,
+        # sans extraire de sous-matrice. La ligne `row` est recopiée dans
+        # un tableau dense gardé d'une requête à l'autre (remis à zéro
+        # après usage).
+        matrix = self.matrix
+        if self._query is None or len(self._query) != matrix.shape[1]:
+            self._query = np.zeros(matrix.shape[1], dtype=np.float32)
+        query = self._query
+        start, stop = matrix.indptr[row], matrix.indptr[row + 1]
+        query[matrix.indices[start:stop]] = matrix.data[start:stop]
+        starts, stops = matrix.indptr[candidates], matrix.indptr[candidates + 1]
+        positions = _ranges(starts, stops)
+        products = matrix.data[positions] * query[matrix.indices[positions]]
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        lengths = stops - starts
+        non_empty = lengths > 0
+        scores[non_empty] = np.add.reduceat(products, np.cumsum(lengths)[non_empty] - lengths[non_empty]) \
+            if len(products) else 0
+        query[matrix.indices[start:stop]] = 0
+        return scores
+
+    def query_row(
+            self,
+            row: int,
+            k: int = TOP_K,
+        ) -> tuple:
+        '''
+        Version approchée de `similarity.query_row` : positions et scores
+        des `k` lignes les plus similaires à la ligne `row`.
+        '''
+        candidates, scores = self.candidates(self.embeddings[self.positions[row]])
+        other = candidates != row
+        candidates, scores = candidates[other], scores[other]
+        if self.matrix is not None:
+            best, _ = top_k(scores, max(self.config["rerank"], k))
+            candidates = candidates[best]
+            scores = self._exact_scores(candidates, row)
+        best, scores = top_k(scores, k)
+        return candidates[best], scores
+
+    def similar(
+            self,
+            offer_id: str,
+            k: int = TOP_K,
+        ) -> pd.DataFrame:
+        '''
+        Les `k` offres les plus similaires à une offre (approché).
+        ---
+        Retourne:
+        ---
+        df: pd.DataFrame: colonnes "id" et "score".
+        '''
+        row = pd.Index(self.ids).get_loc(offer_id)
+        positions, scores = self.query_row(row, k)
+        return pd.DataFrame({"id": self.ids[positions], "score": scores})
+
+    def recall(
+            self,
+            matrix: sparse.csr_matrix = None,
+            k: int = TOP_K,
+            queries: int = 200,
+            seed: int = 0,
+        ) -> dict:
+        '''
+        Compare la recherche approchée à la recherche exacte sur `queries`
+        offres tirées au hasard.
+        ---
+        Retourne:
+        ---
+        report: dict: rappel@k moyen (part des k voisins exacts retrouvés),
+        temps moyen d'une requête approchée et exacte (ms).
+        '''
+        matrix = self.matrix if matrix is None else matrix
+        postings = posting_lists(matrix)
+        rows = np.random.default_rng(seed).choice(len(self), min(queries, len(self)), replace=False)
+        found, ann_time, exact_time = 0, 0.0, 0.0
+        for row in rows:
+            start = time.perf_counter()
+            positions, _ = self.query_row(row, k)
+            ann_time += time.perf_counter() - start
+            start = time.perf_counter()
+            expected, _ = query_row(matrix, row, k, postings)
+            exact_time += time.perf_counter() - start
+            found += len(np.intersect1d(positions, expected))
+        report = {
+            f"recall@{k}": found / max(len(rows) * min(k, len(self) - 1), 1),
+            "ann_ms": ann_time / max(len(rows), 1) * 1000,
+            "exact_ms": exact_time / max(len(rows), 1) * 1000,
+        }
+        logging.info(f"ANN index: {report}")
+        return report
+
+    def save(self, path: str = ANN_PATH):
+        '''
+        Écrit l'index dans le dossier `path` (remplacé d'un coup).
+        '''
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        with open(os.path.join(tmp_path, "config.json"), "w", encoding="utf-8") as f:
+            json.dump({"config": self.config, "fingerprint": self.fingerprint}, f)
+        np.save(os.path.join(tmp_path, "embeddings.npy"), self.embeddings)
+        np.save(os.path.join(tmp_path, "centroids.npy"), self.centroids)
+        np.save(os.path.join(tmp_path, "rows.npy"), self.rows)
+        np.save(os.path.join(tmp_path, "bounds.npy"), self.bounds)
+        pd.DataFrame({"id": self.ids}).to_parquet(os.path.join(tmp_path, "ids.parquet"), index=False)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        logging.info(f"ANN index saved to {path} ({len(self)} offers).")
+
+    @classmethod
+    def load(
+            cls,
+            path: str = ANN_PATH,
+            matrix: sparse.csr_matrix = None,
+            mmap: bool = True,
+        ) -> "AnnIndex":
+        '''
+        Charge l'index (None s'il n'existe pas). `matrix` (lignes dans le
+        même ordre) sert au tri final des candidats.
+        '''
+        if not os.path.exists(os.path.join(path, "config.json")):
+            return None
+        with open(os.path.join(path, "config.json"), encoding="utf-8") as f:
+            saved = json.load(f)
+        index = cls(**saved["config"])
+        index.fingerprint = saved["fingerprint"]
+        mmap_mode = "r" if mmap else None
+        index.embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode=mmap_mode)
+        index.centroids = np.load(os.path.join(path, "centroids.npy"))
+        index.rows = np.load(os.path.join(path, "rows.npy"), mmap_mode=mmap_mode)
+        index.bounds = np.load(os.path.join(path, "bounds.npy"))
+        index.positions = np.empty(len(index.rows), dtype=np.int32)
+        index.positions[index.rows] = np.arange(len(index.rows), dtype=np.int32)
+        index.ids = pd.read_parquet(os.path.join(path, "ids.parquet"))["id"].to_numpy(dtype=object)
+        index.matrix = matrix
+        return index
+
+
+def _ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    '''
+    Positions de tous les intervalles [start, stop) mis bout à bout.
+    '''
+    lengths = np.maximum(stops - starts, 0)
+    total = lengths.sum()
+    if not total:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total)
+
+
+def matrix_fingerprint(matrix: sparse.csr_matrix) -> str:
+    '''
+    Empreinte du contenu d'une matrice creuse, pour savoir si un index
+    enregistré correspond encore à la matrice.
+    '''
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.array(matrix.shape, dtype=np.int64).tobytes())
+    for array in (matrix.indptr, matrix.indices, matrix.data):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def update_ann_index(
+        hybrid_index,
+        path: str = ANN_PATH,
+        min_size: int = ANN_MIN_SIZE,
+        **kwargs,
+    ) -> AnnIndex:
+    '''
+    Index approché du score hybride : l'index enregistré dans `path` est
+    réutilisé s'il a été construit sur la même matrice, sinon il est
+    reconstruit, son rappel@5 mesuré et l'index enregistré.
+    ---
+    Paramètres:
+    ---
+    hybrid_index: HybridIndex: score hybride à jour (voir
+    `update_hybrid_index`).
+    path: str: dossier de l'index.
+    min_size: int: nombre d'offres en dessous duquel aucun index n'est
+    construit.
+    kwargs: réglages de `AnnIndex` (nlist, nprobe, rerank...).
+    ---
+    Retourne:
+    ---
+    index: AnnIndex, ou None en dessous de `min_size` offres (recherche
+    exacte, voir `HybridIndex.similar`).
+    '''
+    if len(hybrid_index) < min_size:
+        logging.info(f"ANN index: {len(hybrid_index)} offers, exact search is used below {min_size}.")
+        return None
+    index = AnnIndex.load(path, hybrid_index.matrix)
+    if index is not None and not kwargs \
+            and index.fingerprint == matrix_fingerprint(hybrid_index.matrix) \
+            and np.array_equal(index.ids, hybrid_index.ids.to_numpy(dtype=object)):
+        return index
+    index = AnnIndex(**kwargs).build(hybrid_index.matrix, hybrid_index.ids)
+    index.recall()
+    index.save(path)
+    return index
@@ -0,0 +1,267 @@
+import functools
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+
+from scipy import sparse
+
+from parallel import default_workers, map_chunks
+from similarity import TOP_K
+from hybrid import HybridIndex
+from tfidf_index import MATRIX_FILES
+
+
+DB_URL = 'sqlite:///database/job_offers.sqlite'
+SIMILAR_TABLE = 'similar_offers'
+# Matrice du score hybride, écrite pour être lue par les processus.
+MATRIX_PATH = "index/hybrid"
+# Mémoire allouée aux scores d'un bloc de lignes (scores creux puis denses
+# d'un bloc d'offres contre tout le catalogue).
+BLOCK_MEMORY = 64 * 2**20
+# Octets comptés par score d'un bloc : produit creux (valeur, colonne et
+# copies de scipy) puis tableau dense float32.
+BYTES_PER_SCORE = 16
+
+
+def block_rows(
+        n_offers: int,
+        memory: int = BLOCK_MEMORY,
+    ) -> int:
+    '''
+    Nombre de lignes par bloc pour que les scores d'un bloc contre les
+    `n_offers` offres tiennent dans `memory` octets.
+    '''
+    return max(1, memory // (BYTES_PER_SCORE * max(n_offers, 1)))
+
+
+def block_scores(
+        matrix: sparse.csr_matrix,
+        rows: np.ndarray,
+        transposed: sparse.csr_matrix = None,
+        memory: int = BLOCK_MEMORY,
+    ):
+    '''
+    Scores (cosinus) des lignes `rows` contre toutes les lignes de la
+    matrice, par blocs de taille fixe, chaque ligne ayant un score de -inf
+    avec elle-même.
+    ---
+    Paramètres:
+    ---
+    matrix: sparse.csr_matrix: une ligne par offre (score hybride).
+    rows: np.ndarray: positions des offres de référence.
+    transposed: sparse.csr_matrix: `matrix.T` au format CSR (calculée si
+    absente).
+    memory: int: mémoire d'un bloc de scores, en octets.
+    ---
+    Retourne:
+    ---
+    générateur de (positions du bloc, np.ndarray des scores du bloc).
+    '''
+    if transposed is None:
+        transposed = matrix.T.tocsr()
+    size = block_rows(matrix.shape[0], memory)
+    for start in range(0, len(rows), size):
+        block = rows[start:start + size]
+        scores = (matrix[block] @ transposed).toarray()
+        scores[np.arange(len(block)), block] = -np.inf
+        yield block, scores
+
+
+def top_k_rows(
+        matrix: sparse.csr_matrix,
+        rows: np.ndarray,
+        k: int = TOP_K,
+        memory: int = BLOCK_MEMORY,
+    ) -> tuple:
+    '''
+    Les `k` lignes les plus similaires à chacune des lignes `rows`, la
+    ligne elle-même exclue.
+    ---
+    Retourne:
+    ---
+    (offres, rangs, similaires, scores): tuple de np.ndarray, une valeur
+    par paire (offre, offre similaire), rangs à partir de 1.
+    '''
+    k = min(k, matrix.shape[0] - 1)
+    if k <= 0 or not len(rows):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, np.empty(0, dtype=np.float32)
+    transposed = matrix.T.tocsr()
+    offers, similar, scores = [], [], []
+    for block, block_score in block_scores(matrix, rows, transposed, memory):
+        best = np.argpartition(block_score, -k, axis=1)[:, -k:]
+        best_score = np.take_along_axis(block_score, best, axis=1)
+        order = np.argsort(-best_score, axis=1, kind="stable")
+        offers.append(np.repeat(block, k))
+        similar.append(np.take_along_axis(best, order, axis=1).ravel())
+        scores.append(np.take_along_axis(best_score, order, axis=1).ravel())
+    offers, similar, scores = (np.concatenate(values) for values in (offers, similar, scores))
+    ranks = np.tile(np.arange(1, k + 1), len(offers) // k)
+    keep = np.isfinite(scores)
+    return offers[keep], ranks[keep], similar[keep], scores[keep].astype(np.float32)
+
+
+def save_matrix(
+        matrix: sparse.csr_matrix,
+        path: str = MATRIX_PATH,
+    ):
+    '''
+    Écrit la matrice dans le dossier `path` (remplacé d'un coup, comme
+    `TfidfIndex.save`).
+    '''
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name in MATRIX_FILES:
+        np.save(os.path.join(tmp_path, f"matrix_{name}.npy"), getattr(matrix, name))
+    np.save(os.path.join(tmp_path, "matrix_shape.npy"), np.array(matrix.shape, dtype=np.int64))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_matrix(path: str = MATRIX_PATH) -> sparse.csr_matrix:
+    '''
+    Matrice écrite par `save_matrix`, lue sans copie (memory map) : les
+    processus partagent les pages du fichier.
+    '''
+    arrays = [np.load(os.path.join(path, f"matrix_{name}.npy"), mmap_mode="r") for name in MATRIX_FILES]
+    shape = tuple(np.load(os.path.join(path, "matrix_shape.npy")))
+    return sparse.csr_matrix(tuple(arrays), shape=shape, copy=False)
+
+
+def top_k_chunk(
+        chunk: pd.DataFrame,
+        path: str = MATRIX_PATH,
+        k: int = TOP_K,
+        memory: int = BLOCK_MEMORY,
+    ) -> pd.DataFrame:
+    '''
+    `top_k_rows` pour un morceau d'offres (colonne "row"), la matrice étant
+    lue depuis `path` (voir `save_matrix`). Utilisée avec `map_chunks`
+    pour répartir le calcul sur les cœurs.
+    '''
+    offers, ranks, similar, scores = top_k_rows(load_matrix(path), chunk["row"].to_numpy(), k, memory)
+    return pd.DataFrame({"row": offers, "rank": ranks, "similar_row": similar, "score": scores})
+
+
+def affected_rows(
+        matrix: sparse.csr_matrix,
+        ids: pd.Index,
+        table: pd.DataFrame,
+        updated_ids,
+        k: int = TOP_K,
+        memory: int = BLOCK_MEMORY,
+    ) -> np.ndarray:
+    '''
+    Offres dont les offres similaires enregistrées ne sont plus à jour
+    après une mise à jour de l'index : offres nouvelles ou modifiées,
+    offres dont une offre similaire a été modifiée ou retirée, et offres
+    dont une offre nouvelle ou modifiée dépasse le k-ième score.
+    ---
+    Paramètres:
+    ---
+    matrix: sparse.csr_matrix: matrice du score hybride, une ligne par id.
+    ids: pd.Index: ids des offres, dans l'ordre des lignes.
+    table: pd.DataFrame: table similar_offers enregistrée.
+    updated_ids: ids ajoutés ou modifiés (`HybridIndex.updated_ids`).
+    ---
+    Retourne:
+    ---
+    rows: np.ndarray: positions des offres à recalculer.
+    '''
+    updated = ids.get_indexer(pd.Index(updated_ids).intersection(ids))
+    stale = ids.isin(updated_ids) | ~ids.isin(table["offer_id"])
+    gone = table["similar_id"].isin(updated_ids) | ~table["similar_id"].isin(ids)
+    stale |= ids.isin(table.loc[gone, "offer_id"])
+
+    # Plus petit score gardé par offre (-inf s'il lui manque des offres
+    # similaires) : une offre nouvelle ou modifiée qui fait mieux y entre.
+    kth = table.groupby("offer_id")["score"].agg(["min", "size"])
+    kth.loc[kth["size"] < min(k, len(ids) - 1), "min"] = -np.inf
+    kth = kth["min"].reindex(ids).fillna(-np.inf).to_numpy()
+    best = np.full(len(ids), -np.inf, dtype=np.float32)
+    if len(updated):
+        for _, scores in block_scores(matrix, updated, memory=memory):
+            np.maximum(best, scores.max(axis=0), out=best)
+    stale |= best > kth
+    return np.flatnonzero(stale)
+
+
+def update_similar_offers(
+        index: HybridIndex,
+        path: str = MATRIX_PATH,
+        db_url: str = DB_URL,
+        k: int = TOP_K,
+        full: bool = False,
+        workers: int = None,
+        memory: int = BLOCK_MEMORY,
+    ) -> pd.DataFrame:
+    '''
+    Calcule les `k` offres les plus similaires de chaque offre et les écrit
+    dans la table similar_offers(offer_id, rank, similar_id, score), à côté
+    de all_jobs. Après un scrapping incrémental, seules les offres touchées
+    (voir `affected_rows`) sont recalculées ; les scores des autres offres
+    ne suivent pas la légère variation de l'IDF, `full` recalcule tout.
+    ---
+    Paramètres:
+    ---
+    index: HybridIndex: score hybride à jour (voir `update_hybrid_index`),
+    celui de `HybridIndex.similar`.
+    path: str: dossier où la matrice est écrite pour les processus.
+    db_url: str: base de données de la table.
+    k: int: nombre d'offres similaires par offre.
+    full: bool: recalcule toutes les offres.
+    workers: int: nombre de processus (un par cœur par défaut).
+    memory: int: mémoire d'un bloc de scores, en octets.
+    ---
+    Retourne:
+    ---
+    df: pd.DataFrame: lignes recalculées de la table.
+    '''
+    engine = sqlalchemy.create_engine(db_url)
+    ids = index.ids
+    exists = sqlalchemy.inspect(engine).has_table(SIMILAR_TABLE)
+    if full or not exists:
+        rows = np.arange(len(ids))
+        table = None
+    else:
+        table = pd.read_sql_table(SIMILAR_TABLE, con=engine)
+        rows = affected_rows(index.matrix, ids, table, index.updated_ids, k, memory)
+
+    save_matrix(index.matrix, path)
+    workers = workers or default_workers()
+    func = functools.update_wrapper(functools.partial(top_k_chunk, path=path, k=k, memory=memory), top_k_chunk)
+    # Morceaux d'au moins un bloc par processus.
+    chunk_size = max(block_rows(len(ids), memory), -(-len(rows) // (4 * workers)))
+    result = map_chunks(func, pd.DataFrame({"row": rows}), workers=workers, chunk_size=chunk_size)
+    ids = ids.to_numpy()
+    df = pd.DataFrame({
+        "offer_id": ids[result["row"].to_numpy(dtype=np.int64)],
+        "rank": result["rank"].to_numpy(dtype=np.int64),
+        "similar_id": ids[result["similar_row"].to_numpy(dtype=np.int64)],
+        "score": result["score"].to_numpy(dtype=np.float32),
+    })
+
+    if table is None:
+        df.to_sql(SIMILAR_TABLE, con=engine, index=False, if_exists='replace')
+    else:
+        # Les lignes des offres recalculées ou retirées sont remplacées.
+        removed = pd.Index(table["offer_id"].unique()).difference(index.ids)
+        stale = pd.DataFrame({"offer_id": pd.Index(ids[rows]).union(removed)})
+        with engine.begin() as connection:
+            stale.to_sql(f"{SIMILAR_TABLE}_stale", con=connection, index=False, if_exists='replace')
+            connection.execute(sqlalchemy.text(
+                f"DELETE FROM {SIMILAR_TABLE} WHERE offer_id IN (SELECT offer_id FROM {SIMILAR_TABLE}_stale)"
+            ))
+            connection.execute(sqlalchemy.text(f"DROP TABLE {SIMILAR_TABLE}_stale"))
+            df.to_sql(SIMILAR_TABLE, con=connection, index=False, if_exists='append')
+    with engine.begin() as connection:
+        connection.execute(sqlalchemy.text(
+            f"CREATE INDEX IF NOT EXISTS ix_{SIMILAR_TABLE}_offer_id ON {SIMILAR_TABLE} (offer_id)"
+        ))
+    logging.info(f"Similar offers: {len(rows)} of {len(ids)} offers recomputed ({len(df)} rows written).")
+    return df
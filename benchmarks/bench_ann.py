@@ -0,0 +1,59 @@
+'''
+Mesure la recherche approchée (`ann.AnnIndex`) contre la recherche exacte
+(`similarity.query_row` avec listes de mots) sur la matrice du score
+hybride : rappel@5 et temps d'une requête, sur des corpus de taille
+croissante et pour plusieurs réglages.
+
+Les offres sont tirées de datasets/all_jobs.parquet avec une trentaine de
+mots de la description changés (voir bench_dedup). L'index de texte est
+écrit dans un dossier temporaire.
+
+Usage : python benchmarks/bench_ann.py [tailles...]
+'''
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from ann import AnnIndex
+from bench_dedup import perturb
+from hybrid import update_hybrid_index
+
+# (nprobe, rerank)
+SETTINGS = [(2, 100), (4, 100), (8, 100), (4, 200)]
+
+
+def make_offers(df: pd.DataFrame, size: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    offers = df.iloc[rng.integers(0, len(df), size)].reset_index(drop=True)
+    offers["description"] = [perturb(text, rng, 30) for text in offers["description"]]
+    offers["id"] = [f"offre{i}" for i in range(size)]
+    return offers
+
+
+def main(sizes: list):
+    df = pd.read_parquet("datasets/all_jobs.parquet")
+    print(f"{'offres':>8}{'sondes':>8}{'tri final':>11}{'construction (s)':>18}{'rappel@5':>10}{'ANN (ms)':>10}{'exact (ms)':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            hybrid = update_hybrid_index(make_offers(df, size), os.path.join(tmp, "tfidf_text"))
+        for nprobe, rerank in SETTINGS:
+            start = time.perf_counter()
+            index = AnnIndex(nprobe=nprobe, rerank=rerank).build(hybrid.matrix, hybrid.ids)
+            build_time = time.perf_counter() - start
+            report = index.recall(queries=200)
+            print(
+                f"{size:>8}{nprobe:>8}{rerank:>11}{build_time:>18.2f}"
+                f"{report['recall@5']:>10.1%}{report['ann_ms']:>10.2f}{report['exact_ms']:>12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000])
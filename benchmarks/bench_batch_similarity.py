@@ -0,0 +1,66 @@
+'''
+Mesure le calcul des offres similaires de tout le catalogue
+(`batch_similarity.update_similar_offers`) : calcul complet, puis mise à
+jour après un scrapping incrémental (1 % d'offres modifiées, 1 % de
+nouvelles offres), comparée au calcul complet. Le score est celui de
+`hybrid.update_hybrid_index` (ici le bloc de texte seul).
+
+Les documents sont ceux de datasets/all_jobs.parquet, dupliqués avec des
+mots changés (voir bench_similarity). L'index et la base sont écrits dans
+un dossier temporaire.
+
+Usage : python benchmarks/bench_batch_similarity.py [tailles...]
+'''
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import sqlalchemy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from batch_similarity import SIMILAR_TABLE, update_similar_offers
+from bench_similarity import make_documents
+from hybrid import update_hybrid_index
+
+
+def make_offers(size: int, prefix: str = "offre", seed: int = 0) -> pd.DataFrame:
+    return pd.DataFrame({"id": [f"{prefix}{i}" for i in range(size)], "description": make_documents(size, seed)})
+
+
+def main(sizes: list):
+    print(f"{'offres':>8}{'complet (s)':>13}{'incrémental (s)':>17}{'recalculées':>13}{'identiques':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            text_path = os.path.join(tmp, "tfidf_text")
+            path = os.path.join(tmp, "hybrid")
+            db_url = f"sqlite:///{os.path.join(tmp, 'job_offers.sqlite')}"
+            offers = make_offers(size)
+            index = update_hybrid_index(offers, text_path)
+            start = time.perf_counter()
+            update_similar_offers(index, path, db_url)
+            full_time = time.perf_counter() - start
+
+            changed = max(size // 100, 1)
+            offers = offers.iloc[changed:].reset_index(drop=True)
+            offers.loc[:changed - 1, "description"] = offers["description"].iloc[-changed:].to_numpy()
+            offers = pd.concat([offers, make_offers(changed, "nouvelle", seed=1)], ignore_index=True)
+            index = update_hybrid_index(offers, text_path)
+            start = time.perf_counter()
+            recomputed = update_similar_offers(index, path, db_url)["offer_id"].nunique()
+            incremental_time = time.perf_counter() - start
+
+            engine = sqlalchemy.create_engine(db_url)
+            incremental = pd.read_sql_table(SIMILAR_TABLE, con=engine).sort_values(["offer_id", "rank"])
+            full = update_similar_offers(index, path, db_url, full=True).sort_values(["offer_id", "rank"])
+            same = (incremental["similar_id"].to_numpy() == full["similar_id"].to_numpy()).mean()
+            engine.dispose()
+        print(f"{size:>8}{full_time:>13.2f}{incremental_time:>17.2f}{recomputed:>13}{same:>12.1%}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [5_000, 20_000])
@@ -0,0 +1,71 @@
+'''
+Mesure la détection des doublons (`dedup.find_near_duplicates`) sur des
+lots de taille croissante : temps, et part des doublons plantés
+retrouvés.
+
+Les offres sont tirées de datasets/all_jobs.parquet avec quelques mots
+changés (offres distinctes), et une offre sur dix est republiée avec un
+nouvel id, une autre date et quelques mots modifiés (doublon à
+retrouver).
+
+Usage : python benchmarks/bench_dedup.py [tailles...]
+'''
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from dedup import find_near_duplicates
+
+DUPLICATE_SHARE = 0.1
+
+
+def perturb(text: str, rng: np.random.Generator, changes: int) -> str:
+    words = text.split()
+    for position in rng.integers(0, max(len(words), 1), changes):
+        if words:
+            words[position] = f"mot{rng.integers(1_000_000)}"
+    return " ".join(words)
+
+
+def make_offers(df: pd.DataFrame, size: int, seed: int = 0) -> tuple:
+    '''
+    Retourne (offres, position de l'original de chaque doublon planté).
+    '''
+    rng = np.random.default_rng(seed)
+    originals = size - int(size * DUPLICATE_SHARE)
+    source = df.iloc[rng.integers(0, len(df), originals)].reset_index(drop=True)
+    # Offres distinctes : une trentaine de mots changés par copie.
+    source["description"] = [perturb(text, rng, 30) for text in source["description"]]
+    source["id"] = [f"offre{i}" for i in range(originals)]
+    picked = rng.integers(0, originals, size - originals)
+    duplicates = source.iloc[picked].reset_index(drop=True)
+    duplicates["description"] = [perturb(text, rng, 3) for text in duplicates["description"]]
+    duplicates["id"] = [f"republiee{i}" for i in range(len(duplicates))]
+    duplicates["date_modif"] = duplicates["date_modif"] + pd.Timedelta(days=1)
+    offers = pd.concat([source, duplicates], ignore_index=True)
+    return offers, picked
+
+
+def main(sizes: list):
+    df = pd.read_parquet("datasets/all_jobs.parquet")
+    print(f"{'offres':>8}{'temps (s)':>12}{'doublons retrouvés':>20}{'groupes':>10}")
+    for size in sizes:
+        offers, picked = make_offers(df, size)
+        start = time.perf_counter()
+        result = find_near_duplicates(offers)
+        elapsed = time.perf_counter() - start
+        clusters = result["groupe_doublons"].to_numpy()
+        originals = len(offers) - len(picked)
+        found = (clusters[originals:] == clusters[picked]).mean()
+        print(f"{size:>8}{elapsed:>12.2f}{found:>20.1%}{len(np.unique(clusters)):>10}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [2_000, 10_000, 50_000])
@@ -0,0 +1,93 @@
+'''
+Compare l'extraction de texte html de html_text.py à BeautifulSoup sur les
+descriptions de datasets/all_jobs.parquet : égalité des textes nettoyés et
+débit, sur un seul processus puis avec le mode par lots.
+
+Les descriptions du dataset sont déjà nettoyées : elles sont aussi
+remises en forme html (paragraphes, listes, gras, entités) pour mesurer
+le cas des réponses API brutes.
+
+Usage : python benchmarks/bench_html_text.py [copies_pour_le_mode_lots]
+'''
+import html
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+from bs4 import BeautifulSoup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from html_text import clean_html, clean_html_column
+
+
+def clean_html_bs4(text):
+    # Ancienne version de tools.clean_html.
+    if pd.isna(text):
+        return ""
+    soup = BeautifulSoup(str(text), 'html.parser')
+    cleaned_text = soup.get_text(separator=" ")
+    cleaned_text = cleaned_text.replace("\xa0", " ").replace("\n", "")
+    return cleaned_text
+
+
+def to_html(text: str) -> str:
+    '''
+    Remet une description nettoyée en forme html.
+    '''
+    sentences = re.split(r"(?<=[.!?])\s+", html.escape(text))
+    paragraphs = []
+    for i, sentence in enumerate(sentences):
+        sentence = re.sub(r"\b(\w{9,})\b", r"<strong>\1</strong>", sentence, count=1)
+        if i % 4 == 3:
+            paragraphs.append(f"<ul>\n  <li>{sentence}</li>\n  <li>&nbsp;</li>\n</ul>")
+        else:
+            paragraphs.append(f"<p>{sentence}</p>")
+    return "\n".join(paragraphs)
+
+
+def chrono(function) -> tuple:
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def compare(name: str, texts: pd.Series):
+    size = texts.str.len().sum() / 1024 ** 2
+    old, old_time = chrono(lambda: texts.apply(clean_html_bs4))
+    new, new_time = chrono(lambda: texts.apply(clean_html))
+    identiques = (old == new).mean()
+    print(
+        f"{name}: {len(texts)} textes ({size:.1f} Mo), BeautifulSoup {old_time:.2f} s "
+        f"({size / old_time:.1f} Mo/s), html_text {new_time:.2f} s "
+        f"({size / new_time:.1f} Mo/s), x{old_time / new_time:.1f}, identiques : {identiques:.2%}"
+    )
+
+
+def main(copies: int = 20):
+    df = pd.read_parquet(os.path.join(ROOT, "datasets/all_jobs.parquet"))
+    descriptions = df["description"].dropna()
+    compare("Descriptions (texte)", descriptions)
+    html_descriptions = descriptions.apply(to_html)
+    compare("Descriptions (html)", html_descriptions)
+    compare("Descriptions entreprise (html)", df["description_entreprise"].dropna().apply(to_html))
+
+    # Mode par lots : textes tous distincts pour que chacun soit nettoyé.
+    batch = pd.concat(
+        [html_descriptions + f"<p>{i}</p>" for i in range(copies)], ignore_index=True
+    )
+    _, sequential_time = chrono(lambda: clean_html_column(batch, processes=1))
+    for processes in sorted({2, 4, os.cpu_count()}):
+        _, pool_time = chrono(lambda: clean_html_column(batch, processes=processes))
+        print(
+            f"Lot de {len(batch)} textes : 1 processus {sequential_time:.2f} s, "
+            f"{processes} processus {pool_time:.2f} s (x{sequential_time / pool_time:.1f})"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
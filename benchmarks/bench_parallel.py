@@ -0,0 +1,83 @@
+'''
+Mesure l'accélération de `map_chunks` sur la partie calcul du scrapping
+(nettoyage des offres WTTJ puis compétences, valeurs manquantes et villes)
+avec 1, 2, 4 et 8 processus.
+
+Les offres brutes sont reconstruites à partir de datasets/all_jobs.parquet
+(descriptions remises en html) et dupliquées pour obtenir un gros lot.
+
+Usage : python benchmarks/bench_parallel.py [copies]
+'''
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from bench_html_text import to_html
+from parallel import default_workers, map_chunks
+from projection import project_records
+from tools import WTTJ_FIELDS, enrich_offers, global_clean_wttj
+
+CONTRATS = {"CDI": "full_time", "Stage": "internship", "Alternance": "apprenticeship", "CDD": "temporary"}
+
+
+def raw_wttj_jobs(df: pd.DataFrame, copies: int) -> list:
+    '''
+    Offres au format de l'API WTTJ, une par ligne du dataset et par copie.
+    '''
+    jobs = []
+    for copy in range(copies):
+        for row in df.itertuples():
+            jobs.append({
+                "reference": f"{row.id}-{copy}",
+                "name": row.intitule,
+                "description": to_html(row.description) + f"<p>{copy}</p>",
+                "published_at": row.date_publication.isoformat(),
+                "updated_at": row.date_modif.isoformat(),
+                "contract_type": CONTRATS.get(row.contrat, "other"),
+                "education_level": "bac_5",
+                "experience_level": "1_TO_2_YEARS",
+                "salary_period": "yearly",
+                "salary_min": 40,
+                "salary_max": 50,
+                "organization": {
+                    "name": row.entreprise,
+                    "description": to_html(row.description_entreprise),
+                    "industry": row.secteur_activite,
+                    "logo": {"url": row.logo},
+                },
+                "office": {"city": row.ville, "latitude": row.latitude, "longitude": row.longitude},
+                "urls": [{"href": row.link}],
+            })
+    return jobs
+
+
+def clean_and_enrich(df: pd.DataFrame) -> pd.DataFrame:
+    return enrich_offers(global_clean_wttj(df))
+
+
+def main(copies: int = 10):
+    df = pd.read_parquet("datasets/all_jobs.parquet")
+    raw = project_records(raw_wttj_jobs(df, copies), WTTJ_FIELDS)
+    print(f"{len(raw)} offres, {default_workers()} cœur(s) disponible(s)")
+    reference = None
+    for workers in (1, 2, 4, 8):
+        start = time.perf_counter()
+        result = map_chunks(clean_and_enrich, raw, workers=workers)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference, reference_time = result, elapsed
+        identique = result.astype(str).equals(reference.astype(str))
+        print(
+            f"{workers} processus : {elapsed:.2f} s, x{reference_time / elapsed:.2f}, "
+            f"résultat identique : {identique}"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,144 @@
+'''
+Compare la normalisation vectorisée des salaires (salary.py) aux anciennes
+fonctions ligne par ligne `clean_salaire_pe` / `clean_salaire_wttj` :
+temps d'exécution et égalité des salaires annuels.
+
+Usage : python benchmarks/bench_salary.py [nombre_de_lignes]
+'''
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from salary import SALAIRE_NON_INDIQUE, salaires_pe, salaires_wttj
+
+
+# Anciennes fonctions de tools.py, appliquées ligne par ligne.
+def clean_salaire_pe(text):
+    if text:
+        if "Annuel" in text:
+            matches = re.findall(r'\d+,\d+', text)
+            if matches:
+                salaries = [float(match.replace(',', '.')) for match in matches]
+                average_salary = sum(salaries) / len(salaries)
+                return f'{int(average_salary)}'
+        elif "Mensuel" in text:
+            matches = re.findall(r'\d+,\d+', text)
+            if matches:
+                monthly_salaries = [float(match.replace(',', '.')) for match in matches]
+                average_salary = sum(monthly_salaries) / len(monthly_salaries)
+                average_annual_salary = average_salary * 12
+                return f'{int(average_annual_salary)}'
+        elif "Horaire" in text:
+            matches = re.findall(r'\d+,\d+', text)
+            if matches:
+                hourly_salaries = [float(match.replace(',', '.')) for match in matches]
+                average_salary = sum(hourly_salaries) / len(hourly_salaries)
+                average_annual_salary = average_salary * 35 * 52
+                return f'{int(average_annual_salary)}'
+    return f'Salaire non indiqué'
+
+def clean_salaire_wttj(salary_period, salary_max, salary_min):
+    if salary_period:
+        if salary_period == "yearly":
+            if salary_max and salary_min:
+                salary = (salary_max + salary_min) / 2
+                if salary < 100:
+                    salary *= 1000
+                return f'{int(salary)}'
+            else:
+                return f'Salaire non indiqué'
+        elif salary_period == "monthly":
+            if salary_max and salary_min:
+                monthly_max = salary_max * 12
+                monthly_min = salary_min * 12
+                monthly_salary = (monthly_max + monthly_min) / 2
+                return f'{int(monthly_salary)}'
+            else:
+                return f'Salaire non indiqué'
+    else:
+        return f'Salaire non indiqué'
+
+
+def pe_sample(n: int, rng: np.random.Generator) -> pd.Series:
+    libelles = np.array([
+        "Annuel de {a},00 Euros à {b},00 Euros sur 12 mois",
+        "Annuel de {a},00 Euros sur 12 mois",
+        "Mensuel de {m},00 Euros à {n},00 Euros sur 12 mois",
+        "Mensuel de {m},00 Euros sur 13 mois",
+        "Horaire de {h},50 Euros sur 12 mois",
+        "Selon profil",
+        None,
+    ], dtype=object)
+    choix = rng.integers(0, len(libelles), n)
+    # Montants arrondis comme dans les offres réelles.
+    a = rng.integers(30, 60, n) * 1000
+    m = rng.integers(18, 45, n) * 100
+    h = rng.integers(11, 30, n)
+    return pd.Series([
+        None if libelles[c] is None else libelles[c].format(
+            a=a[i], b=a[i] + 5000, m=m[i], n=m[i] + 500, h=h[i]
+        )
+        for i, c in enumerate(choix)
+    ])
+
+
+def wttj_sample(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    periode = rng.choice(np.array(["yearly", "monthly", None], dtype=object), n)
+    salary_min = rng.integers(35, 60, n).astype(float)
+    # Montants en euros pour la moitié des offres, en milliers sinon.
+    salary_min = np.where(rng.random(n) < 0.5, salary_min * 1000, salary_min)
+    salary_min = np.where(periode == "monthly", salary_min / 12, salary_min)
+    salary_min = np.where(periode == "monthly", np.maximum(salary_min, 100), salary_min)
+    return pd.DataFrame({
+        "salary_period": periode,
+        # Borne non renseignée (0, un NaN fait planter l'ancienne fonction).
+        "salary_min": np.where(rng.random(n) < 0.1, 0, salary_min),
+        "salary_max": salary_min * 1.2,
+    })
+
+
+def chrono(function) -> tuple:
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def compare(name: str, old: pd.Series, new: pd.DataFrame, old_time: float, new_time: float):
+    old_numeric = old != SALAIRE_NON_INDIQUE
+    egaux = (old[old_numeric].astype(int) == new.loc[old_numeric, "salaire"].astype(int)).mean()
+    print(
+        f"{name}: {len(old)} lignes, ancien {old_time:.3f} s, vectorisé {new_time:.3f} s "
+        f"(x{old_time / new_time:.1f}), salaires identiques : {egaux:.2%}, "
+        f"salaires numériques {old_numeric.sum()} -> {new['salaire_annuel'].notna().sum()}"
+    )
+
+
+def main(n: int = 200_000):
+    rng = np.random.default_rng(0)
+    libelles = pe_sample(n, rng)
+    old, old_time = chrono(lambda: libelles.apply(clean_salaire_pe))
+    new, new_time = chrono(lambda: salaires_pe(libelles))
+    compare("Pole Emploi", old, new, old_time, new_time)
+
+    df = wttj_sample(n, rng)
+    old, old_time = chrono(lambda: df.apply(lambda row: clean_salaire_wttj(
+        row["salary_period"], row["salary_max"], row["salary_min"]
+    ), axis=1))
+    # Borne manquante : l'ancienne fonction renvoie "Salaire non indiqué",
+    # la nouvelle utilise la borne renseignée.
+    old = old.fillna(SALAIRE_NON_INDIQUE)
+    new, new_time = chrono(lambda: salaires_wttj(
+        df["salary_period"], df["salary_min"], df["salary_max"]
+    ))
+    compare("WTTJ", old, new, old_time, new_time)
+    print(new.dtypes.to_string())
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
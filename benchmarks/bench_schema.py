@@ -0,0 +1,83 @@
+'''
+Compare le dataset des offres écrit par `DataFrame.to_parquet` (colonnes
+texte en objets Python, compétences en tableaux numpy) et écrit avec
+ALL_JOBS_SCHEMA : taille du fichier, temps de lecture et mémoire occupée
+une fois chargé.
+
+Le dataset est dupliqué pour obtenir un gros lot.
+
+Usage : python benchmarks/bench_schema.py [copies]
+'''
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from schema import ALL_JOBS_PATH, memory_report, read_all_jobs, write_all_jobs
+
+
+def timed(func, repeat: int = 5) -> tuple:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main(copies: int):
+    df = pd.read_parquet(ALL_JOBS_PATH).astype({"tech_skills": object, "soft_skills": object})
+    df = pd.concat([df] * copies, ignore_index=True)
+    print(f"{len(df)} offres")
+    with tempfile.TemporaryDirectory() as directory:
+        untyped_path = os.path.join(directory, "untyped.parquet")
+        typed_path = os.path.join(directory, "typed.parquet")
+        df.to_parquet(untyped_path, index=False)
+        write_all_jobs(df, typed_path)
+
+        untyped, untyped_time = timed(lambda: pd.read_parquet(untyped_path))
+        typed, typed_time = timed(lambda: read_all_jobs(typed_path))
+        untyped_report = memory_report(untyped)
+        typed_report = memory_report(typed)
+
+        print(f"{'':<12}{'fichier (Mo)':>14}{'lecture (s)':>14}{'mémoire (Mo)':>14}")
+        for name, path, seconds, report in (
+            ("objets", untyped_path, untyped_time, untyped_report),
+            ("typé", typed_path, typed_time, typed_report),
+        ):
+            print(
+                f"{name:<12}{os.path.getsize(path) / 1024 ** 2:>14.2f}"
+                f"{seconds:>14.3f}{report['memoire_mo'].sum():>14.2f}"
+            )
+        print()
+        print(pd.concat(
+            {"objets": untyped_report, "typé": typed_report}, axis=1,
+        ).sort_values(("objets", "memoire_mo"), ascending=False).to_string(
+            float_format=lambda value: f"{value:.3f}",
+        ))
+
+        # Les valeurs lues sont les mêmes.
+        for col in df.columns:
+            expected = untyped[col].astype(object).map(_comparable)
+            found = typed[col].astype(object).map(_comparable)
+            if col in ("salaire_min", "salaire_max", "salaire_annuel", "latitude", "longitude"):
+                expected = pd.to_numeric(expected).astype("float32")
+                found = pd.to_numeric(found).astype("float32")
+            pd.testing.assert_series_equal(expected, found, check_dtype=False)
+        print("\nValeurs identiques.")
+
+
+def _comparable(value):
+    if pd.api.types.is_list_like(value):
+        return tuple(value)
+    return None if pd.isna(value) else value
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,81 @@
+'''
+Mesure une requête "offres similaires" (`similarity.query_row`) sur des
+corpus de taille croissante, comparée au calcul de la matrice de
+similarité complète (`cosine_similarity`) tant qu'elle tient en mémoire.
+
+Les documents sont ceux de datasets/all_jobs.parquet, dupliqués avec des
+mots changés pour obtenir un gros corpus.
+
+Usage : python benchmarks/bench_similarity.py [tailles...]
+'''
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from similarity import posting_lists, query_row
+from text_norm import normalize_column
+
+# Taille maximale du corpus pour la matrice complète.
+DENSE_MAX_SIZE = 10_000
+
+
+def make_documents(size: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    base = normalize_column(pd.read_parquet("datasets/all_jobs.parquet")["description"]).tolist()
+    documents = []
+    for i in range(size):
+        words = base[i % len(base)].split()
+        for position in rng.integers(0, max(len(words), 1), 10):
+            if words:
+                words[position] = f"mot{rng.integers(100_000)}"
+        documents.append(" ".join(words))
+    return documents
+
+
+def main(sizes: list):
+    print(
+        f"{'offres':>8}{'requête (ms)':>14}{'avec listes (ms)':>18}"
+        f"{'matrice complète (s)':>22}{'mémoire complète (Mo)':>24}"
+    )
+    for size in sizes:
+        matrix = TfidfVectorizer().fit_transform(make_documents(size))
+        rows = np.random.default_rng(1).integers(0, size, 20)
+        start = time.perf_counter()
+        results = [query_row(matrix, row, 5) for row in rows]
+        query_time = (time.perf_counter() - start) / len(rows) * 1000
+        postings = posting_lists(matrix)
+        start = time.perf_counter()
+        for row, (positions, scores) in zip(rows, results):
+            found, found_scores = query_row(matrix, row, 5, postings)
+            assert np.allclose(found_scores, scores)
+        postings_time = (time.perf_counter() - start) / len(rows) * 1000
+        dense = "-"
+        if size <= DENSE_MAX_SIZE:
+            start = time.perf_counter()
+            similarities = cosine_similarity(matrix)
+            dense = f"{time.perf_counter() - start:.2f}"
+            for row, (positions, _) in zip(rows, results):
+                expected = np.argsort(-similarities[row], kind="stable")
+                expected = expected[expected != row][:5]
+                assert set(positions) == set(expected) or np.allclose(
+                    np.sort(similarities[row][positions]), np.sort(similarities[row][expected])
+                )
+            del similarities
+        print(
+            f"{size:>8}{query_time:>14.2f}{postings_time:>18.2f}"
+            f"{dense:>22}{size * size * 8 / 1024 ** 2:>24.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [2_000, 10_000, 50_000])
@@ -0,0 +1,139 @@
+import atexit
+import logging
+import queue
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+from selenium.webdriver.firefox.service import Service
+from webdriver_manager.firefox import GeckoDriverManager
+
+
+class BrowserPool:
+    '''
+    Pool de navigateurs Firefox headless gardés ouverts entre les appels.
+    Les pages sont réparties en parallèle sur les navigateurs (un thread
+    par navigateur) et les pages en timeout sont réessayées.
+    ---
+    Paramètres:
+    ---
+    size: int: nombre de navigateurs ouverts au maximum.
+    retries: int: nombre de nouvelles tentatives pour une page en timeout.
+    page_load_timeout: float: temps maximum (s) de chargement d'une page.
+    '''
+    def __init__(
+            self,
+            size: int = 3,
+            retries: int = 2,
+            page_load_timeout: float = 30,
+        ):
+        self.size = size
+        self.retries = retries
+        self.page_load_timeout = page_load_timeout
+        self._drivers = queue.Queue()
+        self._all_drivers = []
+        self._lock = threading.Lock()
+        self._service_path = None
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="browser")
+
+    def _new_driver(self):
+        if self._service_path is None:
+            self._service_path = GeckoDriverManager().install()
+        options = FirefoxOptions()
+        options.add_argument("--headless")
+        driver = webdriver.Firefox(
+            options=options,
+            service=Service(self._service_path),
+        )
+        driver.set_page_load_timeout(self.page_load_timeout)
+        return driver
+
+    def _acquire(self):
+        try:
+            return self._drivers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all_drivers) < self.size:
+                driver = self._new_driver()
+                self._all_drivers.append(driver)
+                return driver
+        return self._drivers.get()
+
+    def _discard(self, driver):
+        with self._lock:
+            if driver in self._all_drivers:
+                self._all_drivers.remove(driver)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def _load(self, url: str, parse):
+        for attempt in range(self.retries + 1):
+            driver = self._acquire()
+            healthy = True
+            try:
+                driver.get(url)
+                return parse(driver)
+            except TimeoutException:
+                logging.warning(f"Timeout on {url} (attempt {attempt + 1}/{self.retries + 1})")
+            except WebDriverException as e:
+                # Navigateur planté : il est remplacé à la prochaine page.
+                logging.warning(f"Browser error on {url}: {e.msg}")
+                healthy = False
+            finally:
+                if healthy:
+                    self._drivers.put(driver)
+                else:
+                    self._discard(driver)
+        logging.error(f"Could not load {url} after {self.retries + 1} attempts.")
+        return None
+
+    def submit(self, url: str, parse) -> Future:
+        '''
+        Charge `url` sur un navigateur libre et applique `parse(driver)`.
+        ---
+        Retourne:
+        ---
+        Future contenant le résultat de `parse`, ou None si la page n'a pas
+        pu être chargée.
+        '''
+        return self._executor.submit(self._load, url, parse)
+
+    def map(self, urls: list, parse) -> list:
+        '''
+        Charge toutes les pages en parallèle et retourne les résultats dans
+        l'ordre des urls.
+        '''
+        return [future.result() for future in [self.submit(url, parse) for url in urls]]
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            drivers, self._all_drivers = self._all_drivers, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_browser_pool(size: int = 3) -> BrowserPool:
+    '''
+    Retourne le pool de navigateurs partagé par tous les appels (créé au
+    premier appel et fermé à la fin du programme).
+    '''
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = BrowserPool(size)
+            atexit.register(_POOL.close)
+        return _POOL
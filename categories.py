@@ -0,0 +1,115 @@
+import re
+
+import pandas as pd
+
+
+# Types de contrat WTTJ et Pole Emploi, les autres valeurs sont gardées.
+CONTRATS_WTTJ = {
+    "full_time": "CDI",
+    "internship": "Stage",
+    "apprenticeship": "Alternance",
+    "temporary": "CDD",
+    "other": "Autre",
+    "vie": "CDI",
+    "freelance": "Freelance",
+    "part_time": "CDI",
+}
+CONTRATS_PE = {
+    "MIS": "Interim",
+    "FRA": "Autre",
+    "LIB": "Autre",
+}
+
+EXPERIENCES = {
+    "Débutant accepté (0 YEAR)": "Débutant accepté",
+    "LESS_THAN_6_MONTHS": "Débutant accepté",
+    "6_MONTHS_TO_1_YEAR": "6 mois",
+    "Expérience exigée de 1 An(s)": "1 an",
+    "1_TO_2_YEARS": "1 an",
+    "Expérience exigée de 2 An(s)": "2 ans",
+    "24 mois": "2 ans",
+    "2_TO_3_YEARS": "2 ans",
+    "Expérience exigée de 3 An(s)": "3 ans",
+    "Expérience souhaitée de 3 An(s)": "3 ans",
+    "3_TO_4_YEARS": "3 ans",
+    "36 mois": "3 ans",
+    "4_TO_5_YEARS": "4 ans",
+    "Expérience exigée de 4 An(s)": "4 ans",
+    "5 ans - DATA ANALYST": "5 ans",
+    "5 ans - 5 ans minimum": "5 ans",
+    "Expérience exigée de 5 An(s)": "5 ans",
+    "5_TO_7_YEARS": "5 ans",
+    "Expérience exigée de 6 An(s)": "+5 ans",
+    "7_TO_10_YEARS": "+5 ans",
+    "10_TO_15_YEARS": "10 ans",
+    "Expérience exigée": "Non spécifié",
+    "Expérience souhaitée": "Non spécifié",
+}
+
+# Motifs recherchés dans le niveau d'études, dans l'ordre.
+NIVEAUX_ETUDES = [
+    (("bac+5", "bac_5"), "Bac +5"),
+    (("bac+4", "bac_4"), "Bac +4"),
+    (("bac+3", "bac_3"), "Bac +3"),
+    (("bac+2", "bac_2"), "Bac +2"),
+]
+
+
+def categorize(
+        values: pd.Series,
+        rule,
+        na: str = None,
+    ) -> pd.Series:
+    '''
+    Normalise une colonne à peu de valeurs distinctes : la règle n'est
+    appliquée qu'une fois par valeur distincte, puis le résultat est
+    renvoyé sur toutes les lignes sous forme de Categorical.
+    ---
+    Paramètres:
+    ---
+    values: pd.Series: valeurs brutes.
+    rule: dict ou fonction: table de correspondance (les valeurs absentes
+    de la table sont gardées) ou fonction appliquée à chaque valeur.
+    na: str: valeur des lignes manquantes (None pour les garder vides).
+    ---
+    Retourne:
+    ---
+    pd.Series de type category, avec le même index que `values`.
+    '''
+    codes, uniques = pd.factorize(values)
+    if isinstance(rule, dict):
+        normalized = [rule.get(value, value) for value in uniques]
+    else:
+        normalized = [rule(value) for value in uniques]
+    # Code -1 (valeur manquante) : dernière valeur ajoutée.
+    normalized.append(na)
+    normalized_codes, categories = pd.factorize(pd.Series(normalized, dtype=object))
+    return pd.Series(
+        pd.Categorical.from_codes(normalized_codes[codes], categories),
+        index=values.index,
+        name=values.name,
+    )
+
+
+def clean_niveau_etude(text) -> str:
+    '''
+    Nettoie une valeur de la colonne "niveau_etudes".
+    '''
+    text = str(text).lower().strip()
+    for patterns, niveau in NIVEAUX_ETUDES:
+        if any(pattern in text for pattern in patterns):
+            return niveau
+    return "Non spécifié"
+
+def clean_ville_pe(text: str) -> str:
+    '''
+    Retire le numéro de département des villes Pole Emploi
+    ("75 - PARIS 15" -> "Paris").
+    '''
+    return re.sub(r"\d+", "", text.title()).replace("-", "").strip()
+
+def clean_ville(text: str) -> str:
+    text = text.replace("-", " ").replace("'", " ")
+    text = text.lower()
+    text = text.title()
+    return text
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+
+import pandas as pd
+
+from http_client import loads
+
+
+# Au-delà, les offres sauvegardées sont trop anciennes pour être reprises.
+CHECKPOINT_MAX_AGE = 2 * 24 * 3600
+
+
+class Checkpoint:
+    '''
+    Sauvegarde sur disque du résultat de chaque étape d'un scrapping (liens
+    récupérés, réponses API brutes, dataframes nettoyés et enrichis) pour
+    reprendre un scrapping interrompu à la dernière étape terminée.
+    ---
+    Paramètres:
+    ---
+    path: str: dossier des sauvegardes du scrapping.
+    key: str: élément sauvegardé par défaut (ex: "wttj_Data Analyst"),
+    voir `scoped`.
+    run: dict: paramètres du scrapping (intitulés, sources, pages...). Les
+    sauvegardes d'un scrapping aux paramètres différents, ou commencé il y
+    a plus de `max_age` secondes, sont supprimées au lieu d'être reprises.
+    max_age: float: âge maximum (s) d'un scrapping repris, compté depuis
+    son début (un scrapping commencé avant minuit reste repris le
+    lendemain).
+    '''
+    def __init__(
+            self,
+            path: str = "checkpoints/all",
+            key: str = None,
+            run: dict = None,
+            max_age: float = CHECKPOINT_MAX_AGE,
+        ):
+        self.path = path
+        self.key = key
+        if run is not None:
+            self._check_run(run, max_age)
+        os.makedirs(path, exist_ok=True)
+
+    def _check_run(self, run: dict, max_age: float):
+        # Empreinte des paramètres et début du scrapping enregistrés avec
+        # les sauvegardes.
+        run_hash = hashlib.blake2b(
+            json.dumps(run, sort_keys=True, default=str).encode(), digest_size=8
+        ).hexdigest()
+        file = os.path.join(self.path, "run.json")
+        if os.path.exists(file):
+            with open(file, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("hash") != run_hash:
+                logging.info(f"Checkpoint in {self.path} comes from another run, discarding it.")
+            elif time.time() - saved.get("started", 0) > max_age:
+                logging.info(f"Checkpoint in {self.path} is too old, discarding it.")
+            else:
+                return
+            self.clear()
+        saved = {"hash": run_hash, "run": run, "started": time.time()}
+        self._write(file, lambda tmp_file: _dump_json(saved, tmp_file))
+
+    def scoped(self, key: str) -> "Checkpoint":
+        '''
+        Retourne un Checkpoint du même dossier dont les méthodes utilisent
+        `key` par défaut.
+        '''
+        return Checkpoint(self.path, key)
+
+    def _file(self, stage: str, key: str, extension: str) -> str:
+        key = re.sub(r"[^\w\-]+", "_", key or self.key)
+        return os.path.join(self.path, stage, f"{key}.{extension}")
+
+    def _write(self, file: str, write):
+        # Écriture atomique : une étape interrompue n'est jamais considérée
+        # comme terminée.
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        tmp_file = f"{file}.tmp"
+        write(tmp_file)
+        os.replace(tmp_file, file)
+
+    def done(self, stage: str, key: str = None) -> bool:
+        '''
+        Indique si l'étape `stage` est terminée pour `key`.
+        '''
+        return any(
+            os.path.exists(self._file(stage, key, extension))
+            for extension in ("parquet", "json")
+        )
+
+    def save_frame(self, stage: str, df: pd.DataFrame, key: str = None):
+        self._write(
+            self._file(stage, key, "parquet"),
+            lambda file: df.to_parquet(file, index=False),
+        )
+
+    def load_frame(self, stage: str, key: str = None) -> pd.DataFrame:
+        logging.info(f"Resuming {key or self.key} from checkpoint ({stage})...")
+        return pd.read_parquet(self._file(stage, key, "parquet"))
+
+    def save_json(self, stage: str, obj, key: str = None):
+        self._write(self._file(stage, key, "json"), lambda file: _dump_json(obj, file))
+
+    def load_json(self, stage: str, key: str = None):
+        logging.info(f"Resuming {key or self.key} from checkpoint ({stage})...")
+        with open(self._file(stage, key, "json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    async def record_links(self, api_links, key: str = None):
+        '''
+        Générateur asynchrone qui renvoie les liens de `api_links` (liste
+        ou générateur asynchrone) et les sauvegarde une fois tous récupérés.
+        '''
+        links = []
+        if isinstance(api_links, list):
+            links = api_links
+            for link in api_links:
+                yield link
+        else:
+            async for link in api_links:
+                links.append(link)
+                yield link
+        self.save_json("links", links, key)
+
+    def load_responses(self, key: str = None) -> dict:
+        '''
+        Charge les réponses API déjà récupérées, indexées par url.
+        '''
+        file = self._file("responses", key, "jsonl")
+        responses = {}
+        if not os.path.exists(file):
+            return responses
+        with open(file, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = loads(line)
+                except json.JSONDecodeError:
+                    # Dernière ligne incomplète si le scrapping a été coupé.
+                    continue
+                responses[item["url"]] = item["response"]
+        if responses:
+            logging.info(f"Resuming {key or self.key}: {len(responses)} responses already fetched.")
+        return responses
+
+    def append_response(self, url: str, response, key: str = None):
+        '''
+        Ajoute une réponse API au journal des réponses récupérées.
+        '''
+        file = self._file("responses", key, "jsonl")
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"url": url, "response": response}, ensure_ascii=False) + "\n")
+
+    def clear(self):
+        '''
+        Supprime toutes les sauvegardes une fois le scrapping terminé.
+        '''
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def _dump_json(obj, file: str):
+    with open(file, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, default=str)
@@ -1,78 +1,35 @@
-import pandas as pd
-import sklearn as sklearn
-import nltk
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-
-# import du dataframe all_jobs
-df = pd.read_parquet("datasets/all_jobs.parquet")
-
-# rajout d'une colonne cl_descr = description nettoyee
-df["cl_descr"] = np.nan
-for i in range(df.index.stop) :
-    texte = df["description"][i]
-    mots = nltk.word_tokenize(texte)
-
-    stop_words = nltk.corpus.stopwords.words("french")
-    stop_ponc = [ ',' ,'!', '?', '(', ')', '[', ']', '-', '.', ':',';', '/', """'"""]
-
-    cl_mots = []
-    for word in mots:
-        if word.lower() not in stop_words and word.lower() not in stop_ponc:
-            cl_mots.append(word)
-    print(cl_mots)
-    #print(c_texte)
-    df["cl_descr"][i] = cl_mots
-
-
-#df_ml = df intermediaire avec selection des colonnes pour le ml
-features = ['contrat', 'intitule', 'secteur_activite', 'experience', 'ville', 'tech_skills', 'soft_skills', 'cl_descr']
-df_ml = df[features]
-
-for feature in features:
-  if df_ml[feature].isnull().any() or df_ml[feature].empty:
-    df_ml[feature] = df[feature].fillna('', inplace=True)
-
-df_ml["text_data"] = df_ml.fillna('').astype(str).apply(lambda x: ' '.join(x), axis=1)
-
-df["text_ml"] = np.nan
-for i in range(df.index.stop) :
-    texte = df_ml["text_data"][i]
-    mots = nltk.word_tokenize(texte)
-
-    stop_words = nltk.corpus.stopwords.words("french")
-    stop_ponc = [ ',' ,'!', '?', '(', ')', '[', ']', '-', '.', ':',';', '/','_',"'"]
-
-    cl_mots = []
-    for word in mots:
-        if word.lower() not in stop_words and word.lower() not in stop_ponc:
-            cl_mots.append(word)
-    print(cl_mots)
-    #print(c_texte)
-    df["text_ml"][i] = cl_mots
-
-
-df["text_ml"].apply(lambda x: ' '.join(x))
-
-documents = df["text_ml"].astype(str).tolist()
-
-tfidf = TfidfVectorizer()
-count_matrix = tfidf.fit_transform(documents)
-
-cosine_sim = cosine_similarity(count_matrix)
-
-# index de l'offre que l'utilisateur aime :
-user_likes_index = 24
-# Get the cosine similarity scores pour l'offre que l'utilisateur aime
-similarities = cosine_sim[user_likes_index]
-
-# Get indices of offers sorted by similarity
-similar_offers_indices = similarities.argsort()[::-1][1:6]
-
-# Get the actual DataFrame rows for similar offers
-similar_offers = df.loc[similar_offers_indices]
-
-# Print
-print(similar_offers_indices)
-print(similar_offers)
+from ann import update_ann_index
+from hybrid import update_hybrid_index
+from schema import read_all_jobs
+
+# Point d'entrée protégé : les processus lancés sous Windows réimportent
+# ce module (voir main.py).
+if __name__ == "__main__":
+    # import du dataframe all_jobs
+    df = read_all_jobs()
+
+    # Score hybride : cosinus TF-IDF du texte (intitulé, secteur, description,
+    # index enregistré dans index/tfidf_text et mis à jour pour les seules
+    # offres nouvelles ou modifiées), plus même contrat, expérience, niveau
+    # d'études et métier, compétences communes et proximité géographique.
+    # Les poids se règlent avec update_hybrid_index(df, weights={...}).
+    index = update_hybrid_index(df)
+    # Index approché (index/ann, reconstruit quand le score a changé) : une
+    # requête ne lit que les offres des listes les plus proches, puis les
+    # classe avec leur vrai score. None pour un petit catalogue (recherche
+    # exacte).
+    ann_index = update_ann_index(index)
+
+    # index de l'offre que l'utilisateur aime :
+    user_likes_index = 24
+    offer_id = df["id"][user_likes_index]
+    # Offres les plus similaires (sans calculer la matrice de similarité de
+    # toutes les paires d'offres)
+    similar = index.similar(offer_id, k=5, ann=ann_index)
+
+    # Get the actual DataFrame rows for similar offers
+    similar_offers = df.set_index("id").loc[similar["id"]]
+
+    # Print
+    print(similar)
+    print(similar_offers)
@@ -0,0 +1,343 @@
+import logging
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from text_norm import normalize_column, text_columns
+
+
+# Colonnes comparées (texte presque identique) pour reconnaître une même
+# offre publiée deux fois.
+DEDUP_COLUMNS = ["description"]
+# Colonnes qui doivent être identiques (après normalisation : casse,
+# accents, ponctuation) : une entreprise publie souvent le même texte pour
+# un stage et un CDI, pour deux postes voisins ou pour plusieurs villes.
+MATCH_COLUMNS = ["contrat", "metier", "intitule", "entreprise", "ville"]
+# Nombre de mots consécutifs par fragment comparé.
+SHINGLE_SIZE = 3
+# Taille de la signature MinHash et découpage en bandes pour le LSH :
+# 16 bandes de 8 valeurs retrouvent presque toutes les paires dont la
+# similarité de Jaccard dépasse 0.8.
+NUM_PERM = 128
+BANDS = 16
+# Similarité de Jaccard estimée à partir de laquelle deux offres sont des
+# doublons.
+THRESHOLD = 0.8
+# Nombre maximum de fragments traités ensemble (mémoire du calcul des
+# signatures).
+BLOCK_SHINGLES = 1_000_000
+# Au-delà de cette taille, les candidats d'un même seau ne sont comparés
+# qu'au premier (sinon à tous les autres).
+MAX_PAIRWISE_BUCKET = 64
+# Multiplicateur pour combiner les empreintes des mots d'un fragment.
+SHINGLE_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+# Décalage ajouté aux valeurs recopiées dans les cases vides.
+DENSIFY_OFFSET = np.uint32(0x9E3779B1)
+
+
+def mix64(values: np.ndarray) -> np.ndarray:
+    '''
+    Mélange les bits d'entiers 64 bits (finaliseur de splitmix64).
+    '''
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def shingle_hashes(
+        word_hashes: np.ndarray,
+        size: int = SHINGLE_SIZE,
+    ) -> np.ndarray:
+    '''
+    Empreintes distinctes des suites de `size` mots d'un texte, calculées
+    à partir des empreintes de ses mots. Un texte plus court que `size`
+    mots forme un seul fragment.
+    '''
+    size = max(1, min(size, len(word_hashes)))
+    count = len(word_hashes) - size + 1
+    hashes = np.zeros(max(count, 0), dtype=np.uint64)
+    for offset in range(size):
+        hashes = hashes * SHINGLE_MULTIPLIER + word_hashes[offset:offset + count]
+    return np.unique(mix64(hashes))
+
+
+class MinHasher:
+    '''
+    Signatures MinHash : deux textes ont la même valeur à une position de
+    la signature avec une probabilité proche de la similarité de Jaccard
+    de leurs ensembles de fragments.
+
+    Un seul hachage par fragment (one permutation hashing) : l'empreinte
+    choisit la case de la signature et la valeur, chaque case garde le
+    minimum. Les cases vides (textes courts) reprennent la valeur de la
+    case remplie suivante (densification), ce qui évite de calculer
+    `num_perm` hachages par fragment.
+    ---
+    Paramètres:
+    ---
+    num_perm: int: taille de la signature.
+    seed: int: graine des empreintes (mêmes signatures à chaque
+    exécution).
+    '''
+    def __init__(
+            self,
+            num_perm: int = NUM_PERM,
+            seed: int = 1,
+        ):
+        self.num_perm = num_perm
+        self.seed = np.uint64(seed)
+
+    def word_hashes(self, words: list) -> np.ndarray:
+        '''
+        Empreinte (stable d'un processus à l'autre) de chaque mot.
+        '''
+        codes, uniques = pd.factorize(np.array(words, dtype=object))
+        hashes = np.fromiter(
+            (zlib.crc32(word.encode()) for word in uniques),
+            dtype=np.uint64,
+            count=len(uniques),
+        )
+        return mix64(hashes ^ self.seed)[codes]
+
+    def signatures(
+            self,
+            texts,
+            size: int = SHINGLE_SIZE,
+        ) -> np.ndarray:
+        '''
+        Signatures d'une liste de textes normalisés (mots séparés par des
+        espaces), une ligne par texte. Un texte vide a une signature
+        remplie de la valeur maximale (à écarter des comparaisons).
+        ---
+        Retourne:
+        ---
+        signatures: np.ndarray: tableau (nombre de textes, num_perm) de
+        uint32.
+        '''
+        signatures = np.full((len(texts), self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        start = 0
+        while start < len(texts):
+            # Bloc de textes d'environ BLOCK_SHINGLES mots.
+            stop, words = start, 0
+            while stop < len(texts) and (words < BLOCK_SHINGLES or stop == start):
+                words += texts[stop].count(" ") + 1
+                stop += 1
+            signatures[start:stop] = self._block_signatures(texts[start:stop], size)
+            start = stop
+        return signatures
+
+    def _block_signatures(self, texts: list, size: int) -> np.ndarray:
+        words = [text.split() for text in texts]
+        lengths = np.array([len(text_words) for text_words in words])
+        word_hashes = self.word_hashes([word for text_words in words for word in text_words])
+        bounds = np.concatenate([[0], np.cumsum(lengths)])
+        shingles = [
+            shingle_hashes(word_hashes[bounds[row]:bounds[row + 1]], size)
+            for row in range(len(texts))
+        ]
+        rows = np.repeat(np.arange(len(texts)), [len(hashes) for hashes in shingles])
+        hashes = np.concatenate(shingles) if shingles else np.empty(0, dtype=np.uint64)
+        cells = rows * self.num_perm + (hashes % np.uint64(self.num_perm)).astype(np.int64)
+        block = np.full(len(texts) * self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        np.minimum.at(block, cells, (hashes >> np.uint64(32)).astype(np.uint32))
+        block = block.reshape(len(texts), self.num_perm)
+        filled = np.zeros(block.shape, dtype=bool)
+        filled.flat[cells] = True
+        return self._densify(block, filled, lengths > 0)
+
+    def _densify(self, block: np.ndarray, filled: np.ndarray, non_empty: np.ndarray) -> np.ndarray:
+        # Pour chaque case vide, première case remplie qui la suit (en
+        # revenant au début de la signature).
+        rows = np.flatnonzero(non_empty & ~filled.all(axis=1))
+        if not len(rows):
+            return block
+        num_perm = self.num_perm
+        positions = np.arange(2 * num_perm)
+        doubled = np.tile(filled[rows], 2)
+        following = np.where(doubled, positions, 2 * num_perm)
+        following = np.minimum.accumulate(following[:, ::-1], axis=1)[:, ::-1][:, :num_perm]
+        distance = following - positions[:num_perm]
+        source = np.take_along_axis(block[rows], following % num_perm, axis=1)
+        densified = source + (distance.astype(np.uint32) * DENSIFY_OFFSET)
+        block[rows] = np.where(filled[rows], block[rows], densified)
+        return block
+
+
+def lsh_buckets(
+        signatures: np.ndarray,
+        bands: int = BANDS,
+    ):
+    '''
+    Regroupe les signatures identiques sur au moins une bande : chaque
+    groupe de plus d'une ligne est un ensemble de candidats. Le tri des
+    bandes remplace la comparaison de toutes les paires.
+    ---
+    Retourne:
+    ---
+    Générateur de tableaux de positions de lignes.
+    '''
+    rows = signatures.shape[1] // bands
+    for band in range(bands):
+        block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        keys = block.view(np.dtype((np.void, block.dtype.itemsize * rows))).ravel()
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        # Seules les lignes qui partagent leur seau sont gardées.
+        shared = np.flatnonzero(counts[inverse] > 1)
+        if not len(shared):
+            continue
+        order = shared[np.argsort(inverse[shared], kind="stable")]
+        bounds = np.flatnonzero(np.diff(inverse[order])) + 1
+        yield from np.split(order, bounds)
+
+
+def split_groups(
+        members: np.ndarray,
+        groups: np.ndarray,
+    ) -> list:
+    '''
+    Découpe un ensemble de candidats selon leur groupe (`groups[ligne]`),
+    seuls les morceaux de plus d'une ligne sont gardés.
+    '''
+    order = members[np.argsort(groups[members], kind="stable")]
+    bounds = np.flatnonzero(np.diff(groups[order])) + 1
+    return [part for part in np.split(order, bounds) if len(part) > 1]
+
+
+def cluster_signatures(
+        signatures: np.ndarray,
+        threshold: float = THRESHOLD,
+        bands: int = BANDS,
+        valid: np.ndarray = None,
+        groups: np.ndarray = None,
+    ) -> np.ndarray:
+    '''
+    Numéro de groupe de doublons de chaque ligne. Dans chaque ensemble de
+    candidats, les paires dont la similarité estimée dépasse `threshold`
+    sont réunies dans un même groupe.
+    ---
+    Paramètres:
+    ---
+    signatures: np.ndarray: signatures MinHash, une ligne par offre.
+    threshold: float: similarité de Jaccard estimée minimale.
+    bands: int: nombre de bandes du LSH.
+    valid: np.ndarray: lignes à comparer (les autres restent seules dans
+    leur groupe, par exemple les textes vides).
+    groups: np.ndarray: numéro de groupe de chaque ligne, seules les lignes
+    d'un même groupe peuvent être réunies (par exemple même contrat).
+    ---
+    Retourne:
+    ---
+    clusters: np.ndarray: numéros de groupe de 0 à nombre de groupes - 1.
+    '''
+    parent = np.arange(len(signatures))
+
+    def find(i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def union(i, j):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_j] = root_i
+
+    positions = np.arange(len(signatures)) if valid is None else np.flatnonzero(valid)
+    buckets = (positions[members] for members in lsh_buckets(signatures[positions], bands))
+    if groups is not None:
+        buckets = (part for members in buckets for part in split_groups(members, groups))
+    for members in buckets:
+        if len(members) <= MAX_PAIRWISE_BUCKET:
+            candidates = signatures[members]
+            similarities = (candidates[:, None, :] == candidates[None, :, :]).mean(axis=2)
+            for i, j in zip(*np.nonzero(np.triu(similarities >= threshold, k=1))):
+                union(members[i], members[j])
+        else:
+            first = members[0]
+            similarities = (signatures[members[1:]] == signatures[first]).mean(axis=1)
+            for member in members[1:][similarities >= threshold]:
+                union(first, member)
+    roots = np.array([find(i) for i in range(len(signatures))], dtype=np.int64)
+    return pd.factorize(roots)[0]
+
+
+def find_near_duplicates(
+        df: pd.DataFrame,
+        columns: list = None,
+        threshold: float = THRESHOLD,
+        num_perm: int = NUM_PERM,
+        bands: int = BANDS,
+        match_columns: list = None,
+    ) -> pd.DataFrame:
+    '''
+    Repère les offres publiées plusieurs fois (sur plusieurs sites ou
+    republiées avec un nouvel id) : MinHash des fragments de texte puis
+    LSH, sans comparer toutes les paires d'offres.
+    ---
+    Paramètres:
+    ---
+    df: pd.DataFrame: offres nettoyées (colonnes "id", "date_modif" et
+    `columns`).
+    columns: list: colonnes comparées (DEDUP_COLUMNS par défaut).
+    threshold: float: similarité de Jaccard estimée minimale.
+    num_perm: int: taille des signatures MinHash.
+    bands: int: nombre de bandes du LSH (diviseur de `num_perm`).
+    match_columns: list: colonnes qui doivent être identiques entre deux
+    doublons, après `normalize_column` (MATCH_COLUMNS par défaut, une
+    valeur manquante n'est égale qu'à une autre valeur manquante).
+    ---
+    Retourne:
+    ---
+    doublons: pd.DataFrame: avec le même index que `df`, le numéro du
+    groupe de doublons ("groupe_doublons") et l'id de l'offre gardée pour
+    le groupe ("id_canonique") : la plus récemment modifiée.
+    '''
+    columns = columns or DEDUP_COLUMNS
+    texts = normalize_column(text_columns(df, [col for col in columns if col in df.columns]))
+    signatures = MinHasher(num_perm).signatures(texts.tolist())
+    match_columns = [col for col in (match_columns or MATCH_COLUMNS) if col in df.columns]
+    groups = pd.DataFrame({col: normalize_column(df[col]) for col in match_columns}) \
+        .groupby(match_columns, sort=False).ngroup().to_numpy() if match_columns else None
+    clusters = cluster_signatures(
+        signatures, threshold, bands, valid=(texts != "").to_numpy(), groups=groups,
+    )
+    dates = pd.to_datetime(df["date_modif"], utc=True) if "date_modif" in df.columns \
+        else pd.Series(pd.NaT, index=df.index)
+    ranking = pd.DataFrame({
+        "groupe_doublons": clusters,
+        "date_modif": dates.to_numpy(),
+        "id": df["id"].to_numpy(),
+    })
+    canonical = ranking.sort_values("date_modif", ascending=False, kind="stable", na_position="last") \
+        .drop_duplicates("groupe_doublons") \
+        .set_index("groupe_doublons")["id"]
+    return pd.DataFrame({
+        "groupe_doublons": clusters,
+        "id_canonique": canonical.reindex(clusters).to_numpy(),
+    }, index=df.index)
+
+
+def drop_near_duplicates(
+        df: pd.DataFrame,
+        **kwargs,
+    ) -> pd.DataFrame:
+    '''
+    Ne garde que l'offre canonique de chaque groupe de doublons (voir
+    `find_near_duplicates`, dont les paramètres sont acceptés).
+    '''
+    if df.empty:
+        return df
+    duplicates = find_near_duplicates(df, **kwargs)
+    keep = (df["id"] == duplicates["id_canonique"]).to_numpy()
+    # Une seule ligne par groupe, même si l'id canonique est répété.
+    keep &= ~duplicates["groupe_doublons"].where(keep).duplicated().to_numpy()
+    logging.info(
+        f"Near-duplicates: {len(df) - keep.sum()} offers dropped, "
+        f"{duplicates['groupe_doublons'].nunique()} distinct offers kept."
+    )
+    return df[keep].reset_index(drop=True)
@@ -0,0 +1,283 @@
+import html
+import re
+
+from concurrent.futures import ProcessPoolExecutor
+from html.entities import html5
+from html.parser import HTMLParser
+
+import pandas as pd
+
+from parallel import default_workers
+
+
+# Mêmes règles que BeautifulSoup avec 'html.parser' : balises vides (sans
+# balise fermante) et balises dont les espaces sont gardés.
+EMPTY_ELEMENT_TAGS = frozenset({
+    "area", "base", "basefont", "bgsound", "br", "col", "command", "embed",
+    "frame", "hr", "image", "img", "input", "isindex", "keygen", "link",
+    "menuitem", "meta", "nextid", "param", "source", "spacer", "track", "wbr",
+})
+PRESERVE_WHITESPACE_TAGS = frozenset({"pre", "textarea"})
+# Le texte de ces balises n'est pas gardé par `get_text`.
+HIDDEN_TEXT_TAGS = frozenset({"script", "style", "template", "rt", "rp"})
+ASCII_SPACES = " \n\t\x0c\r"
+# Balises dont le contenu n'est pas du html (ou dépend de la version de
+# Python) : les documents qui en contiennent passent par TextExtractor.
+RAW_TEXT_TAGS = HIDDEN_TEXT_TAGS | PRESERVE_WHITESPACE_TAGS | {
+    "title", "xmp", "iframe", "noembed", "noframes", "noscript", "plaintext",
+}
+# Balise simple : nom alphanumérique et attributs sans "<" ni ">".
+SIMPLE_TAG = re.compile(
+    r"""<(/?)([a-zA-Z][a-zA-Z0-9]*)((?:[\s/](?:[^<>"']|"[^"<>]*"|'[^'<>]*')*)?)>"""
+)
+# Entité terminée par un point-virgule ("&amp;", "&#233;", "&#xE9;").
+SIMPLE_ENTITY = re.compile(r"&(?:#([0-9]+|[xX][0-9a-fA-F]+)|([a-zA-Z][a-zA-Z0-9]*));")
+# Référence numérique suivie de texte qui n'en fait pas partie.
+NUMERIC_CHARREF = re.compile(r"([xX][0-9a-fA-F]+|[0-9]+)(.*)", re.DOTALL)
+# Nombre minimum de textes distincts pour répartir le nettoyage sur
+# plusieurs processus : un texte se nettoie en 50 µs environ, alors que
+# lancer un processus (qui réimporte pandas et le module principal sous
+# Windows) prend de l'ordre d'une seconde.
+POOL_MIN_SIZE = 20_000
+
+
+class TextExtractor(HTMLParser):
+    '''
+    Extrait le texte d'un document HTML au fil de la lecture, sans
+    construire l'arbre du document. Le résultat est identique à
+    `BeautifulSoup(markup, 'html.parser').get_text(separator)` : les
+    morceaux de texte entre deux balises sont joints par `separator`, un
+    morceau ne contenant que des espaces devient " " (ou "\\n"), et les
+    commentaires, le contenu des balises script/style et les déclarations
+    sont ignorés.
+    '''
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.strings = []
+        self.data = []
+        # Pile des balises ouvertes, comme celle de BeautifulSoup.
+        self.open_tags = []
+        self.already_closed_empty_element = []
+
+    def reset(self):
+        super().reset()
+        self.strings = []
+        self.data = []
+        self.open_tags = []
+        self.already_closed_empty_element = []
+
+    def end_data(self, keep: bool = True):
+        if not self.data:
+            return
+        data = "".join(self.data)
+        self.data = []
+        if not keep:
+            return
+        if not any(tag in PRESERVE_WHITESPACE_TAGS for tag in self.open_tags) \
+                and not data.strip(ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        self.strings.append(data)
+
+    def _hidden(self) -> bool:
+        return any(tag in HIDDEN_TEXT_TAGS for tag in self.open_tags)
+
+    def handle_starttag(self, tag, attrs):
+        self.end_data(not self._hidden())
+        if tag in EMPTY_ELEMENT_TAGS:
+            # Balise vide : sa balise fermante éventuelle est ignorée.
+            self.already_closed_empty_element.append(tag)
+            return
+        self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.end_data(not self._hidden())
+
+    def handle_endtag(self, tag):
+        if tag in self.already_closed_empty_element:
+            self.already_closed_empty_element.remove(tag)
+            return
+        self.end_data(not self._hidden())
+        if tag in self.open_tags:
+            index = len(self.open_tags) - 1 - self.open_tags[::-1].index(tag)
+            del self.open_tags[index:]
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_charref(self, name):
+        self.data.append(decode_charref(name))
+
+    def handle_entityref(self, name):
+        self.data.append(decode_entityref(name))
+
+    def _skip(self, data):
+        self.end_data(not self._hidden())
+
+    handle_comment = handle_decl = handle_pi = _skip
+
+    def unknown_decl(self, data):
+        self.end_data(not self._hidden())
+        if data.upper().startswith("CDATA["):
+            # Les sections CDATA font partie du texte.
+            self.data.append(data[len("CDATA["):])
+            self.end_data()
+
+    def get_text(self, markup: str, separator: str = "") -> str:
+        self.reset()
+        self.feed(markup)
+        self.close()
+        self.end_data(not self._hidden())
+        return separator.join(self.strings)
+
+
+# Un extracteur par processus, réinitialisé à chaque document.
+_EXTRACTOR = TextExtractor()
+
+
+def decode_charref(name: str) -> str:
+    '''
+    Caractère d'une référence numérique ("233" ou "xE9" pour "é"), comme
+    BeautifulSoup : les codes 128 à 159 sont lus en windows-1252, les codes
+    invalides deviennent U+FFFD, et le texte qui suit le nombre est gardé.
+    '''
+    match = NUMERIC_CHARREF.match(name)
+    if match is None:
+        return name
+    number, extra_data = match.groups()
+    return html.unescape(f"&#{number};") + extra_data
+
+
+def decode_entityref(name: str) -> str:
+    '''
+    Caractère d'une entité nommée ("eacute" pour "é"), ou l'entité telle
+    quelle si elle n'existe pas.
+    '''
+    return html5.get(f"{name};", f"&{name}")
+
+
+def _decode_entity(match: re.Match) -> str:
+    charref, name = match.groups()
+    if charref is not None:
+        return decode_charref(charref)
+    return decode_entityref(name)
+
+
+def _simple_text(markup: str, separator: str) -> str:
+    '''
+    Extraction directe par expressions régulières pour le html simple
+    (paragraphes, listes, gras, liens...) des offres. Retourne None si le
+    document contient une construction que seul TextExtractor gère à
+    l'identique (commentaire, script, "<" ou "&" isolé...).
+    '''
+    strings = []
+    data = []
+    already_closed_empty_element = []
+    position = 0
+    tags = 0
+    for match in SIMPLE_TAG.finditer(markup):
+        tags += 1
+        closing, tag, attrs = match.groups()
+        tag = tag.lower()
+        if tag in RAW_TEXT_TAGS:
+            return None
+        data.append(markup[position:match.start()])
+        position = match.end()
+        if closing and tag in already_closed_empty_element:
+            # Balise fermante d'une balise vide : le texte continue.
+            already_closed_empty_element.remove(tag)
+            continue
+        if not closing and tag in EMPTY_ELEMENT_TAGS and not attrs.endswith("/"):
+            already_closed_empty_element.append(tag)
+        _flush(data, strings)
+    if tags != markup.count("<"):
+        return None
+    data.append(markup[position:])
+    _flush(data, strings)
+    for i, string in enumerate(strings):
+        if "&" in string:
+            decoded, count = SIMPLE_ENTITY.subn(_decode_entity, string)
+            if count != string.count("&"):
+                return None
+            strings[i] = decoded
+    return separator.join(
+        string if string.strip(ASCII_SPACES) else ("\n" if "\n" in string else " ")
+        for string in strings
+    )
+
+
+def _flush(data: list, strings: list):
+    string = "".join(data)
+    data.clear()
+    if string:
+        strings.append(string)
+
+
+def html_to_text(markup: str, separator: str = "") -> str:
+    '''
+    Équivalent rapide de
+    `BeautifulSoup(markup, 'html.parser').get_text(separator)`.
+    '''
+    if "<" not in markup and "&" not in markup:
+        # Texte brut : un seul morceau de texte.
+        if markup and not markup.strip(ASCII_SPACES):
+            return "\n" if "\n" in markup else " "
+        return markup
+    text = _simple_text(markup, separator)
+    if text is None:
+        text = _EXTRACTOR.get_text(markup, separator)
+    return text
+
+
+def clean_html(text):
+    '''
+    Clean le html dans la description de certaines offres d'emplois.
+    ---
+    Paramètres
+    ---
+    text: texte dans lequel clean le html.
+    '''
+    if pd.isna(text):
+        return ""
+    cleaned_text = html_to_text(str(text), separator=" ")
+    cleaned_text = cleaned_text.replace("\xa0", " ").replace("\n", "")
+    return cleaned_text
+
+
+def clean_html_column(
+        values: pd.Series,
+        processes: int = None,
+        chunksize: int = 200,
+    ) -> pd.Series:
+    '''
+    Applique `clean_html` à toute une colonne. Chaque texte distinct n'est
+    nettoyé qu'une fois (les descriptions d'entreprise se répètent), et les
+    gros lots sont répartis sur plusieurs processus.
+    ---
+    Paramètres:
+    ---
+    values: pd.Series: textes html à nettoyer.
+    processes: int: nombre de processus (un par cœur par défaut, 1 pour ne
+    pas utiliser de processus ; toujours 1 dans un processus de
+    `map_chunks`). En dessous de POOL_MIN_SIZE textes distincts, le
+    nettoyage reste dans le processus courant.
+    chunksize: int: nombre de textes envoyés à la fois à chaque processus.
+    ---
+    Retourne:
+    ---
+    pd.Series de textes nettoyés, avec le même index que `values`.
+    '''
+    codes, uniques = pd.factorize(values)
+    if processes is None:
+        processes = default_workers()
+    if processes > 1 and len(uniques) >= max(POOL_MIN_SIZE, chunksize):
+        with ProcessPoolExecutor(processes) as executor:
+            cleaned = list(executor.map(clean_html, uniques, chunksize=chunksize))
+    else:
+        cleaned = [clean_html(text) for text in uniques]
+    # Code -1 (valeur manquante) : dernière valeur ajoutée.
+    cleaned.append("")
+    return pd.Series(
+        pd.Series(cleaned, dtype=object).to_numpy()[codes],
+        index=values.index,
+        name=values.name,
+    )
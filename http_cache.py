@@ -0,0 +1,219 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+import zlib
+
+
+class CachedResponse:
+    '''
+    Réponse HTTP lue depuis le cache disque.
+    ---
+    Attributs:
+    ---
+    body: bytes: contenu décompressé de la réponse.
+    etag / last_modified: str: validateurs renvoyés par le serveur.
+    fresh: bool: True si la réponse est plus récente que le TTL et peut
+    être utilisée sans requête.
+    '''
+    def __init__(self, body, etag, last_modified, fresh):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh = fresh
+
+    def conditional_headers(self) -> dict:
+        '''
+        En-têtes de revalidation conditionnelle (réponse 304 si inchangé).
+        '''
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    '''
+    Cache disque des réponses HTTP. Les contenus sont compressés et stockés
+    par empreinte (deux urls renvoyant le même contenu partagent le même
+    fichier), les métadonnées (ETag, Last-Modified, dates) sont dans une
+    base SQLite.
+    ---
+    Paramètres:
+    ---
+    path: str: dossier du cache.
+    ttl: float: durée (s) pendant laquelle une réponse est utilisée sans
+    revalidation.
+    max_size: int: taille maximum (octets compressés) des contenus, les
+    réponses les moins récemment utilisées sont supprimées au-delà.
+    '''
+    def __init__(
+            self,
+            path: str = "cache/http",
+            ttl: float = 12 * 3600,
+            max_size: int = 500 * 1024 ** 2,
+        ):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        os.makedirs(os.path.join(path, "bodies"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(path, "index.sqlite"), timeout=30)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                body_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS bodies (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+            """
+        )
+
+    def close(self):
+        self.db.close()
+
+    def _body_path(self, body_hash: str) -> str:
+        return os.path.join(self.path, "bodies", body_hash[:2], f"{body_hash}.z")
+
+    def get(self, url: str) -> CachedResponse:
+        '''
+        Retourne la réponse en cache pour `url`, ou None.
+        '''
+        row = self.db.execute(
+            "SELECT body_hash, etag, last_modified, stored_at FROM entries WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        body_hash, etag, last_modified, stored_at = row
+        try:
+            with open(self._body_path(body_hash), "rb") as file:
+                body = zlib.decompress(file.read())
+        except (OSError, zlib.error):
+            self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._drop_unused_body(body_hash)
+            self.db.commit()
+            return None
+        now = time.time()
+        self.db.execute("UPDATE entries SET accessed_at = ? WHERE url = ?", (now, url))
+        self.db.commit()
+        return CachedResponse(body, etag, last_modified, now - stored_at < self.ttl)
+
+    def store(
+            self,
+            url: str,
+            body: bytes,
+            headers: dict = None,
+        ):
+        '''
+        Enregistre le contenu d'une réponse 200 et ses validateurs.
+        '''
+        headers = headers or {}
+        body_hash = hashlib.sha256(body).hexdigest()
+        body_path = self._body_path(body_hash)
+        if not os.path.exists(body_path):
+            os.makedirs(os.path.dirname(body_path), exist_ok=True)
+            compressed = zlib.compress(body, 6)
+            # Écriture atomique pour ne jamais lire un fichier incomplet.
+            tmp_path = f"{body_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as file:
+                file.write(compressed)
+            os.replace(tmp_path, body_path)
+            self.db.execute(
+                "INSERT OR REPLACE INTO bodies (hash, size) VALUES (?, ?)",
+                (body_hash, len(compressed)),
+            )
+        previous = self.db.execute(
+            "SELECT body_hash FROM entries WHERE url = ?", (url,)
+        ).fetchone()
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+            (url, body_hash, headers.get("ETag"), headers.get("Last-Modified"), now, now),
+        )
+        # Le contenu a changé : l'ancien fichier est supprimé s'il ne sert
+        # plus à aucune url.
+        if previous and previous[0] != body_hash:
+            self._drop_unused_body(previous[0])
+        self.db.commit()
+
+    def revalidated(self, url: str):
+        '''
+        Réponse 304 : le contenu en cache redevient frais pour un TTL.
+        '''
+        now = time.time()
+        self.db.execute(
+            "UPDATE entries SET stored_at = ?, accessed_at = ? WHERE url = ?",
+            (now, now, url),
+        )
+        self.db.commit()
+
+    def _drop_unused_body(self, body_hash: str) -> int:
+        '''
+        Supprime un contenu qui n'est plus utilisé par aucune url.
+        ---
+        Retourne:
+        ---
+        size: int: taille libérée (0 si le contenu est encore utilisé).
+        '''
+        shared = self.db.execute(
+            "SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)
+        ).fetchone()
+        if shared:
+            return 0
+        body_size = self.db.execute(
+            "SELECT size FROM bodies WHERE hash = ?", (body_hash,)
+        ).fetchone()
+        self.db.execute("DELETE FROM bodies WHERE hash = ?", (body_hash,))
+        try:
+            os.remove(self._body_path(body_hash))
+        except FileNotFoundError:
+            pass
+        return body_size[0] if body_size else 0
+
+    def size(self) -> int:
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM bodies").fetchone()[0]
+
+    def evict(self) -> int:
+        '''
+        Supprime les réponses les moins récemment utilisées jusqu'à revenir
+        sous `max_size`.
+        ---
+        Retourne:
+        ---
+        removed: int: nombre d'entrées supprimées.
+        '''
+        # Contenus orphelins (laissés par une ancienne version du cache ou
+        # une sauvegarde interrompue) : supprimés en premier.
+        orphans = self.db.execute(
+            "SELECT hash FROM bodies WHERE hash NOT IN (SELECT body_hash FROM entries)"
+        ).fetchall()
+        for (body_hash,) in orphans:
+            self._drop_unused_body(body_hash)
+        size = self.size()
+        removed = 0
+        if size <= self.max_size:
+            self.db.commit()
+            return removed
+        rows = self.db.execute(
+            "SELECT url, body_hash FROM entries ORDER BY accessed_at"
+        ).fetchall()
+        for url, body_hash in rows:
+            if size <= self.max_size:
+                break
+            self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            removed += 1
+            size -= self._drop_unused_body(body_hash)
+        self.db.commit()
+        logging.info(f"HTTP cache: {removed} entries evicted.")
+        return removed
@@ -0,0 +1,162 @@
+import json
+import logging
+import time
+
+from collections import defaultdict
+
+import aiohttp
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from aiohttp.compression_utils import HAS_BROTLI
+except ImportError:
+    HAS_BROTLI = False
+
+
+# Décodage JSON rapide avec orjson s'il est installé.
+if orjson is not None:
+    loads = orjson.loads
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+else:
+    loads = json.loads
+    dumps = json.dumps
+
+
+class HttpStats:
+    '''
+    Mesure des requêtes HTTP par hôte (nombre, durée, erreurs, connexions
+    créées, temps de connexion et de résolution DNS) à partir des hooks de
+    trace d'aiohttp.
+    '''
+    def __init__(self):
+        self.hosts = defaultdict(lambda: {
+            "requests": 0,
+            "errors": 0,
+            "time": 0.0,
+            "connections": 0,
+            "connect_time": 0.0,
+            "dns_time": 0.0,
+        })
+        self.hooks = []
+
+    def on_request(self, hook):
+        '''
+        Ajoute un hook appelé à la fin de chaque requête avec
+        (host, method, status, elapsed).
+        '''
+        self.hooks.append(hook)
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._request_start)
+        trace.on_request_end.append(self._request_end)
+        trace.on_request_exception.append(self._request_exception)
+        trace.on_connection_create_start.append(self._connection_start)
+        trace.on_connection_create_end.append(self._connection_end)
+        trace.on_dns_resolvehost_start.append(self._dns_start)
+        trace.on_dns_resolvehost_end.append(self._dns_end)
+        return trace
+
+    async def _request_start(self, session, ctx, params):
+        ctx.host = params.url.host
+        ctx.start = time.perf_counter()
+
+    async def _request_end(self, session, ctx, params):
+        elapsed = time.perf_counter() - ctx.start
+        stats = self.hosts[ctx.host]
+        stats["requests"] += 1
+        stats["time"] += elapsed
+        for hook in self.hooks:
+            hook(ctx.host, params.method, params.response.status, elapsed)
+
+    async def _request_exception(self, session, ctx, params):
+        self.hosts[ctx.host]["errors"] += 1
+
+    async def _connection_start(self, session, ctx, params):
+        ctx.connection_start = time.perf_counter()
+
+    async def _connection_end(self, session, ctx, params):
+        stats = self.hosts[ctx.host]
+        stats["connections"] += 1
+        stats["connect_time"] += time.perf_counter() - ctx.connection_start
+
+    async def _dns_start(self, session, ctx, params):
+        ctx.dns_start = time.perf_counter()
+
+    async def _dns_end(self, session, ctx, params):
+        self.hosts[ctx.host]["dns_time"] += time.perf_counter() - ctx.dns_start
+
+    def report(self):
+        '''
+        Affiche les statistiques de chaque hôte.
+        '''
+        for host, stats in sorted(self.hosts.items()):
+            requests = max(stats["requests"], 1)
+            connections = max(stats["connections"], 1)
+            logging.info(
+                f"{host}: {stats['requests']} requests, {stats['errors']} errors, "
+                f"{1000 * stats['time'] / requests:.0f} ms/request, "
+                f"{stats['connections']} connections "
+                f"({1000 * stats['connect_time'] / connections:.0f} ms/connection), "
+                f"DNS {1000 * stats['dns_time']:.0f} ms"
+            )
+
+
+# Statistiques partagées par toutes les sessions.
+HTTP_STATS = HttpStats()
+
+
+def create_session(
+        limit: int = 100,
+        limit_per_host: int = 20,
+        timeout: float = 60,
+        headers: dict = None,
+    ) -> aiohttp.ClientSession:
+    '''
+    Créé la session HTTP utilisée par toutes les sources : connexions
+    keep-alive réutilisées, limite de connexions par hôte, cache DNS,
+    compression gzip/brotli et mesure des requêtes dans HTTP_STATS.
+    ---
+    Paramètres:
+    ---
+    limit: int: nombre maximum de connexions ouvertes.
+    limit_per_host: int: nombre maximum de connexions par hôte.
+    timeout: float: durée maximum (s) d'une requête.
+    headers: dict: en-têtes ajoutés à toutes les requêtes.
+    ---
+    Retourne:
+    ---
+    session: aiohttp.ClientSession (à utiliser avec `async with`).
+    '''
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        ttl_dns_cache=600,
+        keepalive_timeout=60,
+        enable_cleanup_closed=True,
+    )
+    default_headers = {
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip, deflate, br" if HAS_BROTLI else "gzip, deflate",
+    }
+    default_headers.update(headers or {})
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=default_headers,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        json_serialize=dumps,
+        trace_configs=[HTTP_STATS.trace_config()],
+    )
+
+
+async def read_json(response: aiohttp.ClientResponse):
+    '''
+    Décode le contenu JSON d'une réponse avec le décodeur rapide.
+    '''
+    return loads(await response.read())
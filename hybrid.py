@@ -0,0 +1,261 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from scipy import sparse
+
+from similarity import TOP_K, query_row
+from tfidf_index import INDEX_PATH, SIMILARITY_COLUMNS, update_tfidf_index
+
+
+# Colonnes comparées hors du texte (SIMILARITY_COLUMNS), chacune dans son
+# propre bloc.
+CATEGORY_COLUMNS = ["contrat", "experience", "niveau_etudes", "metier"]
+SKILL_COLUMNS = ["tech_skills", "soft_skills"]
+GEO_COLUMNS = ["latitude", "longitude"]
+# Poids de chaque bloc dans le score (ramenés à une somme de 1).
+WEIGHTS = {
+    "texte": 1.0,
+    "contrat": 0.2,
+    "experience": 0.1,
+    "niveau_etudes": 0.1,
+    "metier": 0.3,
+    "tech_skills": 0.5,
+    "soft_skills": 0.1,
+    "geo": 0.3,
+}
+# Valeurs qui ne disent rien de l'offre : deux offres "Non spécifié" ne se
+# ressemblent pas pour autant.
+UNKNOWN_VALUES = ("Non spécifié",)
+# Tailles (km) des grilles de la position : deux offres partagent d'autant
+# plus de cases qu'elles sont proches. Chaque grille est aussi décalée
+# d'une demi-case, pour que deux offres voisines de part et d'autre d'un
+# bord partagent la case décalée.
+GEO_CELLS_KM = (10, 25, 50, 100, 200)
+KM_PER_DEGREE = 111.32
+
+
+def one_hot_block(values) -> sparse.csr_matrix:
+    '''
+    Une colonne par valeur, un 1 par offre (ligne vide si la valeur est
+    manquante ou inconnue) : produit de deux lignes = 1 si même valeur.
+    '''
+    values = pd.Series(values, dtype=object).where(lambda s: ~s.isin(UNKNOWN_VALUES))
+    codes, uniques = pd.factorize(values)
+    known = np.flatnonzero(codes >= 0)
+    return sparse.csr_matrix(
+        (np.ones(len(known), dtype=np.float32), (known, codes[known])),
+        shape=(len(codes), len(uniques)),
+    )
+
+
+def skill_list(skills) -> list:
+    '''
+    Compétences d'une offre sous forme de liste (liste, tableau ou JSON
+    de la base SQL).
+    '''
+    if isinstance(skills, str):
+        return json.loads(skills)
+    if skills is None or not hasattr(skills, "__len__"):
+        return []
+    return list(skills)
+
+
+def skills_block(skills) -> sparse.csr_matrix:
+    '''
+    Ensemble des compétences de chaque offre, normalisé (norme L2) :
+    produit de deux lignes = cosinus des deux ensembles.
+    '''
+    skills = pd.Series(list(skills), dtype=object)
+    n_offers = len(skills)
+    skills = skills.map(skill_list).explode().dropna()
+    rows = skills.index.to_numpy(dtype=np.int64)
+    codes, uniques = pd.factorize(skills)
+    block = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, codes)),
+        shape=(n_offers, len(uniques)),
+    )
+    block.sum_duplicates()
+    block.data[:] = 1
+    return normalize_rows(block)
+
+
+def geo_block(
+        latitude,
+        longitude,
+        cells_km: tuple = GEO_CELLS_KM,
+    ) -> sparse.csr_matrix:
+    '''
+    Cases des grilles GEO_CELLS_KM (et décalées) où se trouve chaque offre,
+    chacune de poids 1/√(nombre de grilles) : produit de deux lignes = part
+    des cases communes, 1 au même endroit, qui décroît avec la distance
+    jusqu'à 0 au-delà de la plus grande case.
+    '''
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    known = np.flatnonzero(np.isfinite(latitude) & np.isfinite(longitude))
+    y = latitude[known] * KM_PER_DEGREE
+    x = longitude[known] * KM_PER_DEGREE * np.cos(np.radians(latitude[known]))
+    keys = []
+    for grid, (size, shift) in enumerate((size, shift) for size in cells_km for shift in (0, 0.5)):
+        # Une clé entière par case : grille, colonne, ligne.
+        column = np.floor(x / size + shift).astype(np.int64) + 2**20
+        row = np.floor(y / size + shift).astype(np.int64) + 2**20
+        keys.append((grid << 42) | (column << 21) | row)
+    n_grids = len(keys)
+    codes, uniques = pd.factorize(np.concatenate(keys) if keys else np.empty(0, dtype=np.int64))
+    return sparse.csr_matrix(
+        (np.full(len(codes), 1 / np.sqrt(max(n_grids, 1)), dtype=np.float32), (np.tile(known, n_grids), codes)),
+        shape=(len(latitude), len(uniques)),
+    )
+
+
+def normalize_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix, dtype=np.float32)
+
+
+class HybridIndex:
+    '''
+    Score de similarité hybride des offres : somme pondérée des
+    similarités de plusieurs blocs, chacun comparé à sa façon :
+    - texte : cosinus TF-IDF de SIMILARITY_COLUMNS ;
+    - contrat, expérience, niveau d'études, métier : même valeur ou non ;
+    - compétences techniques et humaines : cosinus des ensembles ;
+    - géo : proximité de latitude/longitude (cases communes).
+    Les blocs sont mis côte à côte dans une seule matrice creuse, chacun
+    multiplié par √(poids) : le score d'une offre contre toutes les autres
+    reste un seul produit ligne x matrice.
+    ---
+    Paramètres:
+    ---
+    weights: dict: poids de chaque bloc (WEIGHTS par défaut, les blocs
+    absents gardent leur poids par défaut, 0 retire un bloc).
+    '''
+    def __init__(self, weights: dict = None):
+        self.weights = {**WEIGHTS, **(weights or {})}
+        self.ids = pd.Index([])
+        # Offres nouvelles ou modifiées depuis le dernier calcul (texte ou
+        # autre bloc), voir `update_hybrid_index`.
+        self.updated_ids = np.empty(0, dtype=object)
+        # Colonnes de chaque bloc : nom -> (début, fin).
+        self.blocks = {}
+        # Blocs sans pondération, et matrice pondérée.
+        self.features = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._postings = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def postings(self) -> sparse.csr_matrix:
+        if self._postings is None:
+            self._postings = self.matrix.T.tocsr()
+        return self._postings
+
+    def build(
+            self,
+            df: pd.DataFrame,
+            text_index,
+        ) -> "HybridIndex":
+        '''
+        Calcule les blocs de toutes les offres de l'index de texte.
+        ---
+        Paramètres:
+        ---
+        df: pd.DataFrame: offres (colonnes "id", CATEGORY_COLUMNS,
+        SKILL_COLUMNS, "latitude", "longitude").
+        text_index: TfidfIndex: index TF-IDF de SIMILARITY_COLUMNS des mêmes
+        offres (voir `update_hybrid_index`).
+        '''
+        self.ids = text_index.rows
+        self.updated_ids = text_index.updated_ids
+        df = df.drop_duplicates(subset="id").set_index("id").reindex(self.ids)
+        blocks = {"texte": text_index.matrix}
+        for col in CATEGORY_COLUMNS:
+            blocks[col] = one_hot_block(df[col] if col in df.columns else [None] * len(df))
+        for col in SKILL_COLUMNS:
+            blocks[col] = skills_block(df[col] if col in df.columns else [[]] * len(df))
+        blocks["geo"] = geo_block(df.get("latitude", np.full(len(df), np.nan)), df.get("longitude", np.full(len(df), np.nan)))
+
+        stops = np.cumsum([block.shape[1] for block in blocks.values()])
+        self.blocks = {name: (stop - block.shape[1], stop) for (name, block), stop in zip(blocks.items(), stops)}
+        self.features = sparse.hstack(list(blocks.values()), format="csr", dtype=np.float32)
+        return self.set_weights()
+
+    def set_weights(self, weights: dict = None) -> "HybridIndex":
+        '''
+        Change les poids des blocs, sans recalculer les blocs (les poids
+        sont un facteur par colonne).
+        '''
+        self.weights = {**self.weights, **(weights or {})}
+        total = sum(self.weights.get(name, 0) for name in self.blocks) or 1
+        scale = np.zeros(self.features.shape[1], dtype=np.float32)
+        for name, (start, stop) in self.blocks.items():
+            scale[start:stop] = np.sqrt(max(self.weights.get(name, 0), 0) / total)
+        matrix = self.features.copy()
+        matrix.data = matrix.data * scale[matrix.indices]
+        matrix.eliminate_zeros()
+        self.matrix = matrix
+        self._postings = None
+        return self
+
+    def similar(
+            self,
+            offer_id: str,
+            k: int = TOP_K,
+            ann=None,
+        ) -> pd.DataFrame:
+        '''
+        Les `k` offres les plus similaires à une offre.
+        ---
+        Paramètres:
+        ---
+        offer_id: str: id de l'offre de référence.
+        k: int: nombre d'offres renvoyées.
+        ann: AnnIndex: index approché de cette matrice (voir
+        `ann.update_ann_index`) : seuls ses candidats sont comparés à
+        l'offre, au lieu de tout le catalogue.
+        ---
+        Retourne:
+        ---
+        df: pd.DataFrame: colonnes "id", "score" (entre 0 et 1) et la part
+        du score apportée par chaque bloc.
+        '''
+        row = self.ids.get_loc(offer_id)
+        if ann is None:
+            positions, scores = query_row(self.matrix, row, k, self.postings)
+        else:
+            positions, scores = ann.query_row(row, k)
+        # Part de chaque bloc : produits terme à terme, sommés par bloc.
+        products = sparse.csr_matrix(self.matrix[positions].multiply(self.matrix[row]))
+        stops = np.array([stop for _, stop in self.blocks.values()])
+        blocks = np.searchsorted(stops, products.indices, side="right")
+        lines = np.repeat(np.arange(len(positions)), np.diff(products.indptr))
+        parts = np.bincount(
+            lines * len(stops) + blocks, weights=products.data, minlength=len(positions) * len(stops),
+        ).reshape(len(positions), len(stops))
+        df = pd.DataFrame(parts, columns=list(self.blocks))
+        df.insert(0, "score", scores)
+        df.insert(0, "id", self.ids[positions])
+        return df
+
+
+def update_hybrid_index(
+        df: pd.DataFrame,
+        path: str = INDEX_PATH,
+        weights: dict = None,
+    ) -> HybridIndex:
+    '''
+    Met à jour l'index TF-IDF de SIMILARITY_COLUMNS (enregistré dans `path`,
+    seul le texte des offres nouvelles ou modifiées est redécoupé) et
+    calcule les autres blocs du score hybride. Une offre dont seules les
+    colonnes des autres blocs ont changé compte aussi comme modifiée.
+    '''
+    text_index = update_tfidf_index(
+        df, path, SIMILARITY_COLUMNS, CATEGORY_COLUMNS + SKILL_COLUMNS + GEO_COLUMNS,
+    )
+    return HybridIndex(weights).build(df, text_index)
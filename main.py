@@ -2,19 +2,24 @@ from tools import scrapping
 
 import logging
 
-logging.basicConfig(
-    format="%(asctime)s %(levelname)-8s %(message)s",
-    level=logging.INFO,
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
 
-# Choix de l'intitulé du poste
-# job_title = "data analyst"
-job_title = "all"
+# Point d'entrée protégé : sous Windows, chaque processus lancé par un pool
+# (map_chunks, update_similar_offers, clean_html_column) réimporte ce
+# module, qui ne doit alors pas relancer le scrapping.
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)-8s %(message)s",
+        level=logging.INFO,
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
 
-logging.info(f"Scraping job offers for {job_title}")
+    # Choix de l'intitulé du poste
+    # job_title = "data analyst"
+    job_title = "all"
 
-scrapping(
-    job_title,
-    # page=1
-)
+    logging.info(f"Scraping job offers for {job_title}")
+
+    scrapping(
+        job_title,
+        # page=1
+    )
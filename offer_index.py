@@ -0,0 +1,154 @@
+import logging
+
+import pandas as pd
+import sqlalchemy
+
+
+# Nombre de jours sans apparaître dans les résultats de recherche après
+# lesquels une offre est considérée comme retirée.
+OFFER_TTL_DAYS = 30
+
+
+class OfferIndex:
+    '''
+    Index persistant des offres déjà récupérées, avec leur date de dernière
+    modification. Il permet de ne récupérer et nettoyer que les offres
+    nouvelles ou modifiées depuis le dernier scrapping.
+    ---
+    Paramètres:
+    ---
+    db_url: str: base de données où stocker l'index.
+    table: str: nom de la table de l'index.
+    ---
+    Clés:
+    ---
+    Lien API de l'offre pour Welcome To The Jungle (connu avant la requête
+    de l'offre), id de l'offre pour Pole Emploi.
+    ---
+    Contenu:
+    ---
+    offers: dict: date de dernière modification de chaque offre.
+    last_seen: dict: date à laquelle chaque offre a été vue pour la
+    dernière fois dans les résultats de recherche (voir `expired`).
+    '''
+    def __init__(
+            self,
+            db_url: str = 'sqlite:///database/job_offers.sqlite',
+            table: str = 'offer_index',
+        ):
+        self.engine = sqlalchemy.create_engine(db_url)
+        self.table = table
+        self.last_seen = {}
+        self.offers = self.load()
+
+    def __len__(self):
+        return len(self.offers)
+
+    def __contains__(self, key):
+        return key in self.offers
+
+    def load(self) -> dict:
+        '''
+        Charge l'index depuis la base de données.
+        '''
+        if not sqlalchemy.inspect(self.engine).has_table(self.table):
+            return {}
+        df = pd.read_sql_table(self.table, con=self.engine)
+        dates = pd.to_datetime(df["date_modif"], utc=True)
+        # Index enregistré avant le suivi des offres vues : elles comptent
+        # comme vues aujourd'hui.
+        seen = pd.to_datetime(df.get("last_seen"), utc=True) if "last_seen" in df else None
+        now = pd.Timestamp.now(tz="UTC")
+        self.last_seen = {
+            key: now if seen is None or pd.isna(seen[i]) else seen[i]
+            for i, key in enumerate(df["key"])
+        }
+        return dict(zip(df["key"], dates))
+
+    def is_new_or_changed(self, key, date_modif=None) -> bool:
+        '''
+        Indique si une offre doit être récupérée : absente de l'index, ou
+        modifiée depuis la dernière récupération quand `date_modif` est
+        connue.
+        '''
+        if key not in self.offers:
+            return True
+        if date_modif is None or pd.isna(date_modif):
+            return False
+        known = self.offers[key]
+        return pd.isna(known) or to_utc(date_modif) > known
+
+    def see(self, keys):
+        '''
+        Note les offres présentes dans les résultats d'une recherche.
+        '''
+        now = pd.Timestamp.now(tz="UTC")
+        for key in keys:
+            if key is not None and not pd.isna(key):
+                self.last_seen[key] = now
+
+    def expired(self, keys, ttl_days: int = OFFER_TTL_DAYS) -> list:
+        '''
+        Retourne un masque booléen des offres qui ne sont plus apparues
+        dans les résultats de recherche depuis `ttl_days` jours (offres
+        retirées des sites). Une offre inconnue de l'index n'est pas
+        considérée comme retirée.
+        '''
+        limit = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=ttl_days)
+        return [
+            key in self.last_seen and self.last_seen[key] < limit
+            for key in keys
+        ]
+
+    def remove(self, keys):
+        '''
+        Retire des offres de l'index (elles seront récupérées à nouveau si
+        elles réapparaissent).
+        '''
+        for key in keys:
+            self.offers.pop(key, None)
+            self.last_seen.pop(key, None)
+
+    def filter_new(self, keys: list, dates: list = None) -> list:
+        '''
+        Retourne un masque booléen des offres nouvelles ou modifiées.
+        '''
+        if dates is None:
+            dates = [None] * len(keys)
+        return [self.is_new_or_changed(key, date) for key, date in zip(keys, dates)]
+
+    def update(self, keys, dates=None):
+        '''
+        Ajoute ou met à jour des offres dans l'index (en mémoire).
+        '''
+        keys = list(keys)
+        if dates is None:
+            dates = [None] * len(keys)
+        for key, date in zip(keys, dates):
+            if key is None or pd.isna(key):
+                continue
+            self.offers[key] = pd.NaT if date is None or pd.isna(date) else to_utc(date)
+        self.see(keys)
+
+    def save(self):
+        '''
+        Écrit l'index dans la base de données.
+        '''
+        keys = list(self.offers.keys())
+        df = pd.DataFrame({
+            "key": keys,
+            "date_modif": pd.to_datetime(list(self.offers.values()), utc=True),
+            "last_seen": pd.to_datetime([self.last_seen.get(key) for key in keys], utc=True),
+        })
+        df.to_sql(self.table, con=self.engine, index=False, if_exists='replace')
+        logging.info(f"Offer index saved ({len(df)} offers).")
+
+
+def to_utc(date) -> pd.Timestamp:
+    '''
+    Convertit une date (texte ou Timestamp) en Timestamp UTC.
+    '''
+    date = pd.Timestamp(date)
+    if date.tzinfo is None:
+        return date.tz_localize("UTC")
+    return date.tz_convert("UTC")
@@ -0,0 +1,108 @@
+import logging
+import math
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from pandas.api.types import union_categoricals
+
+
+# Nombre minimum de lignes par morceau : en dessous, l'envoi des données
+# aux processus coûte plus que le calcul.
+MIN_CHUNK_SIZE = 250
+# Morceaux par processus, pour équilibrer la charge entre processus.
+CHUNKS_PER_WORKER = 4
+
+
+def default_workers() -> int:
+    '''
+    Nombre de processus par défaut : un par cœur disponible, un seul dans
+    un processus déjà lancé par un pool.
+    '''
+    if multiprocessing.parent_process() is not None:
+        return 1
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def split_chunks(
+        data,
+        chunks: int,
+    ) -> list:
+    '''
+    Découpe un DataFrame (ou une liste) en `chunks` morceaux de lignes
+    consécutives.
+    '''
+    size = math.ceil(len(data) / chunks)
+    if isinstance(data, pd.DataFrame):
+        return [
+            data.iloc[start:start + size].reset_index(drop=True)
+            for start in range(0, len(data), size)
+        ]
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+def concat_chunks(frames: list) -> pd.DataFrame:
+    '''
+    Rassemble les résultats des morceaux dans l'ordre. Les colonnes
+    catégorielles de chaque morceau ont des catégories différentes : elles
+    sont fusionnées pour rester catégorielles.
+    '''
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    for col in frames[0].columns:
+        if all(
+            col in frame.columns and isinstance(frame[col].dtype, pd.CategoricalDtype)
+            for frame in frames
+        ):
+            df[col] = union_categoricals([frame[col] for frame in frames])
+    return df
+
+
+def map_chunks(
+        func,
+        data,
+        workers: int = None,
+        chunk_size: int = None,
+    ) -> pd.DataFrame:
+    '''
+    Applique une étape ligne par ligne (`func(morceau) -> DataFrame`) à un
+    DataFrame ou une liste d'offres, découpé en morceaux répartis sur un
+    pool de processus. Les résultats sont rassemblés dans l'ordre des
+    lignes.
+    ---
+    Paramètres:
+    ---
+    func: fonction de module (envoyée aux processus) qui ne dépend que des
+    lignes reçues.
+    data: pd.DataFrame ou list: lignes à traiter.
+    workers: int: nombre de processus (un par cœur par défaut, 1 pour tout
+    faire dans le processus courant).
+    chunk_size: int: nombre de lignes par morceau (par défaut assez pour
+    faire CHUNKS_PER_WORKER morceaux par processus).
+    ---
+    Retourne:
+    ---
+    df: pd.DataFrame: résultats de `func` mis bout à bout.
+    '''
+    workers = workers or default_workers()
+    if chunk_size is None:
+        chunk_size = max(MIN_CHUNK_SIZE, math.ceil(len(data) / (workers * CHUNKS_PER_WORKER)))
+    if workers <= 1 or len(data) <= chunk_size:
+        # Même index (0 à n-1) que les morceaux de `split_chunks`.
+        if isinstance(data, pd.DataFrame):
+            data = data.reset_index(drop=True)
+        return func(data)
+    chunks = split_chunks(data, math.ceil(len(data) / chunk_size))
+    workers = min(workers, len(chunks))
+    logging.info(f"Running {func.__name__} on {len(data)} rows ({len(chunks)} chunks, {workers} processes)...")
+    with ProcessPoolExecutor(workers) as executor:
+        results = list(executor.map(func, chunks))
+    return concat_chunks(results)
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import re
+import time
+
+import aiohttp
+
+from http_client import create_session, read_json
+from rate_limit import RateController, parse_retry_after
+
+
+ENDPOINT_ACCESS_TOKEN = "https://entreprise.pole-emploi.fr/connexion/oauth2/access_token"
+SEARCH_ENDPOINT = "https://api.emploi-store.fr/partenaire/offresdemploi/v2/offres/search"
+# Limites de pagination de l'API : 150 offres par requête, premier index
+# maximum 3000 et dernier index maximum 3149.
+RANGE_SIZE = 150
+RANGE_LAST_INDEX = 3149
+
+# Cache des tokens OAuth par client_id, partagé entre les recherches.
+_TOKEN_CACHE = {}
+
+
+class PoleEmploiClient:
+    '''
+    Client asynchrone de l'API Offres d'emploi v2 de Pole Emploi.
+    Le token OAuth est mis en cache et renouvelé avant son expiration, et
+    toutes les plages de résultats sont demandées en parallèle.
+    ---
+    Paramètres:
+    ---
+    client_id: str: identifiant de l'application Pole Emploi.
+    client_secret: str: clé secrète de l'application.
+    session: aiohttp.ClientSession: session à utiliser (créée si absente).
+    controller: RateController: limite de concurrence et de débit des
+    requêtes de recherche.
+    '''
+    def __init__(
+            self,
+            client_id: str,
+            client_secret: str,
+            session: aiohttp.ClientSession = None,
+            controller: RateController = None,
+        ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.session = session
+        self.controller = controller or RateController(rate=3, max_in_flight=4, max_retries=4)
+        self._own_session = session is None
+        self._token_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        if self.session is None:
+            self.session = create_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._own_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def get_token(self, refresh: bool = False) -> str:
+        '''
+        Retourne le token OAuth en cache, ou en demande un nouveau s'il est
+        absent, expiré (avec une marge d'une minute) ou refusé.
+        '''
+        async with self._token_lock:
+            cached = _TOKEN_CACHE.get(self.client_id)
+            if cached and not refresh and time.time() < cached["expires_at"]:
+                return cached["access_token"]
+            data = {
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "scope": f"api_offresdemploiv2 o2dsoffre application_{self.client_id}",
+            }
+            async with self.session.post(
+                ENDPOINT_ACCESS_TOKEN,
+                params={"realm": "/partenaire"},
+                data=data,
+            ) as response:
+                response.raise_for_status()
+                token = await read_json(response)
+            token["expires_at"] = time.time() + token["expires_in"] - 60
+            _TOKEN_CACHE[self.client_id] = token
+            return token["access_token"]
+
+    async def search_range(
+            self,
+            params: dict,
+            start: int,
+            end: int,
+        ) -> tuple:
+        '''
+        Recherche une plage de résultats, avec nouvelles tentatives en cas
+        de 429, d'erreur serveur ou de token expiré.
+        ---
+        Retourne:
+        ---
+        (resultats, max_results): liste des offres de la plage et nombre
+        total d'offres lu dans l'en-tête `Content-Range`.
+        '''
+        params = {**params, "range": f"{start}-{end}"}
+        refresh = False
+        for attempt in range(self.controller.max_retries + 1):
+            token = await self.get_token(refresh)
+            refresh = False
+            async with self.controller:
+                try:
+                    async with self.session.get(
+                        SEARCH_ENDPOINT,
+                        params=params,
+                        headers={"Authorization": f"Bearer {token}"},
+                    ) as response:
+                        if response.status == 204:
+                            self.controller.on_success()
+                            return [], 0
+                        if response.status == 401:
+                            refresh = True
+                            continue
+                        if response.status == 429:
+                            self.controller.on_throttle(
+                                parse_retry_after(response.headers.get("Retry-After"))
+                            )
+                            continue
+                        if response.status < 500:
+                            response.raise_for_status()
+                            content = await read_json(response)
+                            self.controller.on_success()
+                            return (
+                                content.get("resultats", []),
+                                parse_content_range(response.headers.get("Content-Range")),
+                            )
+                        self.controller.on_error()
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    logging.debug(f"Pole Emploi range {start}-{end} error: {e}")
+                    self.controller.on_error()
+            await asyncio.sleep(self.controller.backoff_delay(attempt))
+        raise aiohttp.ClientError(f"Pole Emploi range {start}-{end} unavailable")
+
+    async def search(self, params: dict) -> list:
+        '''
+        Récupère toutes les offres d'une recherche : la première plage donne
+        `max_results`, les plages restantes sont demandées en parallèle et
+        chacune est réessayée indépendamment.
+        ---
+        Paramètres:
+        ---
+        params: dict: paramètres de recherche de l'API (motsCles, ...).
+        ---
+        Retourne:
+        ---
+        results: list: offres d'emploi trouvées.
+        '''
+        results, max_results = await self.search_range(params, 0, RANGE_SIZE - 1)
+        last_index = min(max_results - 1, RANGE_LAST_INDEX)
+        ranges = [
+            (start, min(start + RANGE_SIZE - 1, last_index))
+            for start in range(RANGE_SIZE, last_index + 1, RANGE_SIZE)
+        ]
+        if max_results - 1 > RANGE_LAST_INDEX:
+            logging.warning(
+                f"{max_results} offers found, Pole Emploi API only returns the first {RANGE_LAST_INDEX + 1}."
+            )
+        responses = await asyncio.gather(
+            *[self.search_range(params, start, end) for start, end in ranges],
+            return_exceptions=True,
+        )
+        for (start, end), response in zip(ranges, responses):
+            if isinstance(response, BaseException):
+                logging.error(f"Range {start}-{end} could not be fetched: {response}")
+                continue
+            results.extend(response[0])
+        return results
+
+
+def parse_content_range(content_range: str) -> int:
+    '''
+    Lit le nombre total d'offres dans l'en-tête `Content-Range`
+    ("offres 0-149/1234").
+    '''
+    match = re.search(r"offres \d+-\d+/(\d+)", content_range or "")
+    return int(match.group(1)) if match else 0
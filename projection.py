@@ -0,0 +1,48 @@
+import pandas as pd
+
+
+def get_path(record, path: tuple):
+    '''
+    Valeur au chemin `path` d'un dictionnaire JSON décodé (clés de
+    dictionnaire ou positions dans une liste), None si le chemin n'existe
+    pas.
+
+    >>> get_path({"urls": [{"href": "a"}]}, ("urls", 0, "href"))
+    'a'
+    '''
+    value = record
+    for key in path:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return value
+
+
+def project_records(
+        records: list,
+        fields: dict,
+    ) -> pd.DataFrame:
+    '''
+    Construit un dataframe à partir des seuls champs utiles d'une liste
+    de dictionnaires JSON (réponses d'API), en un seul passage : chaque
+    champ est lu à son chemin dans chaque enregistrement et rangé dans sa
+    colonne, sans créer de dataframe intermédiaire avec tous les champs.
+    ---
+    Paramètres:
+    ---
+    records: list: dictionnaires JSON décodés.
+    fields: dict: {nom de colonne: chemin}, le chemin étant un tuple de
+    clés ou de positions dans une liste.
+    ---
+    Retourne:
+    ---
+    df: pd.DataFrame: une ligne par enregistrement, une colonne par champ
+    (vide quand le champ est absent).
+    '''
+    columns = {name: [] for name in fields}
+    appends = [(columns[name].append, path) for name, path in fields.items()]
+    for record in records:
+        for append, path in appends:
+            append(get_path(record, path))
+    return pd.DataFrame(columns, columns=list(fields))
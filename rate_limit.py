@@ -0,0 +1,197 @@
+import asyncio
+import random
+import time
+import logging
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+# Au-delà, 2 ** exposant dépasse tout backoff_max raisonnable (et lève
+# OverflowError vers 1024).
+MAX_BACKOFF_EXPONENT = 30
+
+
+class RateController:
+    '''
+    Contrôleur de concurrence pour les requêtes API : limite le nombre de
+    requêtes en cours, lisse le débit avec un seau à jetons et, en mode
+    adaptatif (AIMD), cherche le débit maximum accepté par l'API.
+    ---
+    Paramètres:
+    ---
+    rate: float: nombre de requêtes par seconde au démarrage.
+    max_in_flight: int: nombre maximum de requêtes simultanées.
+    burst: int: taille du seau à jetons (rafale autorisée).
+    adaptive: bool: active l'augmentation additive / diminution
+    multiplicative du débit en fonction des réponses 429.
+    min_rate: float: débit minimum en mode adaptatif.
+    max_rate: float: débit maximum en mode adaptatif.
+    increase: float: req/s ajoutées après chaque fenêtre sans 429.
+    decrease: float: facteur appliqué au débit après un 429.
+    max_retries: int: nombre de nouvelles tentatives par lien.
+    backoff_base: float: délai (s) du premier backoff.
+    backoff_max: float: délai (s) maximum d'un backoff.
+    '''
+    def __init__(
+            self,
+            rate: float = 14.0,
+            max_in_flight: int = 16,
+            burst: int = None,
+            adaptive: bool = False,
+            min_rate: float = 1.0,
+            max_rate: float = 50.0,
+            increase: float = 1.0,
+            decrease: float = 0.5,
+            max_retries: int = 5,
+            backoff_base: float = 1.0,
+            backoff_max: float = 60.0,
+        ):
+        self.rate = float(rate)
+        self.max_in_flight = max_in_flight
+        self.burst = burst or max(1, int(rate))
+        self.adaptive = adaptive
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failed_links = []
+        self.stats = {"requests": 0, "success": 0, "throttled": 0, "errors": 0}
+
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._window_successes = 0
+        self._consecutive_throttles = 0
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    async def acquire(self):
+        '''
+        Attend une place libre parmi les requêtes en cours puis un jeton
+        du seau.
+        '''
+        await self._semaphore.acquire()
+        try:
+            await self._take_token()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        self.stats["requests"] += 1
+
+    def release(self):
+        self._semaphore.release()
+
+    async def _take_token(self):
+        # Le verrou garde les requêtes en attente dans l'ordre d'arrivée.
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                elapsed = now - self._last_refill
+                self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def on_success(self):
+        '''
+        Enregistre une réponse valide et augmente le débit en mode
+        adaptatif après une fenêtre d'une seconde de succès.
+        '''
+        self.stats["success"] += 1
+        self._consecutive_throttles = 0
+        if not self.adaptive:
+            return
+        self._window_successes += 1
+        if self._window_successes >= max(1, int(self.rate)):
+            self._window_successes = 0
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: float = None) -> float:
+        '''
+        Enregistre une réponse 429 : suspend toutes les requêtes pendant
+        `retry_after` secondes (ou un backoff qui croît avec le nombre de 429
+        consécutifs, remis à zéro au premier succès) et réduit le débit en
+        mode adaptatif.
+        ---
+        Retourne:
+        ---
+        pause: float: durée (s) de la suspension appliquée.
+        '''
+        self.stats["throttled"] += 1
+        self._consecutive_throttles += 1
+        now = time.monotonic()
+        # Plusieurs requêtes en cours peuvent recevoir un 429 en même temps,
+        # on ne réduit le débit qu'une fois par suspension.
+        if self.adaptive and now >= self._paused_until:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.burst = max(1, int(self.rate))
+            self._window_successes = 0
+            logging.info(f"API throttled, lowering rate to {self.rate:.1f} req/s")
+        if retry_after is None:
+            retry_after = self.backoff_delay(self._consecutive_throttles)
+        self._paused_until = max(self._paused_until, now + retry_after)
+        self._tokens = 0.0
+        return retry_after
+
+    def on_error(self):
+        self.stats["errors"] += 1
+
+    def backoff_delay(self, attempt: int) -> float:
+        '''
+        Backoff exponentiel avec jitter complet.
+        '''
+        attempt = min(attempt, MAX_BACKOFF_EXPONENT)
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return random.uniform(0, delay)
+
+    def report(self) -> list:
+        '''
+        Affiche le bilan des requêtes et retourne la liste des liens qui
+        n'ont pas pu être récupérés.
+        '''
+        logging.info(
+            f"API requests: {self.stats['success']} ok, "
+            f"{self.stats['throttled']} throttled, "
+            f"{self.stats['errors']} errors, final rate {self.rate:.1f} req/s"
+        )
+        if self.failed_links:
+            logging.warning(f"{len(self.failed_links)} links could not be fetched:")
+            for link in self.failed_links:
+                logging.warning(f"  {link}")
+        return self.failed_links
+
+
+def parse_retry_after(value: str) -> float:
+    '''
+    Convertit l'en-tête `Retry-After` (secondes ou date HTTP) en nombre
+    de secondes à attendre.
+    '''
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+
+SALAIRE_NON_INDIQUE = "Salaire non indiqué"
+SALAIRE_PERIODES = pd.CategoricalDtype(
+    ["Annuel", "Mensuel", "Hebdomadaire", "Journalier", "Horaire"]
+)
+# Nombre de périodes dans une année (35 h par semaine, 218 jours travaillés).
+PERIODES_PAR_AN = {
+    "Annuel": 1,
+    "Mensuel": 12,
+    "Hebdomadaire": 52,
+    "Journalier": 218,
+    "Horaire": 35 * 52,
+}
+WTTJ_PERIODES = {
+    "yearly": "Annuel",
+    "monthly": "Mensuel",
+    "weekly": "Hebdomadaire",
+    "daily": "Journalier",
+    "hourly": "Horaire",
+}
+SALAIRE_COLS = [
+    "salaire",
+    "salaire_min",
+    "salaire_max",
+    "salaire_annuel",
+    "salaire_periode",
+]
+
+
+def salaires_pe(libelles: pd.Series) -> pd.DataFrame:
+    '''
+    Normalise les libellés de salaire Pole Emploi ("Annuel de 40000,00 Euros
+    à 50000,00 Euros sur 12 mois") sans boucle sur les lignes.
+    ---
+    Paramètres:
+    ---
+    libelles: pd.Series: libellés de salaire (None si non indiqué).
+    ---
+    Retourne:
+    ---
+    df: pd.DataFrame: colonnes SALAIRE_COLS, avec le même index que
+    `libelles`.
+    '''
+    # Les libellés se répètent beaucoup (mêmes fourchettes) : chaque
+    # libellé distinct n'est analysé qu'une fois.
+    codes, uniques = pd.factorize(libelles)
+    uniques = pd.Series(uniques, dtype="string")
+    periode = uniques.str.extract(
+        r"(Annuel|Mensuel|Hebdomadaire|Journalier|Horaire)", expand=False
+    )
+    # Un montant, ou une fourchette de deux montants.
+    montants = (
+        uniques.str.extract(r"(\d+,\d+)(?:\D+(\d+,\d+))?")
+        .apply(lambda col: col.str.replace(",", ".", regex=False))
+        .to_numpy("float64", na_value=np.nan)
+    )
+    # Code -1 (libellé manquant) : dernière ligne ajoutée, vide.
+    montants = np.vstack([montants, [[np.nan, np.nan]]])[codes]
+    periode = pd.Series(np.append(periode.to_numpy(object), None)[codes])
+    salaire_min = montants[:, 0]
+    salaire_max = np.where(np.isnan(montants[:, 1]), montants[:, 0], montants[:, 1])
+    df = _salaires_frame(
+        periode,
+        salaire_min,
+        salaire_max,
+        (salaire_min + salaire_max) / 2,
+    )
+    df.index = libelles.index
+    return df
+
+
+def salaires_wttj(
+        periodes: pd.Series,
+        salaires_min: pd.Series,
+        salaires_max: pd.Series,
+    ) -> pd.DataFrame:
+    '''
+    Normalise les salaires Welcome To The Jungle (période et fourchette
+    min/max, parfois en milliers d'euros) sans boucle sur les lignes.
+    ---
+    Paramètres:
+    ---
+    periodes: pd.Series: période du salaire ("yearly", "monthly", ...).
+    salaires_min / salaires_max: pd.Series: bornes de la fourchette.
+    ---
+    Retourne:
+    ---
+    df: pd.DataFrame: colonnes SALAIRE_COLS, avec le même index que
+    `periodes`.
+    '''
+    periode = periodes.reset_index(drop=True).map(WTTJ_PERIODES)
+    salaire_min = pd.to_numeric(salaires_min, errors="coerce").to_numpy("float64")
+    salaire_max = pd.to_numeric(salaires_max, errors="coerce").to_numpy("float64")
+    # Un montant à 0 correspond à une borne non renseignée.
+    salaire_min = np.where(salaire_min > 0, salaire_min, np.nan)
+    salaire_max = np.where(salaire_max > 0, salaire_max, np.nan)
+    # Moyenne des bornes renseignées, ou borne seule.
+    moyenne = np.where(
+        np.isnan(salaire_min),
+        salaire_max,
+        np.where(np.isnan(salaire_max), salaire_min, (salaire_min + salaire_max) / 2),
+    )
+    # Salaires annuels indiqués en milliers d'euros ("45" pour 45 000 €).
+    en_milliers = moyenne * _par_an(periode) < 100
+    echelle = np.where(en_milliers, 1000, 1)
+    df = _salaires_frame(
+        periode, salaire_min * echelle, salaire_max * echelle, moyenne * echelle
+    )
+    df.index = periodes.index
+    return df
+
+
+def _par_an(periode: pd.Series) -> np.ndarray:
+    return periode.map(PERIODES_PAR_AN).to_numpy("float64", na_value=np.nan)
+
+
+def _salaires_frame(
+        periode: pd.Series,
+        salaire_min: np.ndarray,
+        salaire_max: np.ndarray,
+        moyenne: np.ndarray,
+    ) -> pd.DataFrame:
+    annuel = moyenne * _par_an(periode)
+    indique = ~np.isnan(annuel)
+    # Colonne texte conservée pour l'affichage et les tables existantes.
+    salaire = np.full(len(annuel), SALAIRE_NON_INDIQUE, dtype=object)
+    salaire[indique] = annuel[indique].astype("int64").astype(str)
+    periode = periode.where(pd.Series(indique))
+    return pd.DataFrame({
+        "salaire": salaire,
+        "salaire_min": np.where(indique, salaire_min, np.nan).astype("float32"),
+        "salaire_max": np.where(indique, salaire_max, np.nan).astype("float32"),
+        "salaire_annuel": annuel.astype("float32"),
+        "salaire_periode": periode.astype(SALAIRE_PERIODES),
+    })
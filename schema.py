@@ -0,0 +1,136 @@
+import logging
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+ALL_JOBS_PATH = 'datasets/all_jobs.parquet'
+# Colonne à peu de valeurs distinctes : stockée une fois par valeur, lue
+# comme une colonne pandas "category".
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+SKILLS = pa.list_(CATEGORY)
+TIMESTAMP = pa.timestamp("ns", tz="UTC")
+
+# Schéma du dataset final all_jobs, dans l'ordre des colonnes.
+ALL_JOBS_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("date_publication", TIMESTAMP),
+    ("contrat", CATEGORY),
+    ("intitule", pa.string()),
+    ("description", pa.string()),
+    ("secteur_activite", CATEGORY),
+    ("niveau_etudes", CATEGORY),
+    ("experience", CATEGORY),
+    ("salaire", CATEGORY),
+    ("salaire_min", pa.float32()),
+    ("salaire_max", pa.float32()),
+    ("salaire_annuel", pa.float32()),
+    ("salaire_periode", CATEGORY),
+    ("entreprise", CATEGORY),
+    ("description_entreprise", CATEGORY),
+    ("ville", CATEGORY),
+    ("link", pa.string()),
+    ("logo", CATEGORY),
+    ("date_modif", TIMESTAMP),
+    ("latitude", pa.float32()),
+    ("longitude", pa.float32()),
+    ("metier", CATEGORY),
+    ("tech_skills", SKILLS),
+    ("soft_skills", SKILLS),
+])
+
+
+def to_arrow(
+        df: pd.DataFrame,
+        schema: pa.Schema = ALL_JOBS_SCHEMA,
+    ) -> pa.Table:
+    '''
+    Convertit un dataframe d'offres au schéma `schema` : colonnes dans
+    l'ordre du schéma, colonnes absentes vides et colonnes en trop
+    ignorées.
+    ---
+    Paramètres:
+    ---
+    df: pd.DataFrame: offres à convertir.
+    schema: pa.Schema: schéma à respecter.
+    ---
+    Retourne:
+    ---
+    table: pa.Table
+    '''
+    arrays = [
+        _to_arrow_array(
+            df[field.name] if field.name in df.columns else pd.Series([None] * len(df)),
+            field.type,
+        )
+        for field in schema
+    ]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _to_arrow_array(values: pd.Series, type: pa.DataType) -> pa.Array:
+    if pa.types.is_timestamp(type):
+        return pa.array(pd.to_datetime(values, utc=True), type=type)
+    if pa.types.is_floating(type):
+        return pa.array(pd.to_numeric(values, errors="coerce"), type=type, from_pandas=True)
+    if pa.types.is_list(type):
+        values = [list(value) if pd.api.types.is_list_like(value) else None for value in values]
+        return pa.array(values, type=type)
+    values = values.astype(object)
+    return pa.array(values.where(values.notna(), None), type=type)
+
+
+def write_all_jobs(
+        df: pd.DataFrame,
+        path: str = ALL_JOBS_PATH,
+    ):
+    '''
+    Écrit le dataset des offres avec le schéma ALL_JOBS_SCHEMA. Les
+    colonnes absentes du schéma ne sont pas écrites et sont signalées.
+    '''
+    unknown = [col for col in df.columns if col not in ALL_JOBS_SCHEMA.names]
+    if unknown:
+        logging.warning(f"Columns not in ALL_JOBS_SCHEMA, not saved in {path}: {unknown}")
+    pq.write_table(to_arrow(df), path)
+
+
+def read_all_jobs(
+        path: str = ALL_JOBS_PATH,
+        columns: list = None,
+    ) -> pd.DataFrame:
+    '''
+    Lit le dataset des offres : colonnes catégorielles en "category",
+    listes de compétences gardées au format Arrow (pas un tableau numpy par
+    ligne).
+    ---
+    Paramètres:
+    ---
+    path: str: chemin du fichier parquet.
+    columns: list: colonnes à lire (toutes par défaut).
+    '''
+    return pq.read_table(path, columns=columns).to_pandas(types_mapper=_types_mapper)
+
+
+def _types_mapper(type: pa.DataType):
+    if pa.types.is_list(type):
+        return pd.ArrowDtype(type)
+    return None
+
+
+def memory_report(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Mémoire occupée par chaque colonne du dataframe.
+    ---
+    Retourne:
+    ---
+    report: pd.DataFrame: type, mémoire (Mo) et part du total de chaque
+    colonne, de la plus grosse à la plus petite.
+    '''
+    memory = df.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "memoire_mo": memory / 1024 ** 2,
+        "part": memory / memory.sum(),
+    })
+    return report.sort_values("memoire_mo", ascending=False)
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from scipy import sparse
+
+
+# Nombre d'offres similaires renvoyées par défaut.
+TOP_K = 5
+
+
+def top_k(
+        scores: np.ndarray,
+        k: int = TOP_K,
+    ) -> tuple:
+    '''
+    Positions et valeurs des `k` plus grands scores, du plus grand au plus
+    petit, sans trier tout le tableau.
+    ---
+    Retourne:
+    ---
+    (positions, scores): tuple de np.ndarray.
+    '''
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=scores.dtype)
+    best = np.argpartition(scores, -k)[-k:]
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return best, scores[best]
+
+
+def posting_lists(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    '''
+    Transposée de la matrice (une ligne par mot : les offres qui le
+    contiennent et leur poids), pour ne parcourir que les mots de l'offre
+    de référence lors d'une requête.
+    '''
+    return matrix.T.tocsr()
+
+
+def row_scores(
+        matrix: sparse.csr_matrix,
+        vector: sparse.csr_matrix,
+        postings: sparse.csr_matrix = None,
+    ) -> np.ndarray:
+    '''
+    Produit scalaire d'une ligne creuse avec chaque ligne de la matrice.
+    Avec `postings`, seules les listes des mots présents dans `vector`
+    sont lues.
+    '''
+    if postings is not None:
+        return np.asarray(vector.data @ postings[vector.indices]).ravel()
+    return matrix @ vector.toarray().ravel()
+
+
+def query_row(
+        matrix: sparse.csr_matrix,
+        row: int,
+        k: int = TOP_K,
+        postings: sparse.csr_matrix = None,
+    ) -> tuple:
+    '''
+    Lignes les plus similaires (cosinus) à la ligne `row` d'une matrice
+    dont les lignes sont normalisées (norme L2), la ligne elle-même
+    exclue. Un seul produit ligne x matrice : la mémoire utilisée reste
+    proportionnelle au nombre de lignes.
+    ---
+    Paramètres:
+    ---
+    matrix: sparse.csr_matrix: une ligne normalisée par offre (TF-IDF).
+    row: int: position de l'offre de référence.
+    k: int: nombre de lignes renvoyées.
+    postings: sparse.csr_matrix: `posting_lists(matrix)`, optionnel, pour
+    des requêtes plus rapides sur un gros corpus.
+    ---
+    Retourne:
+    ---
+    (positions, scores): tuple de np.ndarray.
+    '''
+    scores = row_scores(matrix, matrix[row], postings)
+    scores[row] = -np.inf
+    positions, scores = top_k(scores, k)
+    keep = np.isfinite(scores)
+    return positions[keep], scores[keep]
+
+
+def similar_offers(
+        matrix: sparse.csr_matrix,
+        ids,
+        offer_id: str,
+        k: int = TOP_K,
+        postings: sparse.csr_matrix = None,
+    ) -> pd.DataFrame:
+    '''
+    Les `k` offres les plus similaires à une offre.
+    ---
+    Paramètres:
+    ---
+    matrix: sparse.csr_matrix: une ligne normalisée par offre, dans l'ordre
+    de `ids`.
+    ids: ids des offres.
+    offer_id: str: id de l'offre de référence.
+    k: int: nombre d'offres renvoyées.
+    postings: sparse.csr_matrix: `posting_lists(matrix)` (optionnel).
+    ---
+    Retourne:
+    ---
+    df: pd.DataFrame: colonnes "id" et "score", de la plus similaire à la
+    moins similaire.
+    '''
+    ids = pd.Index(ids)
+    row = ids.get_loc(offer_id)
+    positions, scores = query_row(matrix, row, k, postings)
+    return pd.DataFrame({"id": ids[positions], "score": scores})
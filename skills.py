@@ -0,0 +1,114 @@
+import json
+import re
+
+from functools import lru_cache
+
+import pandas as pd
+
+from text_norm import WORD, fold, tokenize
+
+
+SKILLS_PATH = "datasets/skills.json"
+# Séparateurs acceptés entre les mots d'une compétence ("power-bi",
+# "d'équipe", "R&D").
+PHRASE_SEPARATOR = r"[\s\-'’&/]+"
+
+
+def phrase_key(phrase: str) -> str:
+    return " ".join(tokenize(phrase))
+
+
+class SkillMatcher:
+    '''
+    Recherche de compétences compilée en une seule expression régulière :
+    chaque description est parcourue une fois et chaque expression
+    trouvée (un ou plusieurs mots, synonymes compris) donne directement le
+    nom de la compétence. À une même position, l'expression la plus longue
+    l'emporte ("power bi" plutôt que "bi").
+    ---
+    Paramètres:
+    ---
+    categories: dict: {catégorie: {compétence: [expressions]}}, par exemple
+    {"tech_skills": {"PowerBI": ["power bi", "powerbi"]}}.
+    ignore: list: expressions à ne pas compter comme compétence
+    ("tableau de bord" n'est pas Tableau).
+    '''
+    def __init__(
+            self,
+            categories: dict,
+            ignore: list = (),
+        ):
+        self.categories = list(categories)
+        self.skills = {}
+        for category, skills in categories.items():
+            for skill, phrases in skills.items():
+                for phrase in phrases:
+                    self.skills[phrase_key(phrase)] = (category, skill)
+        for phrase in ignore:
+            self.skills[phrase_key(phrase)] = None
+        # Expressions regroupées en arbre de préfixes : à chaque position,
+        # une seule branche est essayée et la plus longue l'emporte.
+        self.pattern = re.compile(r"\b" + _trie_regex(self.skills) + r"(?!\w)")
+
+    def match(self, text: str) -> dict:
+        '''
+        Retourne {catégorie: [compétences]} pour un texte, chaque
+        compétence une seule fois dans l'ordre où elle apparaît.
+        '''
+        found = {category: {} for category in self.categories}
+        if isinstance(text, str):
+            for match in self.pattern.finditer(fold(text)):
+                skill = self.skills.get(" ".join(WORD.findall(match.group())))
+                if skill is not None:
+                    found[skill[0]][skill[1]] = None
+        return {category: list(skills) for category, skills in found.items()}
+
+    def match_column(self, texts: pd.Series) -> pd.DataFrame:
+        '''
+        Applique `match` à toute une colonne.
+        ---
+        Retourne:
+        ---
+        df: pd.DataFrame: une colonne de listes par catégorie, avec le même
+        index que `texts`.
+        '''
+        return pd.DataFrame(
+            [self.match(text) for text in texts],
+            index=texts.index,
+            columns=self.categories,
+        )
+
+
+def _trie_regex(keys) -> str:
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return _node_regex(trie)
+
+
+def _node_regex(node: dict) -> str:
+    branches = [
+        (PHRASE_SEPARATOR if char == " " else re.escape(char)) + _node_regex(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not branches:
+        return ""
+    regex = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    # Fin d'expression possible : la suite est optionnelle (et essayée
+    # en premier).
+    return f"(?:{regex})?" if "" in node else regex
+
+
+@lru_cache
+def load_skill_matcher(path: str = SKILLS_PATH) -> SkillMatcher:
+    '''
+    Charge le dictionnaire des compétences (chargé une seule fois).
+    '''
+    with open(path, encoding="utf-8") as f:
+        dictionary = json.load(f)
+    ignore = dictionary.pop("ignore", [])
+    return SkillMatcher(dictionary, ignore)
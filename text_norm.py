@@ -0,0 +1,104 @@
+import re
+import unicodedata
+
+from functools import lru_cache
+
+import pandas as pd
+
+
+# Mots vides français (liste "french" de nltk), un par ligne.
+STOPWORDS_PATH = "datasets/stopwords_fr.txt"
+WORD = re.compile(r"\w+")
+COMBINING = re.compile(r"[\u0300-\u036f]")
+
+
+def fold(text: str) -> str:
+    '''
+    Met le texte en minuscules et retire les accents.
+    '''
+    return COMBINING.sub("", unicodedata.normalize("NFKD", text.lower()))
+
+
+def tokenize(text: str) -> list:
+    '''
+    Découpe un texte en mots sans accents, en minuscules ("Data-Engineer
+    confirmé" -> ["data", "engineer", "confirme"]).
+    '''
+    return WORD.findall(fold(text))
+
+
+@lru_cache
+def load_stopwords(path: str = STOPWORDS_PATH) -> frozenset:
+    '''
+    Charge les mots vides (une seule fois), sous la même forme que les mots
+    de `tokenize`.
+    '''
+    with open(path, encoding="utf-8") as f:
+        return frozenset(fold(line.strip()) for line in f if line.strip())
+
+
+def normalize(
+        text: str,
+        stopwords: frozenset = None,
+    ) -> str:
+    '''
+    Mots d'un texte sans les mots vides, séparés par des espaces.
+    ---
+    Paramètres:
+    ---
+    text: str: texte à normaliser.
+    stopwords: frozenset: mots à retirer (load_stopwords() par défaut).
+    '''
+    if stopwords is None:
+        stopwords = load_stopwords()
+    return " ".join(word for word in tokenize(text) if word not in stopwords)
+
+
+def normalize_column(
+        values: pd.Series,
+        stopwords: frozenset = None,
+    ) -> pd.Series:
+    '''
+    Applique `normalize` à toute une colonne, une seule fois par texte
+    distinct. Les valeurs manquantes donnent "".
+    ---
+    Retourne:
+    ---
+    pd.Series de textes normalisés, avec le même index que `values`.
+    '''
+    if stopwords is None:
+        stopwords = load_stopwords()
+    codes, uniques = pd.factorize(values)
+    normalized = [normalize(str(text), stopwords) for text in uniques]
+    # Code -1 (valeur manquante) : dernière valeur ajoutée.
+    normalized.append("")
+    return pd.Series(
+        pd.Series(normalized, dtype=object).to_numpy()[codes],
+        index=values.index,
+        name=values.name,
+    )
+
+
+def text_columns(
+        df: pd.DataFrame,
+        columns: list,
+    ) -> pd.Series:
+    '''
+    Réunit plusieurs colonnes (textes, catégories ou listes de
+    compétences) en un texte par ligne, séparé par des espaces. Les
+    valeurs manquantes sont ignorées.
+    '''
+    parts = [df[col].astype(object).map(_as_text) for col in columns]
+    return pd.Series(
+        [" ".join(part for part in row if part) for row in zip(*parts)],
+        index=df.index,
+        dtype=object,
+    )
+
+
+def _as_text(value) -> str:
+    if isinstance(value, str):
+        return value
+    if pd.api.types.is_list_like(value):
+        return " ".join(str(item) for item in value)
+    return "" if pd.isna(value) else str(value)
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from scipy import sparse
+
+from similarity import TOP_K, query_row
+from text_norm import normalize, load_stopwords, text_columns
+
+
+INDEX_PATH = "index/tfidf_text"
+# Colonnes des offres qui forment le texte comparé. Le contrat,
+# l'expérience, les compétences et le lieu ont leur propre bloc dans le
+# score hybride (voir hybrid.py).
+SIMILARITY_COLUMNS = ["intitule", "secteur_activite", "description"]
+# Tableaux de la matrice des poids, lus sans copie (memory map).
+MATRIX_FILES = ("data", "indices", "indptr")
+# Part du vocabulaire absente de toutes les offres au-delà de laquelle ces
+# mots sont retirés de l'index.
+MAX_UNUSED_TERMS = 0.5
+
+
+def content_hash(text: str) -> str:
+    '''
+    Empreinte du texte d'une offre, pour savoir si elle a changé.
+    '''
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+class TfidfIndex:
+    '''
+    Index TF-IDF persistant des offres, mis à jour sans tout recalculer :
+    seules les offres nouvelles ou modifiées sont découpées en mots, les
+    offres disparues sont retirées, et les poids de toutes les offres sont
+    recalculés à partir des nombres d'occurrences gardés dans l'index (IDF
+    lissé et normalisation L2, comme TfidfVectorizer).
+    ---
+    Contenu:
+    ---
+    terms: list: vocabulaire (position = colonne de la matrice).
+    doc_freq: np.ndarray: nombre d'offres contenant chaque mot.
+    counts: sparse.csr_matrix: occurrences de chaque mot, une ligne par
+    offre.
+    matrix: sparse.csr_matrix: poids TF-IDF normalisés (float32).
+    offers: pd.DataFrame: id, empreinte du texte et texte normalisé de
+    chaque ligne (cache : une offre dont l'empreinte n'a pas changé n'est
+    pas redécoupée).
+    updated_ids: np.ndarray: ids des offres ajoutées ou modifiées lors du
+    dernier `update`.
+    '''
+    def __init__(self):
+        self.terms = []
+        self.vocabulary = {}
+        self.doc_freq = np.zeros(0, dtype=np.int64)
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.offers = pd.DataFrame({"id": [], "hash": [], "tokens": []}, dtype=object)
+        # Modifié depuis le chargement (à enregistrer).
+        self.changed = False
+        self.updated_ids = np.empty(0, dtype=object)
+        self._postings = None
+
+    def __len__(self):
+        return len(self.offers)
+
+    def __contains__(self, offer_id):
+        return offer_id in self.rows
+
+    @property
+    def rows(self) -> pd.Index:
+        '''
+        Position de chaque offre dans la matrice, par id.
+        '''
+        return pd.Index(self.offers["id"])
+
+    @property
+    def postings(self) -> sparse.csr_matrix:
+        if self._postings is None:
+            self._postings = self.matrix.T.tocsr()
+        return self._postings
+
+    @property
+    def idf(self) -> np.ndarray:
+        return (np.log((1 + len(self)) / (1 + self.doc_freq)) + 1).astype(np.float32)
+
+    def update(
+            self,
+            df: pd.DataFrame,
+            columns: list = None,
+            extra_columns: list = None,
+        ) -> "TfidfIndex":
+        '''
+        Met l'index à jour avec le catalogue actuel des offres : ajoute les
+        offres nouvelles, redécoupe les offres modifiées et retire celles
+        qui ne sont plus dans `df`.
+        ---
+        Paramètres:
+        ---
+        df: pd.DataFrame: toutes les offres actuelles (colonne "id").
+        columns: list: colonnes du texte comparé (SIMILARITY_COLUMNS par
+        défaut).
+        extra_columns: list: colonnes hors du texte dont un changement fait
+        aussi compter l'offre comme modifiée (dans `updated_ids`).
+        '''
+        columns = [col for col in columns or SIMILARITY_COLUMNS if col in df.columns]
+        df = df.drop_duplicates(subset="id")
+        texts = text_columns(df, columns)
+        extra_columns = [col for col in extra_columns or [] if col in df.columns]
+        if extra_columns:
+            keys = texts + "\x1f" + text_columns(df, extra_columns)
+        else:
+            keys = texts
+        hashes = [content_hash(text) for text in keys]
+        current = pd.DataFrame({"id": df["id"].to_numpy(), "hash": hashes}, dtype=object)
+
+        known = self.offers.assign(row=np.arange(len(self)))
+        merged = current.merge(known, on=["id", "hash"], how="left")
+        unchanged = merged["row"].notna().to_numpy()
+        keep_rows = merged.loc[unchanged, "row"].astype(np.int64).to_numpy()
+        removed = np.setdiff1d(np.arange(len(self)), keep_rows)
+
+        stopwords = load_stopwords()
+        new_tokens = [normalize(text, stopwords) for text in texts[~unchanged]]
+        new_counts = self._count(new_tokens)
+        counts = self._resize(self.counts)
+
+        # Nombre d'offres par mot : les offres retirées sortent, les
+        # nouvelles entrent.
+        doc_freq = np.zeros(len(self.terms), dtype=np.int64)
+        doc_freq[:len(self.doc_freq)] = self.doc_freq
+        doc_freq -= np.bincount(counts[removed].indices, minlength=len(self.terms))
+        doc_freq += np.bincount(new_counts.indices, minlength=len(self.terms))
+        self.doc_freq = doc_freq
+
+        self.counts = sparse.vstack([counts[keep_rows], new_counts], format="csr")
+        if (self.doc_freq == 0).sum() > MAX_UNUSED_TERMS * len(self.terms):
+            self._compact()
+        self.offers = pd.concat([
+            self.offers.iloc[keep_rows],
+            pd.DataFrame({
+                "id": current.loc[~unchanged, "id"].to_numpy(),
+                "hash": current.loc[~unchanged, "hash"].to_numpy(),
+                "tokens": new_tokens,
+            }, dtype=object),
+        ], ignore_index=True)
+        self._reweight()
+        self.changed = self.changed or bool(len(new_tokens) or len(removed))
+        self.updated_ids = current.loc[~unchanged, "id"].to_numpy()
+        updated = current.loc[~unchanged, "id"].isin(known["id"]).sum()
+        logging.info(
+            f"TF-IDF index: {len(new_tokens) - updated} offers added, {updated} updated, "
+            f"{len(removed) - updated} removed ({len(self)} offers, {len(self.terms)} terms)."
+        )
+        return self
+
+    def _count(self, tokens: list) -> sparse.csr_matrix:
+        # Occurrences des mots de chaque texte, le vocabulaire est complété
+        # avec les nouveaux mots.
+        vocabulary = self.vocabulary
+        indices, indptr = [], [0]
+        for text in tokens:
+            for word in text.split():
+                column = vocabulary.get(word)
+                if column is None:
+                    column = vocabulary[word] = len(self.terms)
+                    self.terms.append(word)
+                indices.append(column)
+            indptr.append(len(indices))
+        counts = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int32), indptr),
+            shape=(len(tokens), len(self.terms)),
+        )
+        counts.sum_duplicates()
+        return counts
+
+    def _resize(self, matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+        matrix = sparse.csr_matrix(matrix)
+        matrix.resize(matrix.shape[0], len(self.terms))
+        return matrix
+
+    def _compact(self):
+        # Retire du vocabulaire les mots des offres disparues.
+        used = self.doc_freq > 0
+        self.counts = self.counts[:, used]
+        self.doc_freq = self.doc_freq[used]
+        self.terms = [term for term, keep in zip(self.terms, used) if keep]
+        self.vocabulary = {term: column for column, term in enumerate(self.terms)}
+
+    def _reweight(self):
+        # Poids TF-IDF de toutes les lignes, à partir des occurrences.
+        matrix = self.counts.copy()
+        matrix.data = matrix.data * self.idf[matrix.indices]
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        matrix = sparse.csr_matrix(sparse.diags(1 / norms) @ matrix, dtype=np.float32)
+        matrix.indices = matrix.indices.astype(np.int32)
+        matrix.indptr = matrix.indptr.astype(np.int32)
+        self.matrix = matrix
+        self._postings = None
+
+    def similar(
+            self,
+            offer_id: str,
+            k: int = TOP_K,
+        ) -> pd.DataFrame:
+        '''
+        Les `k` offres les plus similaires à une offre de l'index.
+        ---
+        Retourne:
+        ---
+        df: pd.DataFrame: colonnes "id" et "score".
+        '''
+        positions, scores = query_row(self.matrix, self.rows.get_loc(offer_id), k, self.postings)
+        return pd.DataFrame({"id": self.offers["id"].to_numpy()[positions], "score": scores})
+
+    def save(self, path: str = INDEX_PATH):
+        '''
+        Écrit l'index dans le dossier `path` (remplacé d'un coup : une
+        sauvegarde interrompue laisse l'ancien index intact).
+        '''
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for prefix, matrix in (("matrix", self.matrix), ("counts", self.counts)):
+            for name in MATRIX_FILES:
+                np.save(os.path.join(tmp_path, f"{prefix}_{name}.npy"), getattr(matrix, name))
+        np.save(os.path.join(tmp_path, "doc_freq.npy"), self.doc_freq)
+        with open(os.path.join(tmp_path, "terms.json"), "w", encoding="utf-8") as f:
+            json.dump(self.terms, f, ensure_ascii=False)
+        self.offers.to_parquet(os.path.join(tmp_path, "offers.parquet"), index=False)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        self.changed = False
+        logging.info(f"TF-IDF index saved to {path} ({len(self)} offers).")
+
+    @classmethod
+    def load(
+            cls,
+            path: str = INDEX_PATH,
+            mmap: bool = True,
+        ) -> "TfidfIndex":
+        '''
+        Charge l'index (un index vide s'il n'existe pas encore). Avec
+        `mmap`, la matrice des poids est lue à la demande depuis le disque.
+        '''
+        index = cls()
+        if not os.path.exists(os.path.join(path, "offers.parquet")):
+            return index
+        with open(os.path.join(path, "terms.json"), encoding="utf-8") as f:
+            index.terms = json.load(f)
+        index.vocabulary = {term: column for column, term in enumerate(index.terms)}
+        index.doc_freq = np.load(os.path.join(path, "doc_freq.npy"))
+        index.offers = pd.read_parquet(os.path.join(path, "offers.parquet")).astype(object)
+        shape = (len(index.offers), len(index.terms))
+        for prefix in ("matrix", "counts"):
+            arrays = [
+                np.load(os.path.join(path, f"{prefix}_{name}.npy"), mmap_mode="r" if mmap else None)
+                for name in MATRIX_FILES
+            ]
+            setattr(index, prefix, sparse.csr_matrix(tuple(arrays), shape=shape, copy=False))
+        return index
+
+
+def update_tfidf_index(
+        df: pd.DataFrame,
+        path: str = INDEX_PATH,
+        columns: list = None,
+        extra_columns: list = None,
+    ) -> TfidfIndex:
+    '''
+    Charge l'index, le met à jour avec le catalogue `df` (texte des
+    colonnes `columns`, SIMILARITY_COLUMNS par défaut, voir
+    `TfidfIndex.update` pour `extra_columns`) et l'enregistre s'il a
+    changé.
+    '''
+    index = TfidfIndex.load(path, mmap=False).update(df, columns, extra_columns)
+    if index.changed:
+        index.save(path)
+    return index
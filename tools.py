@@ -1,13 +1,9 @@
-from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.firefox.options import Options as FirefoxOptions
-from selenium.webdriver.firefox.service import Service
-from webdriver_manager.firefox import GeckoDriverManager
 
-import nltk
-from nltk.corpus import stopwords
+from browser_pool import get_browser_pool
 
 from offres_emploi.utils import dt_to_str_iso
 
@@ -15,21 +11,49 @@ from dotenv import load_dotenv
 import os
 
 import json
+from urllib.parse import urlencode
 
 import sqlalchemy
 
-from offres_emploi import Api
+from pole_emploi_client import PoleEmploiClient
+from offer_index import OFFER_TTL_DAYS, OfferIndex
+from http_cache import ResponseCache
+from checkpoint import Checkpoint
+from dedup import drop_near_duplicates
+from salary import salaires_pe, salaires_wttj
+from html_text import clean_html_column
+from skills import load_skill_matcher
+from parallel import map_chunks
+from projection import project_records
+from ann import update_ann_index
+from hybrid import update_hybrid_index
+from batch_similarity import update_similar_offers
+from schema import ALL_JOBS_PATH, memory_report, read_all_jobs, write_all_jobs
+from categories import (
+    CONTRATS_PE,
+    CONTRATS_WTTJ,
+    EXPERIENCES,
+    categorize,
+    clean_niveau_etude,
+    clean_ville,
+    clean_ville_pe,
+)
 # import datetime
 from datetime import datetime
 
 import re
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 import asyncio
 import aiohttp
+from contextlib import nullcontext
+
+from rate_limit import RateController, parse_retry_after
+from http_client import HTTP_STATS, create_session, loads, read_json
 
-from bs4 import BeautifulSoup
 
 from tqdm import tqdm
 
@@ -43,8 +67,30 @@ logging.basicConfig(
 )
 
 
+# Intitulés recherchés par scrapping("all").
+JOB_TITLES = ["Data Analyst", "Data Engineer", "Data Scientist"]
+# Sources interrogées et nombre de recherches simultanées par source.
+SOURCES = {
+    "wttj": 2,
+    "pole emploi": 3,
+}
+CHECKPOINT_PATH = 'checkpoints/all'
+# Préfixe des fichiers .parquet par source.
+SOURCE_FILE_PREFIX = {
+    "wttj": "WTTJ",
+    "pole emploi": "pole_emploi",
+}
+
+
 # Main Function
-def scrapping(job_title: str, page : int = None):
+def scrapping(
+        job_title: str,
+        page : int = None,
+        job_titles: list = None,
+        sources: dict = None,
+        incremental: bool = True,
+        resume: bool = True,
+    ):
     '''
     Fonction principale pour récupérer les infos et créer les bases de
     données.
@@ -52,117 +98,315 @@ def scrapping(job_title: str, page : int = None):
     Paramètres:
     ---
     job_title: str: Intitulé du poste pour lequel rechercher les offres
-    d'emplois sur les différents sites.
+    d'emplois sur les différents sites ("all" pour tous les intitulés de
+    `job_titles`).
+    page: int: Nombre de pages WTTJ à parcourir (toutes par défaut).
+    job_titles: list: Intitulés recherchés avec "all" (JOB_TITLES par
+    défaut).
+    sources: dict: Sources à interroger et nombre de recherches
+    simultanées pour chacune (SOURCES par défaut).
+    incremental: bool: Avec "all", ne récupère que les offres absentes de
+    l'index des offres connues (ou modifiées) et les fusionne avec
+    all_jobs.parquet.
+    resume: bool: Avec "all", sauvegarde chaque étape dans CHECKPOINT_PATH
+    et reprend un scrapping interrompu à la dernière étape terminée.
     '''
+    sources = sources or SOURCES
     if job_title == 'all':
-        # Data Analyst
-        logging.info("------------------------------")
-        logging.info("Getting Data Analyst offers...")
-        wttj_analyst = job_offers_wttj("data+analyst")
-        wttj_analyst = clean_date(wttj_analyst)
-        wttj_analyst["metier"] = "Data Analyst"
-
-        params = {
-            "motsCles": "data analyst",
-            # 'minCreationDate': dt_to_str_iso(datetime.datetime(
-            #     2023, 12, 1, 12, 30
-            # )),
-            # 'maxCreationDate': dt_to_str_iso(datetime.datetime.today()),
+        job_titles = job_titles or JOB_TITLES
+        # Les sauvegardes ne sont reprises que pour le même scrapping.
+        run = {
+            "job_titles": job_titles, "sources": sources, "page": page,
+            "incremental": incremental,
         }
-        pe_analyst = job_offers_pole_emploi(params)
-        pe_analyst = clean_date(pe_analyst)
-        pe_analyst["metier"] = "Data Analyst"
-
-        # Data Engineer
-        logging.info("------------------------------")
-        logging.info("Getting Data Engineer offers...")
-        wttj_engineer = job_offers_wttj("data+engineer")
-        wttj_engineer = clean_date(wttj_engineer)
-        wttj_engineer["metier"] = "Data Engineer"
-
-        params["motsCles"] = "data engineer",
-        pe_engineer = job_offers_pole_emploi(params)
-        pe_engineer = clean_date(pe_engineer)
-        pe_engineer["metier"] = "Data Engineer"
-
-        # Data Scientist
-        logging.info("------------------------------")
-        logging.info("Getting Data Scientist offers...")
-        wttj_scientist = job_offers_wttj("data+scientist")
-        wttj_scientist = clean_date(wttj_scientist)
-        wttj_scientist["metier"] = "Data Scientist"
-
-        params["motsCles"] = "data scientist",
-        pe_scientist = job_offers_pole_emploi(params)
-        pe_scientist = clean_date(pe_scientist)
-        pe_scientist["metier"] = "Data Scientist"
+        checkpoint = Checkpoint(CHECKPOINT_PATH, run=run) if resume else None
+        offer_index = OfferIndex()
+        previous = None
+        if incremental and os.path.exists(ALL_JOBS_PATH):
+            previous = read_all_jobs(ALL_JOBS_PATH)
+            logging.info(f"Incremental scrapping, {len(offer_index)} offers already known.")
+        results = asyncio.run(scrape_jobs(
+            job_titles, sources, page, offer_index if previous is not None else None,
+            checkpoint,
+        ))
+        for (title, source), df_source in results.items():
+            df_source["metier"] = title
 
         # Concat all
         logging.info("Regrouping dataframes...")
-        df = pd.concat(
-            [
-                wttj_analyst,
-                wttj_engineer,
-                wttj_scientist,
-                pe_analyst,
-                pe_engineer,
-                pe_scientist
-                ],
-            ignore_index=True
-        )
-        logging.info("Dropping duplicates...")
-        df = df.drop_duplicates(subset="id", keep="first")
-        df = extract_skills(df)
-        df = clean_nan(df)
-        df["ville"] = df["ville"].apply(clean_ville)
+        frames = [df_source for df_source in results.values() if not df_source.empty]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        new_offers = not df.empty and "id" in df.columns
+        if not new_offers:
+            logging.info("No new or updated offers.")
+        elif checkpoint and checkpoint.done("enriched", "all_jobs"):
+            df = checkpoint.load_frame("enriched", "all_jobs")
+        else:
+            logging.info("Dropping duplicates...")
+            df = df.drop_duplicates(subset="id", keep="first")
+            df = map_chunks(enrich_offers, df)
+            if checkpoint:
+                checkpoint.save_frame("enriched", df, "all_jobs")
+        changed = new_offers
+        if previous is not None:
+            if new_offers:
+                logging.info(f"Merging {len(df)} new or updated offers with known offers...")
+                previous = previous[~previous["id"].isin(df["id"])]
+            # Les offres retirées des sites expirent même sans nouvelle
+            # offre.
+            known = len(previous)
+            previous = drop_expired_offers(previous, offer_index)
+            changed = changed or len(previous) < known
+            df = pd.concat([df, previous], ignore_index=True) if new_offers else previous
+        if not changed:
+            logging.info("Nothing to save.")
+            # Dates de dernière présence des offres connues.
+            offer_index.save()
+            if checkpoint:
+                checkpoint.clear()
+            return
+        # Même offre sur plusieurs sites ou republiée avec un nouvel id.
+        logging.info("Dropping near-duplicates...")
+        df = drop_near_duplicates(df)
         logging.info("Saving .parquet file...")
-        df.to_parquet(f'datasets/all_jobs.parquet', index=False)
+        write_all_jobs(df, ALL_JOBS_PATH)
+        df = read_all_jobs(ALL_JOBS_PATH)
+        logging.info(f"Offers dataset in memory:\n{memory_report(df).to_string()}")
         df.to_csv(f'datasets/all_jobs.csv', index=False)
         logging.info("Updating .sqlite DB...")
         create_sql_table(df)
+        logging.info("Updating similarity index...")
+        hybrid_index = update_hybrid_index(df)
+        logging.info("Updating similar offers...")
+        update_similar_offers(hybrid_index)
+        logging.info("Updating ANN index...")
+        update_ann_index(hybrid_index)
+        # L'index n'est mis à jour qu'une fois les offres sauvegardées.
+        for (title, source), df_source in results.items():
+            if "id" in df_source.columns:
+                offer_index.update(offer_keys(source, df_source), df_source["date_modif"])
+        offer_index.save()
+        if checkpoint:
+            checkpoint.clear()
         logging.info("Finished!")
     else:
         job_title_nom_fichier = job_title.replace(" ", "_")
+        results = asyncio.run(scrape_jobs([job_title], sources, page))
+
+        frames = []
+        for (title, source), df_source in results.items():
+            if df_source.empty:
+                continue
+            df_source = map_chunks(enrich_offers, df_source)
+            prefix = SOURCE_FILE_PREFIX.get(source, source.replace(" ", "_"))
+            logging.info(f"Saving {prefix}_{job_title_nom_fichier}.parquet...")
+            write_all_jobs(df_source, f'datasets/{prefix}_{job_title_nom_fichier}.parquet')
+            frames.append(df_source)
+        # Concat all sources
+        if not frames:
+            logging.info(f"No {job_title} offer found, nothing to save.")
+            return
+        logging.info("Regrouping dataframes...")
+        df = pd.concat(frames, ignore_index=True)
+        logging.info("Dropping near-duplicates...")
+        df = drop_near_duplicates(df)
+        write_all_jobs(df, f'datasets/{job_title_nom_fichier}.parquet')
+        df.to_csv(f'datasets/all_jobs.csv', index=False)
+        logging.info("Finished!")
 
-        # WTTJ
-        df_wttj = job_offers_wttj(job_title, page)
-        df_wttj = clean_date(df_wttj)
-        df_wttj = extract_skills(df_wttj)
-        df_wttj = clean_nan(df_wttj)
-        logging.info(f"Saving WTTJ_{job_title_nom_fichier}.parquet...")
-        df_wttj.to_parquet(
-            f'datasets/WTTJ_{job_title_nom_fichier}.parquet', index=False
-        )
+def host_controllers() -> dict:
+    '''
+    Un contrôleur de débit par hôte interrogé, partagé par toutes les
+    recherches simultanées : les limites de débit, les réponses 429 et
+    les Retry-After d'un hôte valent pour toutes les recherches.
+    ---
+    Retourne:
+    ---
+    controllers: dict: {"wttj": API des offres WTTJ, "wttj search": moteur
+    de recherche WTTJ, "pole emploi": API Pole Emploi}.
+    '''
+    return {
+        "wttj": RateController(adaptive=True),
+        "wttj search": RateController(rate=10, max_in_flight=8),
+        "pole emploi": RateController(rate=3, max_in_flight=4, max_retries=4),
+    }
+
+async def scrape_jobs(
+        job_titles: list,
+        sources: dict,
+        page: int = None,
+        offer_index: OfferIndex = None,
+        checkpoint: Checkpoint = None,
+    ) -> dict:
+    '''
+    Lance en parallèle les recherches de chaque intitulé sur chaque source,
+    dans la limite de recherches simultanées de chaque source.
+    ---
+    Paramètres:
+    ---
+    job_titles: list: intitulés à rechercher.
+    sources: dict: sources et nombre de recherches simultanées par source.
+    page: int: nombre de pages WTTJ à parcourir.
+    offer_index: OfferIndex: index des offres connues, seules les offres
+    nouvelles ou modifiées sont récupérées.
+    checkpoint: Checkpoint: sauvegarde des étapes de chaque recherche.
+    ---
+    Retourne:
+    ---
+    results: dict: dataframe de chaque recherche, indexé par
+    (intitulé, source), dans l'ordre des sources puis des intitulés.
+    '''
+    semaphores = {source: asyncio.Semaphore(limit) for source, limit in sources.items()}
+    keys = [(title, source) for source in sources for title in job_titles]
+    controllers = host_controllers()
+
+    async def run(key, session):
+        title, source = key
+        async with semaphores[source]:
+            scoped = checkpoint.scoped(f"{source}_{title}") if checkpoint else None
+            return key, await scrape_source(
+                source, title, page, offer_index, session, scoped, controllers
+            )
 
-        # Pole Emploi
+    # Les résultats sont récupérés au fur et à mesure, l'ordre final reste
+    # celui des clés pour que drop_duplicates garde toujours la même offre.
+    results = dict.fromkeys(keys)
+    # Une seule session HTTP (et un seul pool de connexions) pour toutes
+    # les sources.
+    async with create_session() as session:
+        for task in asyncio.as_completed([run(key, session) for key in keys]):
+            try:
+                (title, source), df_source = await task
+            except Exception as e:
+                logging.error(f"Scrapping failed: {e}")
+                continue
+            logging.info(f"{title} on {source}: {len(df_source)} offers")
+            results[(title, source)] = df_source
+    HTTP_STATS.report()
+    return {key: df for key, df in results.items() if df is not None}
+
+async def scrape_source(
+        source: str,
+        job_title: str,
+        page: int = None,
+        offer_index: OfferIndex = None,
+        session: aiohttp.ClientSession = None,
+        checkpoint: Checkpoint = None,
+        controllers: dict = None,
+    ) -> pd.DataFrame:
+    '''
+    Récupère les offres d'un intitulé sur une source.
+    ---
+    Paramètres:
+    ---
+    source: str: "wttj" ou "pole emploi".
+    job_title: str: intitulé recherché.
+    page: int: nombre de pages WTTJ à parcourir.
+    offer_index: OfferIndex: index des offres connues.
+    session: aiohttp.ClientSession: session HTTP partagée.
+    checkpoint: Checkpoint: sauvegarde des étapes de cette recherche.
+    controllers: dict: contrôleurs de débit partagés par hôte (voir
+    `host_controllers`).
+    '''
+    controllers = controllers or host_controllers()
+    if checkpoint and checkpoint.done("clean"):
+        return checkpoint.load_frame("clean")
+    logging.info(f"Getting {job_title} offers from {source}...")
+    if source == "wttj":
+        df = await job_offers_wttj_async(
+            job_title, page, offer_index=offer_index, session=session, checkpoint=checkpoint,
+            controller=controllers["wttj"], search_controller=controllers["wttj search"],
+        )
+    elif source == "pole emploi":
         params = {
-            "motsCles": "data analyst",
+            "motsCles": job_title.lower(),
             # 'minCreationDate': dt_to_str_iso(datetime.datetime(
-            #     2023, 9, 1, 12, 30
+            #     2023, 12, 1, 12, 30
             # )),
             # 'maxCreationDate': dt_to_str_iso(datetime.datetime.today()),
         }
-        df_pole_emploi = job_offers_pole_emploi(params)
-        df_pole_emploi = clean_date(df_pole_emploi)
-        df_pole_emploi = extract_skills(df_pole_emploi)
-        df_pole_emploi = clean_nan(df_pole_emploi)
-
-        logging.info(f"Saving pole_emploi_{job_title_nom_fichier}.parquet...")
-        df_pole_emploi.to_parquet(
-            f'datasets/pole_emploi_{job_title_nom_fichier}.parquet', index=False
+        df = await job_offers_pole_emploi_async(
+            params, offer_index, session, checkpoint, controllers["pole emploi"]
         )
-        # Concat both
-        logging.info("Regrouping both dataframes...")
-        df = pd.concat([df_wttj, df_pole_emploi], ignore_index=True)
-        df.to_parquet(f'datasets/{job_title_nom_fichier}.parquet', index=False)
-        df.to_csv(f'datasets/all_jobs.csv', index=False)
-        logging.info("Finished!")
+    else:
+        raise ValueError(f"Unknown source: {source}")
+    df = clean_date(df)
+    # Un résultat vide peut venir d'une recherche en échec : il n'est pas
+    # sauvegardé, la recherche est refaite à la reprise.
+    if checkpoint and not df.empty:
+        checkpoint.save_frame("clean", df)
+    return df
+
+def offer_keys(
+        source: str,
+        df: pd.DataFrame
+    ) -> pd.Series:
+    '''
+    Retourne la clé de chaque offre dans l'index des offres connues : le
+    lien API pour WTTJ, l'id pour Pole Emploi.
+    '''
+    if source == "wttj":
+        return df["link"].map(wttj_api_link_from_url)
+    return df["id"]
+
+def drop_expired_offers(
+        previous: pd.DataFrame,
+        offer_index: OfferIndex,
+    ) -> pd.DataFrame:
+    '''
+    Retire de all_jobs les offres absentes des résultats de recherche
+    depuis plus de OFFER_TTL_DAYS jours (retirées des sites), ainsi que de
+    l'index des offres connues.
+    '''
+    keys = previous_offer_keys(previous)
+    expired = pd.Series(offer_index.expired(keys), index=previous.index, dtype=bool)
+    if expired.any():
+        logging.info(f"Dropping {expired.sum()} offers no longer listed for {OFFER_TTL_DAYS} days...")
+        offer_index.remove(keys[expired])
+        previous = previous[~expired]
+    return previous
+
+def previous_offer_keys(df: pd.DataFrame) -> pd.Series:
+    '''
+    Clé de chaque offre de all_jobs dans l'index des offres connues, sans
+    connaître sa source : le lien API pour les liens WTTJ, l'id sinon.
+    '''
+    wttj_keys = df["link"].astype(object).map(wttj_api_link_from_url)
+    return wttj_keys.where(wttj_keys.notna(), df["id"])
 
 
 # Welcome To The Jungle
+WTTJ_API_LINK = "https://api.welcometothejungle.com/api/v1/organizations"
+# Schéma des offres WTTJ nettoyées, commun à tous les groupes de lignes
+# écrits par stream_fetch_all.
+WTTJ_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("date_publication", pa.timestamp("ns", tz="UTC")),
+    ("contrat", pa.string()),
+    ("intitule", pa.string()),
+    ("description", pa.string()),
+    ("secteur_activite", pa.string()),
+    ("niveau_etudes", pa.string()),
+    ("experience", pa.string()),
+    ("salaire", pa.string()),
+    ("salaire_min", pa.float32()),
+    ("salaire_max", pa.float32()),
+    ("salaire_annuel", pa.float32()),
+    ("salaire_periode", pa.dictionary(pa.int8(), pa.string())),
+    ("entreprise", pa.string()),
+    ("description_entreprise", pa.string()),
+    ("ville", pa.string()),
+    ("link", pa.string()),
+    ("logo", pa.string()),
+    ("date_modif", pa.timestamp("ns", tz="UTC")),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+])
+
 def job_offers_wttj(
         job_title: str = "data analyst",
         page : int = None,
+        use_browser: bool = False,
     ) -> pd.DataFrame:
     '''
     Scrapping de toutes les offres d'emploi du site Welcome To The Jungle
@@ -172,68 +416,455 @@ def job_offers_wttj(
     ---
     job_title: str: Nom de l'intitulé du job pour lequel rechercher les
     offres.
+    page: int: Nombre de pages de résultats à parcourir (toutes par défaut).
+    use_browser: bool: Force la récupération des liens avec Selenium au
+    lieu du moteur de recherche de WTTJ.
 
     Retourne:
     ---
     df: pd.DataFrame: dataframe contenant les informations de chaque offres
     d'emploi trouvée.
     '''
-    # Instanciation de la liste contenant les liens pour les requêtes APIs.
-    api_links = []
-    # Lien de l'API de Welcome To The Jungle pour récupérer les données.
-    api_link = f"https://api.welcometothejungle.com/api/v1/organizations"
-    job = job_title.lower().replace(" ", "+")
-    # Instanciation du driver Firefox.
-    options = FirefoxOptions()
-    options.add_argument("--headless")
-    driver = webdriver.Firefox(
-        options=options,
-        service=Service(GeckoDriverManager().install()),
-        )
-    # Ouverture de la première page.
-    if page == None:
-        url = f"https://www.welcometothejungle.com/fr/jobs?refinementList%5Boffices.country_code%5D%5B%5D=FR&query={job}&page=1"
-        driver.get(url)
-        try:
-            # Récupère le numéro de la dernière page.
-            logging.info("Checking page numbers...")
-            page_numbers = WebDriverWait(driver, 10).until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".sc-ezreuY.gGgoDq"))
-            )
-            page_max = int(page_numbers[-1].text)
-            logging.info(f"Starting job offer scrapping for {page_max} pages on Welcome To The Jungle...")
-        except:
-            logging.info("Page number not found, scrapping for 1 page on Welcome To The Jungle...")
-            page_max = 1
+    return asyncio.run(job_offers_wttj_async(job_title, page, use_browser))
+
+async def job_offers_wttj_async(
+        job_title: str = "data analyst",
+        page : int = None,
+        use_browser: bool = False,
+        offer_index: OfferIndex = None,
+        session: aiohttp.ClientSession = None,
+        checkpoint: Checkpoint = None,
+        controller: RateController = None,
+        search_controller: RateController = None,
+    ) -> pd.DataFrame:
+    '''
+    Version asynchrone de `job_offers_wttj`, utilisée pour lancer
+    plusieurs recherches en parallèle. Avec `offer_index`, seules les
+    offres nouvelles ou modifiées sont récupérées. Avec `checkpoint`, les
+    liens et les réponses déjà récupérés ne sont pas redemandés.
+    `controller` (API des offres) et `search_controller` (moteur de
+    recherche) sont partagés entre les recherches simultanées.
+    '''
+    if checkpoint and checkpoint.done("links"):
+        api_links = checkpoint.load_json("links")
     else:
-        page_max = page
-    try:
-        for i in tqdm(range(1, page_max+1), desc="Pages Scrapped", unit="page"):
-            url = f"https://www.welcometothejungle.com/fr/jobs?refinementList%5Boffices.country_code%5D%5B%5D=FR&query={job}&page={i}"
-            # Ouvre chaque page sur le navigateur.
-            driver.get(url)
+        api_links = await collect_wttj_links(
+            job_title, page, use_browser, offer_index, session, search_controller
+        )
+        if checkpoint:
+            api_links = checkpoint.record_links(api_links)
+    # Pour chaque lien de la liste, fait une requête API et stocke les informations dans un dataframe.
+    df = await fetch_all(api_links, controller, session=session, checkpoint=checkpoint)
+    return df
+
+def job_offers_wttj_to_parquet(
+        job_title: str,
+        path: str,
+        page: int = None,
+        batch_size: int = 500,
+        use_browser: bool = False,
+    ) -> int:
+    '''
+    Scrapping des offres Welcome To The Jungle écrites directement dans un
+    fichier .parquet, par groupes de lignes, sans garder toutes les
+    réponses en mémoire.
+    ---
+    Paramètres:
+    ---
+    job_title: str: intitulé du job recherché.
+    path: str: fichier .parquet à écrire.
+    page: int: nombre de pages de résultats à parcourir.
+    batch_size: int: nombre d'offres par groupe de lignes.
+    ---
+    Retourne:
+    ---
+    rows: int: nombre d'offres écrites.
+    '''
+    async def run():
+        api_links = await collect_wttj_links(job_title, page, use_browser)
+        return await stream_fetch_all(api_links, path, batch_size)
+    return asyncio.run(run())
+
+async def collect_wttj_links(
+        job_title: str,
+        page: int = None,
+        use_browser: bool = False,
+        offer_index: OfferIndex = None,
+        session: aiohttp.ClientSession = None,
+        controller: RateController = None,
+    ):
+    '''
+    Récupère les liens API des offres, avec le moteur de recherche de WTTJ
+    s'il est configuré, sinon avec le pool de navigateurs (`controller` :
+    contrôleur de débit du moteur de recherche).
+    ---
+    Retourne:
+    ---
+    api_links: liste des liens (moteur de recherche) ou générateur
+    asynchrone des liens au fur et à mesure du chargement des pages
+    (navigateurs), pour que les requêtes API commencent sans attendre la
+    fin du parcours des pages.
+    '''
+    job = job_title.lower().replace(" ", "+")
+    api_links = None
+    if not use_browser:
+        search_config = wttj_search_config()
+        if search_config:
             try:
-                # Récupère le lien de chaque offre d'emploi sur la page.
-                contents = WebDriverWait(driver, 50).until(
-                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".sc-6i2fyx-0.gIvJqh"))
+                api_links = await search_wttj_links(
+                    job, page, offer_index=offer_index, session=session,
+                    controller=controller, **search_config
                 )
-                for content in contents:
-                    link = content.get_attribute("href")
-                    end_link = re.findall(r"/companies(.+)", link)[0]
-                    full_link = api_link + end_link
-                    # Rajoute le lien de chaque offre à la liste.
-                    api_links.append(full_link)
-            except Exception as e:
-                logging.error(f"Error scraping page {i} : {e}")
-    finally:
-        driver.quit()
-        # Pour chaque lien de la liste, fait une requête API et stocke les informations dans un dataframe.
+            except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as e:
+                logging.error(f"WTTJ search backend failed ({e}), falling back to Selenium...")
+        else:
+            logging.info("WTTJ search backend not configured, using Selenium...")
+    if api_links is None:
+        return wttj_links_browser(job, page, offer_index)
+    logging.info("Scrapping done!")
+    return api_links
+
+# Index du moteur de recherche trié par date de publication (du plus
+# récent au plus ancien) : les offres nouvelles sont dans les premières
+# pages.
+WTTJ_ALGOLIA_INDEX = "wttj_jobs_production_fr_published_at_desc"
+DATE_SORTED_SUFFIX = "_published_at_desc"
+
+def wttj_search_config() -> dict:
+    '''
+    Lit la configuration du moteur de recherche (Algolia) utilisé par la
+    page de résultats de Welcome To The Jungle dans le fichier .env.
+    ---
+    Variables:
+    ---
+    WTTJ_SEARCH_URL: url complète de la requête de recherche (permet
+    d'utiliser un serveur local de substitution).
+    WTTJ_ALGOLIA_APP_ID / WTTJ_ALGOLIA_API_KEY: identifiants publics de
+    recherche de la page de résultats.
+    WTTJ_ALGOLIA_INDEX: index interrogé (WTTJ_ALGOLIA_INDEX par défaut,
+    trié par date de publication).
+    ---
+    Retourne:
+    ---
+    dict des paramètres de `search_wttj_links`, vide si non configuré.
+    '''
+    load_dotenv()
+    app_id = os.getenv("WTTJ_ALGOLIA_APP_ID")
+    api_key = os.getenv("WTTJ_ALGOLIA_API_KEY", "")
+    index = os.getenv("WTTJ_ALGOLIA_INDEX", WTTJ_ALGOLIA_INDEX)
+    search_url = os.getenv("WTTJ_SEARCH_URL")
+    if not search_url:
+        if not (app_id and api_key):
+            return {}
+        search_url = f"https://{app_id.lower()}-dsn.algolia.net/1/indexes/{index}/query"
+    return {
+        "search_url": search_url,
+        "app_id": app_id or "",
+        "api_key": api_key,
+        # L'arrêt après une page d'offres connues suppose des résultats
+        # du plus récent au plus ancien.
+        "date_sorted": DATE_SORTED_SUFFIX in search_url,
+    }
+
+async def search_wttj_links(
+        job: str,
+        page: int = None,
+        search_url: str = None,
+        app_id: str = "",
+        api_key: str = "",
+        hits_per_page: int = 100,
+        offer_index: OfferIndex = None,
+        session: aiohttp.ClientSession = None,
+        controller: RateController = None,
+        date_sorted: bool = False,
+    ) -> list:
+    '''
+    Récupère les liens API des offres directement depuis le moteur de
+    recherche appelé par la page de résultats, sans navigateur. La
+    première page donne le nombre total de pages, les suivantes sont
+    demandées en parallèle.
+    ---
+    Paramètres:
+    ---
+    job: str: intitulé recherché ("data+analyst").
+    page: int: nombre maximum de pages à parcourir.
+    search_url: str: url de la requête de recherche.
+    app_id / api_key: str: identifiants envoyés dans les en-têtes Algolia.
+    hits_per_page: int: nombre d'offres par page de résultats.
+    offer_index: OfferIndex: index des offres connues, seules les offres
+    nouvelles ou modifiées sont renvoyées.
+    session: aiohttp.ClientSession: session HTTP partagée (créée si
+    absente).
+    controller: RateController: contrôleur de débit du moteur de
+    recherche (créé si absent).
+    date_sorted: bool: l'index de recherche est trié par date (ex:
+    wttj_jobs_production_fr_published_at_desc). Avec `offer_index`, les
+    pages sont alors demandées par vagues et la recherche s'arrête après
+    une page ne contenant que des offres connues. Sinon toutes les pages
+    sont parcourues.
+    ---
+    Retourne:
+    ---
+    api_links: list: liens API de chaque offre trouvée.
+    '''
+    headers = {
+        "X-Algolia-Application-Id": app_id,
+        "X-Algolia-API-Key": api_key,
+        "Referer": "https://www.welcometothejungle.com/",
+    }
+    query = job.replace("+", " ")
+    controller = controller or RateController(rate=10, max_in_flight=8)
+    async with nullcontext(session) if session else create_session() as session:
+        first = await fetch_search_page(session, search_url, query, 0, hits_per_page, controller, headers)
+        page_max = first.get("nbPages", 1)
+        if page:
+            page_max = min(page, page_max)
+        logging.info(f"Starting job offer search for {page_max} pages on Welcome To The Jungle...")
+        results = [first]
+        if offer_index is None or not date_sorted:
+            results += await asyncio.gather(*[
+                fetch_search_page(session, search_url, query, i, hits_per_page, controller, headers)
+                for i in range(1, page_max)
+            ])
+        else:
+            next_page = 1
+            known = known_search_page(first, offer_index)
+            while next_page < page_max and not known:
+                wave = range(next_page, min(page_max, next_page + controller.max_in_flight))
+                pages = await asyncio.gather(*[
+                    fetch_search_page(session, search_url, query, i, hits_per_page, controller, headers)
+                    for i in wave
+                ])
+                results += pages
+                known = any(known_search_page(result, offer_index) for result in pages)
+                next_page = wave.stop
+            if next_page < page_max:
+                logging.info(f"Stopped after {next_page} pages, next ones only hold known offers.")
+    if offer_index is not None:
+        offer_index.see(wttj_api_link(hit) for result in results for hit in result.get("hits", []))
+    # dict.fromkeys retire les doublons en gardant l'ordre des résultats.
+    api_links = dict.fromkeys(
+        link
+        for result in results
+        for hit in result.get("hits", [])
+        if (link := wttj_api_link(hit))
+        and (offer_index is None or offer_index.is_new_or_changed(link, hit.get("updated_at")))
+    )
+    return list(api_links)
+
+def known_search_page(
+        result: dict,
+        offer_index: OfferIndex
+    ) -> bool:
+    '''
+    Indique si une page de résultats ne contient que des offres connues et
+    non modifiées.
+    '''
+    hits = result.get("hits", [])
+    return bool(hits) and not any(
+        offer_index.is_new_or_changed(wttj_api_link(hit), hit.get("updated_at"))
+        for hit in hits
+    )
+
+async def fetch_search_page(
+        session,
+        search_url: str,
+        query: str,
+        page: int,
+        hits_per_page: int,
+        controller: RateController,
+        headers: dict = None,
+    ) -> dict:
+    '''
+    Requête d'une page de résultats du moteur de recherche WTTJ, limitée
+    aux offres situées en France. Les réponses 429 et 5xx, les erreurs de
+    connexion et les délais dépassés sont réessayés ; une autre réponse
+    4xx lève aiohttp.ClientResponseError sans nouvelle tentative.
+    '''
+    params = urlencode({
+        "query": query,
+        "page": page,
+        "hitsPerPage": hits_per_page,
+        "filters": "offices.country_code:FR",
+    })
+    for attempt in range(controller.max_retries + 1):
+        delay = None
+        async with controller:
+            try:
+                async with session.post(
+                    search_url, json={"params": params}, headers=headers
+                ) as response:
+                    if response.status == 429:
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        # La suspension est partagée par toutes les requêtes.
+                        controller.on_throttle(retry_after)
+                        delay = 0
+                    elif response.status >= 500:
+                        controller.on_error()
+                    else:
+                        response.raise_for_status()
+                        data = await read_json(response)
+                        controller.on_success()
+                        return data
+            except aiohttp.ClientResponseError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.debug(f"Request error on search page {page}: {e}")
+                controller.on_error()
+        if attempt == controller.max_retries:
+            # Dernière tentative : inutile d'attendre avant d'abandonner.
+            break
+        if delay is None:
+            delay = controller.backoff_delay(attempt)
+        await asyncio.sleep(delay)
+    raise aiohttp.ClientError(f"search page {page} unavailable")
+
+def wttj_api_link(hit: dict) -> str:
+    '''
+    Construit le lien API d'une offre à partir d'un résultat de recherche.
+    '''
+    organization = hit.get("organization") or {}
+    org_slug = organization.get("slug")
+    job_slug = hit.get("slug")
+    if not (org_slug and job_slug):
+        return None
+    return f"{WTTJ_API_LINK}/{org_slug}/jobs/{job_slug}"
+
+def wttj_api_link_from_url(url: str) -> str:
+    '''
+    Construit le lien API d'une offre à partir de son lien sur le site.
+    '''
+    end_link = re.findall(r"/companies(.+)", url or "")
+    if not end_link:
+        return None
+    return WTTJ_API_LINK + end_link[0]
+
+WTTJ_LISTING_URL = "https://www.welcometothejungle.com/fr/jobs?refinementList%5Boffices.country_code%5D%5B%5D=FR&query={job}&page={page}"
+
+async def wttj_links_browser(
+        job: str,
+        page: int = None,
+        offer_index: OfferIndex = None,
+        date_sorted: bool = False,
+    ):
+    '''
+    Récupère les liens API des offres en parcourant les pages de résultats
+    avec le pool de navigateurs headless (solution de repli). Les pages
+    sont chargées en parallèle et les liens sont renvoyés dès qu'une page
+    est chargée. Avec `offer_index`, les offres connues sont ignorées ; sur
+    une liste triée par date, les pages suivant une page ne contenant que
+    des offres connues sont aussi annulées.
+    ---
+    Paramètres:
+    ---
+    job: str: intitulé recherché ("data+analyst").
+    page: int: nombre de pages à parcourir (toutes par défaut).
+    offer_index: OfferIndex: index des offres connues.
+    date_sorted: bool: les pages de WTTJ_LISTING_URL sont triées par date
+    (les offres nouvelles d'abord). Elles sont triées par pertinence : une
+    offre nouvelle peut suivre une page d'offres connues, toutes les pages
+    sont donc parcourues par défaut.
+    ---
+    Retourne:
+    ---
+    Générateur asynchrone des liens API de chaque offre.
+    '''
+    pool = get_browser_pool()
+    # La première page donne aussi le nombre de pages.
+    logging.info("Checking page numbers...")
+    first = await asyncio.wrap_future(pool.submit(
+        WTTJ_LISTING_URL.format(job=job, page=1), parse_wttj_first_page
+    ))
+    if first is None:
+        logging.error("Error scraping page 1, no offer collected on Welcome To The Jungle.")
+        return
+    page_max = page or first["page_max"]
+    logging.info(f"Starting job offer scrapping for {page_max} pages on Welcome To The Jungle...")
+    links, known = filter_page_links(first["links"], offer_index)
+    for link in links:
+        yield link
+    if known and date_sorted:
+        return
+    pending = {
+        asyncio.wrap_future(pool.submit(
+            WTTJ_LISTING_URL.format(job=job, page=i), parse_wttj_listing
+        )): i
+        for i in range(2, page_max + 1)
+    }
+    with tqdm(total=page_max, initial=1, desc="Pages Scrapped", unit="page") as progress:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                progress.update()
+                page_links = future.result()
+                if page_links is None:
+                    logging.error(f"Error scraping page {i}")
+                    continue
+                links, known = filter_page_links(page_links, offer_index)
+                if known and date_sorted:
+                    logging.info(f"Page {i} only holds known offers, cancelling next pages.")
+                    for other, j in list(pending.items()):
+                        if j > i and not other.done():
+                            other.cancel()
+                            pending.pop(other)
+                for link in links:
+                    yield link
     logging.info("Scrapping done!")
-    df = asyncio.run(fetch_all(api_links))
-    return df
+
+def filter_page_links(
+        page_links: list,
+        offer_index: OfferIndex = None
+    ) -> tuple:
+    '''
+    Retire les offres connues d'une page de résultats.
+    ---
+    Retourne:
+    ---
+    (links, known): liens à récupérer et True si la page ne contenait que
+    des offres connues.
+    '''
+    if offer_index is None:
+        return page_links, False
+    offer_index.see(page_links)
+    links = [link for link in page_links if link not in offer_index]
+    return links, bool(page_links) and not links
+
+def parse_wttj_listing(
+        driver,
+        timeout: float = 50
+    ) -> list:
+    '''
+    Récupère le lien API de chaque offre d'une page de résultats chargée
+    dans le navigateur.
+    '''
+    contents = WebDriverWait(driver, timeout).until(
+        EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".sc-6i2fyx-0.gIvJqh"))
+    )
+    links = (wttj_api_link_from_url(content.get_attribute("href")) for content in contents)
+    return [link for link in links if link]
+
+def parse_wttj_first_page(driver) -> dict:
+    '''
+    Récupère le numéro de la dernière page et les liens de la première
+    page de résultats.
+    '''
+    try:
+        page_numbers = WebDriverWait(driver, 10).until(
+            EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".sc-ezreuY.gGgoDq"))
+        )
+        page_max = int(page_numbers[-1].text)
+    except (TimeoutException, ValueError):
+        logging.info("Page number not found, scrapping for 1 page on Welcome To The Jungle...")
+        page_max = 1
+    return {"page_max": page_max, "links": parse_wttj_listing(driver)}
 
 async def fetch_all(
         api_links:list,
+        controller: RateController = None,
+        cache: ResponseCache = None,
+        session: aiohttp.ClientSession = None,
+        checkpoint: Checkpoint = None,
         # cols_to_keep:list
     ) -> pd.DataFrame:
     '''
@@ -244,35 +875,174 @@ async def fetch_all(
     Paramètres:
     ---
     api_links: list: liste de tout les liens API des offres d'emploi
-    récoltées.
-    cols_to_keep: list: liste des noms de colonnes à garder dans le
-    dataframe final.
+    récoltées, ou générateur asynchrone de liens (les requêtes sont alors
+    lancées au fur et à mesure).
+    controller: RateController: contrôleur du débit et de la concurrence
+    des requêtes (adaptatif par défaut). Les liens en échec sont
+    disponibles dans `controller.failed_links`.
+    cache: ResponseCache: cache disque des réponses (créé par défaut,
+    False pour le désactiver).
+    session: aiohttp.ClientSession: session HTTP partagée (créée si
+    absente).
+    checkpoint: Checkpoint: journal des réponses déjà récupérées, seuls
+    les liens absents du journal sont demandés.
     ---
     Retourne:
     ---
     df: pd.DataFrame : dataframe avec les colonnes nettoyées.
     '''
+    if controller is None:
+        controller = RateController(adaptive=True)
+    own_cache = cache is None
+    if own_cache:
+        cache = ResponseCache()
+    fetched = checkpoint.load_responses() if checkpoint else {}
+
+    async def fetch_link(session, link):
+        if link in fetched:
+            return fetched[link]
+        response = await fetch(session, link, controller, cache or None)
+        if checkpoint and response:
+            checkpoint.append_response(link, response)
+        return response
+
     logging.info("API requests...")
-    tasks = []
-    async with aiohttp.ClientSession() as session:
-        for link in api_links:
-            task = asyncio.create_task(fetch(session, link))
-            tasks.append(task)
-            await asyncio.sleep(0.07)
-            # tasks = [fetch(session, link) for link in api_links]
-        responses = await asyncio.gather(*tasks)
-        logging.info("API requests done!")
-
-        logging.info("Creating dataframe...")
-        full_df = pd.concat([pd.json_normalize(resp["job"]) for resp in responses if "job" in resp], ignore_index=True)
-
-    df = global_clean_wttj(full_df)
+    try:
+        async with nullcontext(session) if session else create_session() as session:
+            if isinstance(api_links, list):
+                tasks = [fetch_link(session, link) for link in api_links]
+            else:
+                tasks = []
+                async for link in api_links:
+                    tasks.append(asyncio.create_task(fetch_link(session, link)))
+            responses = await asyncio.gather(*tasks)
+    finally:
+        if own_cache:
+            cache.evict()
+            cache.close()
+    logging.info("API requests done!")
+    controller.report()
+
+    logging.info("Creating dataframe...")
+    jobs = [resp["job"] for resp in responses if resp and "job" in resp]
+    if not jobs:
+        logging.info("No Welcome To The Jungle offer fetched.")
+        return pd.DataFrame()
+    full_df = project_records(jobs, WTTJ_FIELDS)
+
+    # Nettoyage (CPU) hors de la boucle : les autres sources continuent
+    # leurs requêtes pendant ce temps.
+    df = await asyncio.get_running_loop().run_in_executor(None, map_chunks, global_clean_wttj, full_df)
     logging.info("Welcome To The Jungle DataFrame done!")
     return df
 
+async def stream_fetch_all(
+        api_links: list,
+        path: str,
+        batch_size: int = 500,
+        controller: RateController = None,
+        cache: ResponseCache = None,
+        session: aiohttp.ClientSession = None,
+    ) -> int:
+    '''
+    Version en flux de `fetch_all` : les réponses sont lues au fur et à
+    mesure, regroupées par lots de `batch_size` offres, nettoyées et écrites
+    comme groupes de lignes d'un fichier .parquet. La file des réponses est
+    bornée, la mémoire utilisée ne dépend donc pas du nombre d'offres.
+    ---
+    Paramètres:
+    ---
+    api_links: list: liens API des offres.
+    path: str: fichier .parquet à écrire.
+    batch_size: int: nombre d'offres par groupe de lignes.
+    controller: RateController: contrôleur du débit des requêtes.
+    cache: ResponseCache: cache disque des réponses (False pour le
+    désactiver).
+    session: aiohttp.ClientSession: session HTTP partagée.
+    ---
+    Retourne:
+    ---
+    rows: int: nombre d'offres écrites.
+    '''
+    if not isinstance(api_links, list):
+        api_links = [link async for link in api_links]
+    if controller is None:
+        controller = RateController(adaptive=True)
+    own_cache = cache is None
+    if own_cache:
+        cache = ResponseCache()
+    links = asyncio.Queue()
+    for link in api_links:
+        links.put_nowait(link)
+    responses = asyncio.Queue(maxsize=batch_size)
+
+    async def worker(session):
+        while True:
+            try:
+                link = links.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                response = await fetch(session, link, controller, cache or None)
+            except Exception as e:
+                # L'erreur est transmise à la boucle principale, qui
+                # attendrait sinon une réponse qui n'arrivera jamais.
+                await responses.put(e)
+                return
+            await responses.put(response)
+
+    rows = 0
+    batch = []
+    writer = pq.ParquetWriter(path, WTTJ_SCHEMA)
+    logging.info(f"Streaming {len(api_links)} offers to {path}...")
+    try:
+        async with nullcontext(session) if session else create_session() as session:
+            workers = [
+                asyncio.create_task(worker(session))
+                for _ in range(controller.max_in_flight)
+            ]
+            for _ in tqdm(range(len(api_links)), desc="Offers fetched", unit="offer"):
+                response = await responses.get()
+                if isinstance(response, Exception):
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+                    raise response
+                if response and "job" in response:
+                    batch.append(response["job"])
+                if len(batch) >= batch_size:
+                    rows += write_wttj_batch(writer, batch)
+                    batch = []
+            await asyncio.gather(*workers)
+        if batch:
+            rows += write_wttj_batch(writer, batch)
+    finally:
+        writer.close()
+        if own_cache:
+            cache.evict()
+            cache.close()
+    controller.report()
+    logging.info(f"{rows} Welcome To The Jungle offers written to {path}.")
+    return rows
+
+def write_wttj_batch(
+        writer: pq.ParquetWriter,
+        jobs: list
+    ) -> int:
+    '''
+    Nettoie un lot d'offres WTTJ et l'écrit comme groupe de lignes.
+    '''
+    df = global_clean_wttj(project_records(jobs, WTTJ_FIELDS))
+    df = clean_date(df)
+    df = df.reindex(columns=WTTJ_SCHEMA.names)
+    writer.write_table(pa.Table.from_pandas(df, schema=WTTJ_SCHEMA, preserve_index=False))
+    return len(df)
+
 async def fetch(
         session,
-        url
+        url,
+        controller: RateController = None,
+        cache: ResponseCache = None,
     ):
     '''
     Requête API pour récupérer les infos d'une offre d'emploi
@@ -282,68 +1052,104 @@ async def fetch(
     ---
     session: aiohttp session.
     url: url de l'api contenant les infos d'une offre d'emploi.
+    controller: RateController: contrôleur partagé entre les requêtes
+    (limite de concurrence, débit, Retry-After et backoff).
+    cache: ResponseCache: cache disque. Une réponse récente est renvoyée
+    sans requête, une réponse plus ancienne est revalidée avec
+    If-None-Match / If-Modified-Since.
     ---
     Retourne:
     ---
-    fichier json contenant les informations d'une offre d'emploi.
-    '''
-    while True:
-        try:
-            async with session.get(url) as response:
-                if response.status == 429:
-                    logging.error("API Limit reached!")
-                    await asyncio.sleep(30)
-                    continue
-                return await response.json()
-        except:
-            await asyncio.sleep(30)
-
-def clean_link(text):
-    cleaned_link = text["href"]
-    return cleaned_link
+    fichier json contenant les informations d'une offre d'emploi, ou None
+    si le lien n'a pas pu être récupéré après `max_retries` tentatives.
+    '''
+    if controller is None:
+        controller = RateController()
+    cached = cache.get(url) if cache else None
+    if cached and cached.fresh:
+        return loads(cached.body)
+    headers = cached.conditional_headers() if cached else {}
+    for attempt in range(controller.max_retries + 1):
+        delay = None
+        async with controller:
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304 and cached:
+                        cache.revalidated(url)
+                        controller.on_success()
+                        return loads(cached.body)
+                    if response.status == 429:
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        # La suspension est partagée par toutes les requêtes.
+                        controller.on_throttle(retry_after)
+                        delay = 0
+                    elif response.status >= 500:
+                        controller.on_error()
+                    elif response.status >= 400:
+                        # Offre supprimée ou lien invalide : inutile de réessayer.
+                        controller.on_error()
+                        controller.failed_links.append(url)
+                        return None
+                    else:
+                        body = await response.read()
+                        data = loads(body)
+                        if cache:
+                            cache.store(url, body, response.headers)
+                        controller.on_success()
+                        return data
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logging.debug(f"Request error on {url}: {e}")
+                controller.on_error()
+        if attempt == controller.max_retries:
+            # Dernière tentative : inutile d'attendre avant d'abandonner.
+            break
+        if delay is None:
+            delay = controller.backoff_delay(attempt)
+        await asyncio.sleep(delay)
+    controller.failed_links.append(url)
+    return None
+
+# Champs gardés dans une offre WTTJ (colonnes de
+# create_cols_to_keep('wttj', ...)) et leur chemin dans le JSON.
+WTTJ_FIELDS = {
+    "published_at": ("published_at",),
+    "contract_type": ("contract_type",),
+    "name": ("name",),
+    "description": ("description",),
+    "organization.industry": ("organization", "industry"),
+    "education_level": ("education_level",),
+    "salary_period": ("salary_period",),
+    "organization.name": ("organization", "name"),
+    "organization.description": ("organization", "description"),
+    "office.city": ("office", "city"),
+    # Premier lien de l'offre.
+    "link": ("urls", 0, "href"),
+    "organization.logo.url": ("organization", "logo", "url"),
+    "salary_min": ("salary_min",),
+    "salary_max": ("salary_max",),
+    "experience_level": ("experience_level",),
+    "updated_at": ("updated_at",),
+    "office.latitude": ("office", "latitude"),
+    "office.longitude": ("office", "longitude"),
+    "reference": ("reference",),
+}
 
 def global_clean_wttj(df_to_clean):
-    # Creating list of cols_to_drop
-    cols_to_keep = create_cols_to_keep('wttj', df_to_clean)
-    cols_to_drop = [col for col in df_to_clean.columns if col not in cols_to_keep]
-    # Cleaning link column
-    df_urls = pd.json_normalize(df_to_clean["urls"])
-    df_urls["link"] = df_urls[0]
-    df_urls = df_urls.drop(columns=[0,1])
-    df_urls["link"] = df_urls["link"].apply(clean_link)
-    url_merged = pd.concat([df_to_clean, df_urls], axis=1)
-    # Dropping unused columns
-    df = url_merged.drop(columns=cols_to_drop)
-    # Cleaning all remaining columns
-    df["description"] = df["description"].apply(clean_html)
-    df["organization.description"] = df["organization.description"].apply(clean_html)
-    # df.fillna(
-    #     {
-    #         "salary_period" : None,
-    #         "salary_max" : None,
-    #         "salary_min" : None
-    # }, inplace=True
-    # )
-    df["salaire"] = df.apply(lambda row: clean_salaire_wttj(
-        row["salary_period"], row["salary_max"], row["salary_min"]
-    ), axis = 1)
+    # Colonnes déjà extraites des offres brutes par project_records (copie :
+    # les offres reçues ne sont pas modifiées)
+    df = df_to_clean[create_cols_to_keep('wttj', df_to_clean)].copy()
+    df["description"] = clean_html_column(df["description"])
+    df["organization.description"] = clean_html_column(df["organization.description"])
+    df = df.assign(**salaires_wttj(
+        df["salary_period"], df["salary_min"], df["salary_max"]
+    ))
 
     df = rename_and_reorder_cols("wttj", df)
 
-    df["contrat"] = df["contrat"].str.replace(
-        "full_time", "CDI"
-        ).str.replace("internship", "Stage"
-        ).str.replace("apprenticeship", "Alternance"
-        ).str.replace("temporary", "CDD"
-        ).str.replace("other", "Autre"
-        ).str.replace("vie", "CDI"
-        ).str.replace("freelance", "Freelance"
-        ).str.replace("part_time", "CDI"
-    )
-    df["niveau_etudes"] = df["niveau_etudes"].astype(str)
-    df["niveau_etudes"] = df["niveau_etudes"].apply(clean_niveau_etude)
-    df["secteur_activite"] = df["secteur_activite"].apply(clean_secteur_activite)
-    df["experience"] = df["experience"].apply(clean_experience)
+    df["contrat"] = categorize(df["contrat"], CONTRATS_WTTJ)
+    df["niveau_etudes"] = categorize(df["niveau_etudes"], clean_niveau_etude, "Non spécifié")
+    df["secteur_activite"] = categorize(df["secteur_activite"], {}, "Non spécifié")
+    df["experience"] = categorize(df["experience"], EXPERIENCES)
 
     return df
 
@@ -366,167 +1172,129 @@ def job_offers_pole_emploi(
     df_final: pd.DataFrame: dataframe contenant les informations pour
     toutes les offres d'emplois demandées.
     '''
+    return asyncio.run(job_offers_pole_emploi_async(params))
+
+async def job_offers_pole_emploi_async(
+        params : dict,
+        offer_index: OfferIndex = None,
+        session: aiohttp.ClientSession = None,
+        checkpoint: Checkpoint = None,
+        controller: RateController = None,
+    ) -> pd.DataFrame:
+    '''
+    Version asynchrone de `job_offers_pole_emploi`. Avec `offer_index`,
+    seules les offres nouvelles ou modifiées sont nettoyées. Avec
+    `checkpoint`, les offres brutes déjà récupérées ne sont pas
+    redemandées.
+    '''
+    if checkpoint and checkpoint.done("responses"):
+        results = checkpoint.load_json("responses")
+    else:
+        results = await fetch_pole_emploi(params, session, controller)
+        if results is None:
+            # Recherche en échec : rien n'est sauvegardé, elle sera refaite
+            # à la reprise.
+            results = []
+        elif checkpoint:
+            checkpoint.save_json("responses", results)
+    if offer_index is not None:
+        offer_index.see(result.get("id") for result in results)
+        total = len(results)
+        results = [
+            result for result in results
+            if offer_index.is_new_or_changed(result.get("id"), result.get("dateActualisation"))
+        ]
+        logging.info(f"Pole Emploi: {len(results)} new or updated offers out of {total}.")
+    # Nettoyage (CPU) hors de la boucle, comme dans `fetch_all`.
+    return await asyncio.get_running_loop().run_in_executor(None, build_pole_emploi_df, results)
+
+async def fetch_pole_emploi(
+        params: dict,
+        session: aiohttp.ClientSession = None,
+        controller: RateController = None,
+    ) -> list:
+    '''
+    Récupère toutes les offres Pole Emploi d'une recherche avec le client
+    asynchrone (toutes les plages de résultats en parallèle).
+    ---
+    Paramètres:
+    ---
+    params: dict: paramètres de recherche de l'API.
+    session: aiohttp.ClientSession: session partagée (optionnelle).
+    controller: RateController: contrôleur de débit partagé (optionnel).
+    ---
+    Retourne:
+    ---
+    results: list: offres brutes renvoyées par l'API, None si la recherche
+    a échoué.
+    '''
     load_dotenv()
     client_id = os.getenv('USER_POLE_EMPLOI')
     api_key = os.getenv('API_KEY_POLE_EMPLOI')
-    # Initialisation des variables locales
-    results = []
-    start_range = 0
-    max_results = float('inf')
-    api_client = Api(client_id=client_id,
-             client_secret=api_key)
     logging.info("Requesting Pole Emploi API...")
     try:
-        # Pagination pour récupérer tous les résultats
-        while start_range < max_results:
-            params['range'] = f"{start_range}-{start_range + 149}"  # Utilisation de la pagination
-
-            # Effectuer la recherche
-            search_result = api_client.search(params=params)
-            content_range = search_result.get('Content-Range', {})
-            max_results_str = content_range.get('max_results', '0')
-            max_results = int(max_results_str)
-
-            # Ajouter les résultats actuels à la liste globale
-            results.extend(search_result.get('resultats', []))
-
-            # Mettre à jour la plage de départ pour la prochaine itération
-            start_range += 150
-    except Exception as e:
-        print(f"Une erreur s'est produite lors de la recherche : {e}")
-    if max_results > 0:
-        df_emploi = pd.DataFrame(results)
-        df_final = global_clean_pe(df_emploi)
+        async with PoleEmploiClient(client_id, api_key, session=session, controller=controller) as client:
+            return await client.search(params)
+    except aiohttp.ClientError as e:
+        logging.error(f"Pole Emploi search failed for {params}: {e}")
+        return None
+
+# Champs gardés dans une offre brute Pole Emploi (colonnes de
+# create_cols_to_keep('pole emploi', ...)) et leur chemin dans le JSON.
+PE_FIELDS = {
+    "dateCreation": ("dateCreation",),
+    "typeContrat": ("typeContrat",),
+    "intitule": ("intitule",),
+    "description": ("description",),
+    "secteurActiviteLibelle": ("secteurActiviteLibelle",),
+    # Niveau de la première formation demandée.
+    "niveauLibelle": ("formations", 0, "niveauLibelle"),
+    "libelle": ("salaire", "libelle"),
+    "nom": ("entreprise", "nom"),
+    "description_entreprise": ("entreprise", "description"),
+    "ville": ("lieuTravail", "libelle"),
+    "urlOrigine": ("origineOffre", "urlOrigine"),
+    "logo": ("entreprise", "logo"),
+    "experienceLibelle": ("experienceLibelle",),
+    "dateActualisation": ("dateActualisation",),
+    "latitude": ("lieuTravail", "latitude"),
+    "longitude": ("lieuTravail", "longitude"),
+    "id": ("id",),
+}
+
+def build_pole_emploi_df(
+        results: list
+    ) -> pd.DataFrame:
+    '''
+    Créé et nettoie le dataframe des offres Pole Emploi.
+    '''
+    if results:
+        df_emploi = project_records(results, PE_FIELDS)
+        df_final = map_chunks(global_clean_pe, df_emploi)
         logging.info("Pole Emploi DataFrame done!")
         return df_final
     else:
-        print("Aucune offre d'emploi trouvée.")
+        logging.info("Aucune offre d'emploi trouvée.")
         return pd.DataFrame()
 
-def clean_dict_columns(
-        df: pd.DataFrame
-    ) -> pd.DataFrame:
-    '''
-    Extrait les informations des colonnes contenus dans un dictionnaire
-    sur plusieurs colonnes
-    ---
-    Paramètres:
-    ---
-    df: pd.DataFrame: Le dataframe dans lequel extraire les dictionnaires.
-    ---
-    Retourne:
-    ---
-    df_final: pd.DataFrame: dataframe avec les dictionnaires séparés en
-    plusieurs colonnes.
-    '''
-    dict_cols = [
-        ("lieuTravail", ["commune"]),
-        ("entreprise", ["entrepriseAdaptee", "url"]),
-        ("salaire", ["complement1", "complement2", "commentaire"]),
-        ("formations", ["codeFormation", "domaineLibelle", "exigence", "commentaire"]),
-        ("origineOffre", ["origine", "partenaires"]),
-    ]
-
-    if dict_cols[0][0] in df.columns:
-        df_lieu_travail = pd.json_normalize(df["lieuTravail"])
-    for cols in dict_cols[0][1]:
-        if cols in df_lieu_travail.columns:
-            df_lieu_travail.drop(cols, axis=1, inplace=True)
-    if "libelle" in df_lieu_travail.columns:
-        df_lieu_travail.rename({"libelle" : "ville"}, axis = 1, inplace = True)
-
-    if dict_cols[1][0] in df.columns:
-        df_entreprise = pd.json_normalize(df["entreprise"])
-    for cols in dict_cols[1][1]:
-        if cols in df_entreprise.columns:
-            df_entreprise.drop(cols, axis=1, inplace=True)
-    if "description" in df_entreprise:
-        df_entreprise.rename({"description" : "description_entreprise"}, axis=1, inplace=True)
-
-    if dict_cols[2][0] in df.columns:
-        df_salaire = pd.json_normalize(df["salaire"])
-    for cols in dict_cols[2][1]:
-        if cols in df_salaire.columns:
-            df_salaire.drop(cols, axis=1, inplace=True)
-
-    if dict_cols[3][0] in df.columns:
-        df_formations = df["formations"].explode()
-        df_formations = pd.json_normalize(df_formations)
-    for cols in dict_cols[3][1]:
-        if cols in df_formations:
-            df_formations.drop(cols, axis=1, inplace=True)
-
-    if dict_cols[4][0] in df.columns:
-        df_origine = pd.json_normalize(df["origineOffre"])
-    for cols in dict_cols[4][1]:
-        if cols in df_origine.columns:
-            df_origine.drop(cols, axis=1, inplace=True)
-
-    df_final = pd.concat(
-        [
-            df,
-            df_formations,
-            df_salaire,
-            df_entreprise,
-            df_lieu_travail,
-            df_origine
-    ], axis=1)
-    return df_final
-
 def global_clean_pe(df_to_clean):
-    # Separating dictionnaries in columns
-    df_to_clean = clean_dict_columns(df_to_clean)
-    cols_to_keep = create_cols_to_keep('pole emploi', df_to_clean)
-    cols_to_drop = [col for col in df_to_clean.columns if col not in cols_to_keep]
-    # Dropping unused columns
-    df_to_clean.drop(cols_to_drop, axis=1, inplace=True)
-    df = rename_and_reorder_cols("pole emploi", df_to_clean)
+    # Colonnes déjà extraites des offres brutes par project_records (copie :
+    # les offres reçues ne sont pas modifiées)
+    df = rename_and_reorder_cols("pole emploi", df_to_clean.copy())
     # Cleaning remaining columns
-    df["niveau_etudes"] = df["niveau_etudes"].astype(str)
-    df["niveau_etudes"] = df["niveau_etudes"].apply(clean_niveau_etude)
-    df["ville"] = df["ville"].str.title().str.replace(r"\d+", "", regex=True).str.replace("-", "").str.strip()
-    df["contrat"] = df["contrat"].str.replace("MIS", "Interim").str.replace("FRA", "Autre").str.replace("LIB", "Autre")
+    df["niveau_etudes"] = categorize(df["niveau_etudes"], clean_niveau_etude, "Non spécifié")
+    df["ville"] = categorize(df["ville"], clean_ville_pe)
+    df["contrat"] = categorize(df["contrat"], CONTRATS_PE)
     df[df["salaire"].isna()] = None
-    df["salaire"] = df["salaire"].apply(clean_salaire_pe)
-    df["secteur_activite"] = df["secteur_activite"].apply(clean_secteur_activite)
-    df["experience"] = df["experience"].apply(clean_experience)
+    df = df.assign(**salaires_pe(df["salaire"]))
+    df["secteur_activite"] = categorize(df["secteur_activite"], {}, "Non spécifié")
+    df["experience"] = categorize(df["experience"], EXPERIENCES)
+    df = df[[col for col in reorder_cols() if col in df.columns]]
 
     return df
 
 
 # Data Cleaning
-def clean_html(text):
-    '''
-    Clean le html dans la description de certaines offres d'emplois.
-    ---
-    Paramètres
-    ---
-    text: texte dans lequel clean le html.
-    '''
-    if pd.isna(text):
-        return ""
-
-    soup = BeautifulSoup(str(text), 'html.parser')
-    cleaned_text = soup.get_text(separator=" ")
-    cleaned_text = cleaned_text.replace("\xa0", " ").replace("\n", "")
-    return cleaned_text
-
-def clean_niveau_etude(text) -> str:
-    '''
-    Nettoie la colonne "niveau_etudes".
-    '''
-    text = text.lower().strip()
-    if "bac+5" in text or "bac_5" in text:
-        return "Bac +5"
-    if "bac+4" in text or "bac_4" in text:
-        return "Bac +4"
-    if "bac+3" in text or "bac_3" in text:
-        return "Bac +3"
-    if "bac+2" in text or "bac_2" in text:
-        return "Bac +2"
-    else:
-        return "Non spécifié"
-
 def clean_date(
         df: pd.DataFrame,
     ):
@@ -536,138 +1304,22 @@ def clean_date(
 
     return df
 
-def clean_salaire_pe(text):
-    if text:
-        if "Annuel" in text:
-            matches = re.findall(r'\d+,\d+', text)
-            if matches:
-                salaries = [float(match.replace(',', '.')) for match in matches]
-                average_salary = sum(salaries) / len(salaries)
-                # if "13 mois" in text:
-                #     months = "13 mois"
-                # else:
-                #     months = "12 mois"
-                return f'{int(average_salary)}'
-        elif "Mensuel" in text:
-            matches = re.findall(r'\d+,\d+', text)
-            if matches:
-                monthly_salaries = [float(match.replace(',', '.')) for match in matches]
-                average_salary = sum(monthly_salaries) / len(monthly_salaries)
-                average_annual_salary = average_salary * 12
-                # if "13 mois" in text:
-                #     months = "13 mois"
-                # else:
-                #     months = "12 mois"
-                return f'{int(average_annual_salary)}'
-        elif "Horaire" in text:
-            matches = re.findall(r'\d+,\d+', text)
-            if matches:
-                hourly_salaries = [float(match.replace(',', '.')) for match in matches]
-                average_salary = sum(hourly_salaries) / len(hourly_salaries)
-                average_annual_salary = average_salary * 35 * 52
-                return f'{int(average_annual_salary)}'
-    return f'Salaire non indiqué'
-
-def clean_salaire_wttj(salary_period, salary_max, salary_min):
-    if salary_period:
-        if salary_period == "yearly":
-            if salary_max and salary_min:
-                salary = (salary_max + salary_min) / 2
-                if salary < 100:
-                    salary *= 1000
-                return f'{int(salary)}'
-            else:
-                return f'Salaire non indiqué'
-        elif salary_period == "monthly":
-            if salary_max and salary_min:
-                monthly_max = salary_max * 12
-                monthly_min = salary_min * 12
-                monthly_salary = (monthly_max + monthly_min) / 2
-                if monthly_salary < 100:
-                    salary *= 1000
-                return f'{int(monthly_salary)}'
-            else:
-                return f'Salaire non indiqué'
-    else:
-        return f'Salaire non indiqué'
-
-def clean_secteur_activite(text):
-    if text == None:
-        return "Aucune information"
-    else:
-        return text
-
-def clean_experience(text):
-    if text == None or text in [
-        'Débutant accepté (0 YEAR)',
-        'LESS_THAN_6_MONTHS'
-    ]:
-        text = "Débutant accepté"
-    elif text == '6_MONTHS_TO_1_YEAR':
-        text = "6 mois"
-    elif text in [
-        'Expérience exigée de 1 An(s)',
-        '1_TO_2_YEARS'
-    ]:
-        text = "1 an"
-    elif text in [
-        'Expérience exigée de 2 An(s)',
-        '24 mois',
-        '2_TO_3_YEARS'
-    ]:
-        text = "2 ans"
-    elif text in [
-        'Expérience exigée de 3 An(s)',
-        'Expérience souhaitée de 3 An(s)',
-        '3_TO_4_YEARS',
-        '36 mois'
-    ]:
-        text = "3 ans"
-    elif text in [
-        '4_TO_5_YEARS',
-        'Expérience exigée de 4 An(s)'
-    ]:
-        text = "4 ans"
-    elif text in [
-        '5 ans - DATA ANALYST',
-        '5 ans - 5 ans minimum',
-        'Expérience exigée de 5 An(s)',
-        '5_TO_7_YEARS',
-    ]:
-        text = "5 ans"
-    elif text in [
-        'Expérience exigée de 6 An(s)',
-        '7_TO_10_YEARS',
-    ]:
-        text = "+5 ans"
-    elif text == '10_TO_15_YEARS':
-        text = "10 ans"
-    elif text in [
-        'Expérience exigée',
-        'Expérience souhaitée',
-    ]:
-        text = "Non spécifié"
-
-    return text
-
 def clean_nan(df):
     df.dropna(subset="entreprise", axis = 0, inplace = True)
     df.dropna(subset="latitude", axis = 0, inplace = True)
-    df.fillna(
-        {
-            "logo" : "",
-            "description_entreprise" : "Aucune information",
-            "secteur_activite" : "Non spécifié"
-    }, inplace=True
-    )
+    values = {
+        "logo" : "",
+        "description_entreprise" : "Aucune information",
+        "secteur_activite" : "Non spécifié"
+    }
+    for col, value in values.items():
+        # Une colonne catégorielle ne peut être remplie qu'avec une catégorie.
+        if col in df and isinstance(df[col].dtype, pd.CategoricalDtype) \
+                and value not in df[col].cat.categories:
+            df[col] = df[col].cat.add_categories(value)
+    df.fillna(values, inplace=True)
     return df
 
-def clean_ville(text):
-    text = text.replace("-", " ").replace("'", " ")
-    text = text.lower()
-    text = text.title()
-    return text
-
 
 # Reordering/renaming
 def create_cols_to_keep(
@@ -806,6 +1458,10 @@ def reorder_cols(
         "niveau_etudes",
         "experience",
         "salaire",
+        "salaire_min",
+        "salaire_max",
+        "salaire_annuel",
+        "salaire_periode",
         "entreprise",
         "description_entreprise",
         "ville",
@@ -819,198 +1475,13 @@ def reorder_cols(
 
 
 # Skill extract
-def tech_skills_list():
-    technical_skills = [
-        'python',
-        'flask',
-        'pandas',
-        'spark',
-        'pyspark',
-        'scikit-learn',
-        'numpy',
-        'sql',
-        'mysql',
-        'nltk',
-        'nlp',
-        'fastapi',
-        'pytorch',
-        'snowflake',
-        'pandas',
-        'rivery',
-        'django',
-        'react',
-        'html',
-        'machine',
-        'learning',
-        'tableau',
-        'power',
-        'bi',
-        'powerbi',
-        'looker',
-        'warehouse',
-        'dbt',
-        'ia',
-        'ai',
-        'dataiku',
-        'iku',
-        'r',
-        'datalake',
-        'lake',
-        'data',
-        'ml',
-        'scala',
-        'api',
-        'aws'
-    ]
-    return technical_skills
-
-def soft_skills_list():
-    soft_skills = [
-        'resolution',
-        'probleme',
-        'autonomie',
-        'organisation',
-        'rigueur',
-        'initiative',
-        "esprit",
-        "equipe",
-        'communication',
-        'creativite',
-        'critique',
-        'confiance',
-        'soi',
-        'adaptation',
-        'gestion',
-        'temps',
-        'stress',
-        'empathie',
-        'curiosite',
-    ]
-    return soft_skills
-
-def clean_description(df):
-    if not nltk.data.find("corpora/stopwords"):
-        nltk.download("stopwords")
-    stop = stopwords.words("french")
-    df["description_cleaned"] = df["description"].apply(
-        lambda x: " "
-        .join(x.lower() for x in x.split())
-    ).str.replace('[^\w\s]', ' ', regex=True).apply(lambda x: ' '.join(
-        x for x in x.split() if x not in stop)
-    )
-    return df
-
-def extract_tech_skills(description):
-    skills = set(description.lower().split())
-    technical_skills = tech_skills_list()
-    extracted_skills = list(skills.intersection(technical_skills))
-    extracted_skills = regroup_tech_skills(extracted_skills)
-    return extracted_skills
-
-def extract_soft_skills(description):
-    skills = set(description.lower().split())
-    soft_skills = soft_skills_list()
-    extracted_skills = list(skills.intersection(soft_skills))
-    extracted_skills = regroup_soft_skills(extracted_skills)
-    return extracted_skills
-
-def regroup_tech_skills(tech_skills):
-    tech_skills = [skill.title() for skill in tech_skills]
-
-    if "Sql" in tech_skills:
-        index = tech_skills.index("Sql")
-        tech_skills[index] = "SQL"
-    if "Api" in tech_skills:
-        index = tech_skills.index("Api")
-        tech_skills[index] = "API"
-    if "Aws" in tech_skills:
-        index = tech_skills.index("Aws")
-        tech_skills[index] = "AWS"
-    if "Nlp" in tech_skills:
-        index = tech_skills.index("Nlp")
-        tech_skills[index] = "NLP"
-    if "Dbt" in tech_skills:
-        index = tech_skills.index("Dbt")
-        tech_skills[index] = "DBT"
-    if "Mysql" in tech_skills:
-        index = tech_skills.index("Mysql")
-        tech_skills[index] = "MySQL"
-    if "Ml" in tech_skills:
-        index = tech_skills.index("Ml")
-        tech_skills[index] = "Machine Learning"
-    if "Pyspark" in tech_skills:
-        index = tech_skills.index("Pyspark")
-        tech_skills[index] = "PySpark"
-    if "Machine" in tech_skills and "Learning" in tech_skills:
-        index = tech_skills.index("Machine")
-        tech_skills[index] = "Machine Learning"
-        tech_skills.remove("Learning")
-    if "Power" in tech_skills and "Bi" in tech_skills:
-        index = tech_skills.index("Power")
-        tech_skills[index] = "PowerBI"
-        tech_skills.remove("Bi")
-    if "Powerbi" in tech_skills:
-        index = tech_skills.index("Powerbi")
-        tech_skills[index] = "PowerBI"
-    if "Data" in tech_skills and "Iku" in tech_skills:
-        index = tech_skills.index("iku")
-        tech_skills[index] = "Dataiku"
-    if "Data" in tech_skills and "Lake" in tech_skills:
-        index = tech_skills.index("Lake")
-        tech_skills[index] = "Datalake"
-    if "Data" in tech_skills:
-        tech_skills.remove("Data")
-    if "Ia" in tech_skills or "Ai" in tech_skills:
-        tech_skills.append("IA")
-        try:
-            tech_skills.remove("Ia")
-        except:
-            pass
-        try:
-            tech_skills.remove("Ai")
-        except:
-            pass
-    if "Bi" in tech_skills:
-        tech_skills.append("BI")
-        tech_skills.remove("Bi")
-
-    tech_skills = set(tech_skills)
-
-    return list(tech_skills)
-
-def regroup_soft_skills(soft_skills):
-    if "resolution" in soft_skills and "probleme" in soft_skills:
-        soft_skills.append("Resolution de problemes")
-        soft_skills.remove("resolution")
-        soft_skills.remove("probleme")
-    if "esprit" in soft_skills and "equipe" in soft_skills:
-        soft_skills.append("Esprit d'equipe")
-        soft_skills.remove("equipe")
-    if "esprit" in soft_skills and "critique" in soft_skills:
-        soft_skills.append("Esprit critique")
-        soft_skills.remove("critique")
-    if "confiance" in soft_skills and "soi" in soft_skills:
-        soft_skills.append("Confiance en soi")
-        soft_skills.remove("confiance")
-        soft_skills.remove("soi")
-    if "gestion" in soft_skills and "temps" in soft_skills:
-        soft_skills.append("Gestion du temps")
-        soft_skills.remove("gestion")
-        soft_skills.remove("temps")
-    if "esprit" in soft_skills:
-        soft_skills.remove("esprit")
-    if "gestion" in soft_skills:
-        soft_skills.remove("gestion")
-    return soft_skills
-
 def extract_skills(df):
     logging.info("Extracting Skills from description...")
     if "description" in df.columns:
         df.dropna(subset="description", inplace = True)
-        df = clean_description(df)
-        df["tech_skills"] = df["description_cleaned"].apply(extract_tech_skills)
-        df["soft_skills"] = df["description_cleaned"].apply(extract_soft_skills)
-        df.drop("description_cleaned", axis=1, inplace=True)
+        skills = load_skill_matcher().match_column(df["description"])
+        df["tech_skills"] = skills["tech_skills"]
+        df["soft_skills"] = skills["soft_skills"]
         logging.info("Skills extracted!")
     else:
         logging.info("""
@@ -1021,10 +1492,35 @@ def extract_skills(df):
     return df
 
 
+def enrich_offers(df):
+    '''
+    Étapes ligne par ligne appliquées aux offres nettoyées : compétences,
+    valeurs manquantes et villes. Utilisée avec `map_chunks` pour répartir
+    les lignes sur plusieurs processus.
+    '''
+    df = extract_skills(df)
+    df = clean_nan(df)
+    df["ville"] = categorize(df["ville"], clean_ville)
+    return df
+
+
 # SQL
+def dumps_skills(skills) -> str:
+    '''
+    Liste de compétences (liste, tableau numpy ou liste Arrow) au format
+    JSON pour la base SQL.
+    '''
+    if not pd.api.types.is_list_like(skills):
+        return json.dumps([])
+    return json.dumps(list(skills))
+
 def create_sql_table(df):
-    df['tech_skills'] = df['tech_skills'].apply(json.dumps)
-    df['soft_skills'] = df['soft_skills'].apply(json.dumps)
+    # Compétences en JSON dans une copie : `df` garde ses listes pour
+    # l'index TF-IDF (mêmes empreintes que dans cinq_offres_similaires).
+    df = df.assign(
+        tech_skills=df['tech_skills'].apply(dumps_skills),
+        soft_skills=df['soft_skills'].apply(dumps_skills),
+    )
     engine = sqlalchemy.create_engine('sqlite:///database/job_offers.sqlite')
     df.to_sql('all_jobs', con=engine, index=False, if_exists='replace')
 